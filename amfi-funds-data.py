@@ -1,4 +1,296 @@
-from datetime import datetime
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+import json
+import math
+import re
+import time
+
+import numpy as np
+
+def to_ordinal(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+# Shared by every file loaded after this one (see serve.SHARED_FILES)
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+MICROSECOND = timedelta(microseconds=1)
+
+class TimeSeries:
+    # Date-ordered observations kept as two parallel typed arrays (int32 date
+    # ordinals and float64 values) instead of one dict per point.
+    def __init__(self, value_key):
+        self.value_key = value_key
+        self.dates = array("i")
+        self.values = array("d")
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._point(i) for i in range(*index.indices(len(self.dates)))]
+        if index < 0:
+            index += len(self.dates)
+        return self._point(index)
+
+    def __iter__(self):
+        for i in range(len(self.dates)):
+            yield self._point(i)
+
+    def _point(self, i):
+        return {"date": date.fromordinal(self.dates[i]), self.value_key: self.values[i]}
+
+    def append(self, date, value):
+        ordinal = to_ordinal(date)
+        if not self.dates or ordinal > self.dates[-1]:
+            self.dates.append(ordinal)
+            self.values.append(value)
+            return
+        i = bisect_left(self.dates, ordinal)
+        if self.dates[i] == ordinal:
+            self.values[i] = value
+        else:
+            self.dates.insert(i, ordinal)
+            self.values.insert(i, value)
+
+    def extend(self, ordinals, values):
+        # Bulk append; falls back to ordered inserts unless the batch is
+        # strictly increasing and starts after the last stored date
+        if ordinals and (not self.dates or ordinals[0] > self.dates[-1]) and \
+                all(a < b for a, b in zip(ordinals, ordinals[1:])):
+            self.dates.extend(ordinals)
+            self.values.extend(values)
+            return
+        for ordinal, value in zip(ordinals, values):
+            self.append(date.fromordinal(ordinal), value)
+
+    def latest(self):
+        return self.values[-1] if self.dates else None
+
+    def latest_date(self):
+        return date.fromordinal(self.dates[-1]) if self.dates else None
+
+    def index_at(self, date):
+        # Index of the last observation on or before `date`, or -1
+        return bisect_right(self.dates, to_ordinal(date)) - 1
+
+    def value_at(self, date):
+        i = self.index_at(date)
+        return self.values[i] if i >= 0 else None
+
+    def range(self, start=None, end=None):
+        # Copies of the observations in [start, end]: views would keep the
+        # live arrays exported and make the next append raise BufferError
+        lo = bisect_left(self.dates, to_ordinal(start)) if start is not None else 0
+        hi = bisect_right(self.dates, to_ordinal(end)) if end is not None else len(self.dates)
+        return self.dates[lo:hi], self.values[lo:hi]
+
+RESAMPLE_INTERVALS = ("daily", "weekly", "monthly")
+
+def resample_last(ordinals, values, interval):
+    # Keeps the last observation of each week (Monday-based) or calendar month
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if interval == "daily" or len(ordinals) < 2:
+        return ordinals, values
+    if interval == "weekly":
+        buckets = (ordinals - 1) // 7
+    elif interval == "monthly":
+        buckets = (ordinals - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    else:
+        raise ValueError(f"Unsupported interval: {interval}")
+    keep = np.append(buckets[1:] != buckets[:-1], True)
+    return ordinals[keep], values[keep]
+
+def downsample_lttb(ordinals, values, max_points):
+    # Largest-Triangle-Three-Buckets: keeps the first and last points and,
+    # from each of max_points - 2 buckets, the point forming the largest
+    # triangle with the previously kept point and the next bucket's mean
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    n = len(ordinals)
+    if max_points >= n or max_points < 3:
+        return ordinals, values
+    x = ordinals.astype(np.float64)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    kept = [0]
+    for b in range(max_points - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            next_x = x[hi:edges[b + 2]].mean()
+            next_y = values[hi:edges[b + 2]].mean()
+        else:
+            next_x, next_y = x[-1], values[-1]
+        a = kept[-1]
+        areas = np.abs((x[a] - next_x) * (values[lo:hi] - values[a]) - (x[a] - x[lo:hi]) * (next_y - values[a]))
+        kept.append(lo + int(areas.argmax()))
+    kept.append(n - 1)
+    return ordinals[kept], values[kept]
+
+class SortedIndex:
+    # Scheme codes ordered by a numeric key so that range queries bisect
+    # instead of scanning every fund
+    def __init__(self):
+        self.keys = []
+        self.codes = []
+        self.key_of = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def set(self, scheme_code, key):
+        old = self.key_of.get(scheme_code)
+        if old is not None:
+            if old == key:
+                return
+            self.discard(scheme_code)
+        if key is None:
+            return
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.codes.insert(i, scheme_code)
+        self.key_of[scheme_code] = key
+
+    def discard(self, scheme_code):
+        key = self.key_of.pop(scheme_code, None)
+        if key is None:
+            return
+        i = bisect_left(self.keys, key)
+        while self.codes[i] != scheme_code:
+            i += 1
+        del self.keys[i]
+        del self.codes[i]
+
+    def range(self, low=None, high=None):
+        lo = bisect_left(self.keys, low) if low is not None else 0
+        hi = bisect_right(self.keys, high) if high is not None else len(self.keys)
+        return self.codes[lo:hi]
+
+# Searchable fund fields and their weights, best first
+SEARCH_FIELDS = (("scheme_name", 3), ("fund_house", 2), ("benchmark", 1))
+# Added to a field's weight when a query term is a whole token rather than
+# a prefix, so any exact match outranks any prefix match
+EXACT_MATCH_BONUS = 3
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", text.lower()) if text else []
+
+class _TrieNode:
+    __slots__ = ("children", "tokens", "matches")
+
+    def __init__(self):
+        self.children = {}
+        # Every indexed token with this prefix, and the (slots, weights)
+        # arrays they match, merged on first use
+        self.tokens = []
+        self.matches = None
+
+class SearchIndex:
+    # Inverted index from token to {fund slot: best field weight}, plus a
+    # prefix trie over the tokens for typeahead. Funds are identified by
+    # the FundManager slot, so query scores are vectors indexed by slot.
+    def __init__(self):
+        self.postings = {}
+        self._arrays = {}
+        self._tokens_of = {}
+        self._root = _TrieNode()
+        self.size = 0
+
+    def add(self, slot, fields):
+        # `fields` is (text, weight) pairs; replaces the slot's previous entry
+        self.remove(slot)
+        weights = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                if weights.get(token, 0) < weight:
+                    weights[token] = weight
+        for token, weight in weights.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                self._insert_token(token)
+            posting[slot] = weight
+            self._changed(token)
+        self._tokens_of[slot] = weights
+        self.size = max(self.size, slot + 1)
+
+    def remove(self, slot):
+        for token in self._tokens_of.pop(slot, ()):
+            del self.postings[token][slot]
+            self._changed(token)
+
+    def _insert_token(self, token):
+        node = self._root
+        for char in token:
+            node = node.children.setdefault(char, _TrieNode())
+            node.tokens.append(token)
+
+    def _changed(self, token):
+        self._arrays.pop(token, None)
+        node = self._root
+        for char in token:
+            node = node.children[char]
+            node.matches = None
+
+    def token_matches(self, token):
+        arrays = self._arrays.get(token)
+        if arrays is None:
+            posting = self.postings.get(token)
+            if posting is None:
+                return np.empty(0, np.int64), np.empty(0, np.int8)
+            arrays = self._arrays[token] = (np.fromiter(posting.keys(), np.int64, len(posting)),
+                                            np.fromiter(posting.values(), np.int8, len(posting)))
+        return arrays
+
+    def prefix_matches(self, prefix):
+        # (slots, best weight) for every fund with a token starting with prefix
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return np.empty(0, np.int64), np.empty(0, np.int8)
+        if node.matches is None:
+            best = np.zeros(self.size, np.int8)
+            for token in node.tokens:
+                slots, weights = self.token_matches(token)
+                best[slots] = np.maximum(best[slots], weights)
+            slots = np.flatnonzero(best)
+            node.matches = (slots, best[slots])
+        return node.matches
+
+    def term_scores(self, term, size):
+        # Per-slot match quality of one query term: the field weight of a
+        # prefix match, plus EXACT_MATCH_BONUS where a token equals the term
+        scores = np.zeros(size, np.int8)
+        slots, weights = self.prefix_matches(term)
+        scores[slots] = weights
+        slots, weights = self.token_matches(term)
+        scores[slots] = np.maximum(scores[slots], weights + EXACT_MATCH_BONUS)
+        return scores
+
+    def search(self, query, ranks, limit):
+        # Slots of the funds matching every query term (each as a prefix),
+        # best total match quality first, ties broken by `ranks` (a
+        # per-slot vector, higher first)
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        size = len(ranks)
+        total = np.zeros(size, np.int64)
+        matched = np.ones(size, dtype=bool)
+        for term in terms:
+            scores = self.term_scores(term, size)
+            matched &= scores > 0
+            total += scores
+        candidates = np.flatnonzero(matched)
+        keys = total[candidates] * (size + 1) + ranks[candidates]
+        if len(candidates) > limit:
+            top = np.argpartition(-keys, limit)[:limit]
+            candidates, keys = candidates[top], keys[top]
+        return candidates[np.argsort(-keys, kind="stable")].tolist()
 
 class Fund:
     def __init__(self, scheme_code, scheme_name, fund_house, scheme_type, scheme_category, scheme_sub_category):
@@ -8,8 +300,8 @@ class Fund:
         self.scheme_type = scheme_type
         self.scheme_category = scheme_category
         self.scheme_sub_category = scheme_sub_category
-        self.nav_history = []
-        self.aum_history = []
+        self.nav_history = TimeSeries("nav")
+        self.aum_history = TimeSeries("aum")
         self.expense_ratio = None
         self.risk_grade = None
         self.benchmark = None
@@ -18,18 +310,29 @@ class Fund:
         self.exit_load = None
         self.min_investment = None
         self.investment_objective = None
+        # Precomputed compute_returns() result and the date ordinal of the
+        # latest NAV it was computed from
+        self.performance = None
+        self.performance_as_of = None
+        # view -> pre-encoded static fields (see static_json), and the
+        # (performance, encoded) pair last spliced in by fund_json
+        self._static_json = {}
+        self._performance_json = None
 
     def update_nav(self, date, nav):
-        self.nav_history.append({"date": date, "nav": nav})
+        self.nav_history.append(date, nav)
 
     def update_aum(self, date, aum):
-        self.aum_history.append({"date": date, "aum": aum})
+        self.aum_history.append(date, aum)
 
     def get_current_nav(self):
-        return self.nav_history[-1]["nav"] if self.nav_history else None
+        return self.nav_history.latest()
 
     def get_current_aum(self):
-        return self.aum_history[-1]["aum"] if self.aum_history else None
+        return self.aum_history.latest()
+
+    def get_nav_on(self, date):
+        return self.nav_history.value_at(date)
 
     def set_fund_details(self, expense_ratio, risk_grade, benchmark, fund_manager, inception_date, exit_load, min_investment, investment_objective):
         self.expense_ratio = expense_ratio
@@ -40,33 +343,446 @@ class Fund:
         self.exit_load = exit_load
         self.min_investment = min_investment
         self.investment_objective = investment_objective
+        self._static_json = {}
+
+    def static_json(self, view="summary"):
+        # The view's static fields as JSON object members without the braces,
+        # encoded once and kept until set_fund_details
+        text = self._static_json.get(view)
+        if text is None:
+            fields = {key: getattr(self, attribute) for key, attribute in JSON_VIEWS[view]}
+            if fields.get("inception_date"):
+                fields["inception_date"] = fields["inception_date"].isoformat()
+            text = self._static_json[view] = json.dumps(fields, separators=(",", ":"))[1:-1]
+        return text
 
     def __str__(self):
         return f"{self.scheme_name} (Code: {self.scheme_code}) - {self.fund_house}"
 
+# API views of a fund: JSON key -> Fund attribute for the static fields
+JSON_VIEWS = {
+    "summary": (("scheme_code", "scheme_code"), ("scheme_name", "scheme_name"), ("fund_house", "fund_house"),
+                ("category", "scheme_category"), ("expense_ratio", "expense_ratio"), ("risk_grade", "risk_grade")),
+}
+JSON_VIEWS["details"] = JSON_VIEWS["summary"] + (
+    ("fund_manager", "fund_manager"), ("inception_date", "inception_date"),
+    ("investment_objective", "investment_objective"), ("min_investment", "min_investment"),
+    ("exit_load", "exit_load"), ("benchmark", "benchmark"))
+
+def fund_json(fund, performance, view="summary"):
+    # One fund as a JSON object: its cached static fields spliced with the
+    # latest NAV/AUM and `performance` (flattened into a summary, nested
+    # under "performance" in details)
+    cached = fund._performance_json
+    if cached is None or cached[0] is not performance:
+        # Performance dicts are replaced, not mutated, on refresh
+        cached = fund._performance_json = (performance, json.dumps(performance, separators=(",", ":"))[1:-1])
+    dynamic = f'"nav":{_json_number(fund.get_current_nav())},"aum":{_json_number(fund.get_current_aum())}'
+    if view == "summary":
+        return f"{{{fund.static_json(view)},{dynamic}{',' if cached[1] else ''}{cached[1]}}}"
+    return f'{{{fund.static_json(view)},{dynamic},"performance":{{{cached[1]}}}}}'
+
+def _json_number(value):
+    # The text json.dumps gives a float or None
+    if value is None:
+        return "null"
+    value = float(value)
+    return repr(value) if math.isfinite(value) else json.dumps(value)
+
+INDEXED_ATTRIBUTES = ("scheme_category", "scheme_sub_category", "fund_house", "scheme_type", "risk_grade")
+RANGE_INDEXES = ("nav", "aum", "expense_ratio")
+RETURN_PERIODS = (("ytd_return", 0), ("1y_return", 1), ("3y_return", 3), ("5y_return", 5))
+EMPTY_PERFORMANCE = {name: None for name, _ in RETURN_PERIODS}
+# Larger than any date ordinal, so fund_position * ORDINAL_STRIDE + ordinal
+# sorts every fund's history into one searchable key array
+ORDINAL_STRIDE = 1 << 22
+
 class FundManager:
     def __init__(self):
         self.funds = {}
+        # attribute -> value -> set of scheme codes
+        self._indexes = {attribute: {} for attribute in INDEXED_ATTRIBUTES}
+        self._indexed_values = {}
+        self._sorted_codes = []
+        # latest nav / aum / expense ratio -> scheme codes, kept sorted
+        self._range_indexes = {name: SortedIndex() for name in RANGE_INDEXES}
+        # Latest NAV of every fund in one float64 vector; funds keep the slot
+        # they were given when first added
+        self._slots = {}
+        self._latest_navs = np.full(64, np.nan)
+        self._nav_block = None
+        # Last bulk refresh, and running totals of the per-fund refreshes
+        # NAV writes and stale reads trigger
+        self.performance_refresh_stats = None
+        self.incremental_refresh_stats = {"refreshes": 0, "funds": 0, "seconds": 0.0}
+        # Name / fund house / benchmark search, by slot; search results are
+        # ordered within a match quality by each slot's AUM rank
+        self._search = SearchIndex()
+        self._slot_codes = []
+        self._aum_ranks = None
+        # Bumped on every write so readers can tell cached views are stale
+        self.version = 0
 
     def add_fund(self, fund):
+        self._unindex_fund(fund.scheme_code)
+        if fund.scheme_code not in self.funds:
+            insort(self._sorted_codes, fund.scheme_code)
+        if fund.scheme_code not in self._slots:
+            if len(self._slots) == len(self._latest_navs):
+                self._latest_navs = np.concatenate([self._latest_navs, np.full(len(self._slots), np.nan)])
+            self._slots[fund.scheme_code] = len(self._slots)
+            self._slot_codes.append(fund.scheme_code)
         self.funds[fund.scheme_code] = fund
+        self._index_fund(fund)
+        self._update_range_indexes(fund)
+        self._nav_block = None
+        self.version += 1
 
     def get_fund(self, scheme_code):
         return self.funds.get(scheme_code)
 
+    def get_nav_range(self, scheme_code, start=None, end=None):
+        # (date ordinals, navs) between start and end inclusive
+        return self.funds[scheme_code].nav_history.range(start, end)
+
+    def _extend_nav_history(self, fund, ordinals, navs):
+        fund.nav_history.extend(ordinals, navs)
+
+    def set_fund_details(self, scheme_code, *args, **kwargs):
+        fund = self.funds.get(scheme_code)
+        if fund:
+            fund.set_fund_details(*args, **kwargs)
+            self.reindex_fund(scheme_code)
+            self.version += 1
+
+    def reindex_fund(self, scheme_code):
+        self._unindex_fund(scheme_code)
+        if scheme_code in self.funds:
+            self._index_fund(self.funds[scheme_code])
+            self._update_range_indexes(self.funds[scheme_code])
+        else:
+            for index in self._range_indexes.values():
+                index.discard(scheme_code)
+
+    def _update_range_indexes(self, fund):
+        self._set_latest_nav(fund)
+        self._range_indexes["aum"].set(fund.scheme_code, fund.get_current_aum())
+        self._aum_ranks = None
+        self._range_indexes["expense_ratio"].set(fund.scheme_code, fund.expense_ratio)
+
+    def _set_latest_nav(self, fund):
+        nav = fund.get_current_nav()
+        self._range_indexes["nav"].set(fund.scheme_code, nav)
+        self._latest_navs[self._slots[fund.scheme_code]] = np.nan if nav is None else nav
+
+    def latest_navs(self, scheme_codes):
+        # Latest NAV per scheme code as a float64 array, NaN where unknown
+        slots = [self._slots.get(code, -1) for code in scheme_codes]
+        navs = self._latest_navs[np.array(slots, dtype=np.int64)]
+        navs[np.array(slots) < 0] = np.nan
+        return navs
+
+    def _index_fund(self, fund):
+        values = tuple(getattr(fund, attribute) for attribute in INDEXED_ATTRIBUTES)
+        self._indexed_values[fund.scheme_code] = values
+        for attribute, value in zip(INDEXED_ATTRIBUTES, values):
+            self._indexes[attribute].setdefault(value, set()).add(fund.scheme_code)
+        self._search.add(self._slots[fund.scheme_code],
+                         [(getattr(fund, attribute), weight) for attribute, weight in SEARCH_FIELDS])
+
+    def _unindex_fund(self, scheme_code):
+        values = self._indexed_values.pop(scheme_code, None)
+        if values is None:
+            return
+        self._search.remove(self._slots[scheme_code])
+        for attribute, value in zip(INDEXED_ATTRIBUTES, values):
+            codes = self._indexes[attribute][value]
+            codes.discard(scheme_code)
+            if not codes:
+                del self._indexes[attribute][value]
+
+    def find_funds(self, ranges=None, after=None, limit=None, **filters):
+        # Intersects the index postings of every non-None filter, smallest
+        # first; results are ordered by scheme code. `ranges` maps "nav",
+        # "aum" or "expense_ratio" to an inclusive (low, high) pair, either
+        # end may be None. Funds without a value never match a range.
+        # `after` and `limit` select a page of that ordering.
+        postings = []
+        for attribute, value in filters.items():
+            if attribute not in self._indexes:
+                raise ValueError(f"Unsupported filter: {attribute}")
+            if value is not None:
+                postings.append(self._indexes[attribute].get(value, set()))
+        for name, (low, high) in (ranges or {}).items():
+            if name not in self._range_indexes:
+                raise ValueError(f"Unsupported range: {name}")
+            postings.append(set(self._range_indexes[name].range(low, high)))
+        if not postings:
+            codes = self._sorted_codes
+        else:
+            postings.sort(key=len)
+            codes = sorted(postings[0].intersection(*postings[1:]))
+        start = bisect_right(codes, after) if after is not None else 0
+        stop = start + limit if limit is not None else len(codes)
+        return [self.funds[code] for code in codes[start:stop]]
+
+    def search_funds(self, query, limit=20):
+        # Funds with a word starting with every word of `query` in their
+        # name, fund house or benchmark. Best match first (whole words over
+        # prefixes, name over house over benchmark), then largest AUM.
+        if self._aum_ranks is None:
+            codes = self._range_indexes["aum"].codes
+            self._aum_ranks = np.zeros(len(self._slot_codes), dtype=np.int64)
+            self._aum_ranks[[self._slots[code] for code in codes]] = np.arange(1, len(codes) + 1)
+        return [self.funds[self._slot_codes[slot]] for slot in self._search.search(query, self._aum_ranks, limit)]
+
     def get_funds_by_category(self, category):
-        return [fund for fund in self.funds.values() if fund.scheme_category == category]
+        return self.find_funds(scheme_category=category)
 
     def get_funds_by_fund_house(self, fund_house):
-        return [fund for fund in self.funds.values() if fund.fund_house == fund_house]
+        return self.find_funds(fund_house=fund_house)
 
     def update_nav(self, scheme_code, date, nav):
         if scheme_code in self.funds:
-            self.funds[scheme_code].update_nav(date, nav)
+            fund = self.funds[scheme_code]
+            previous_latest = fund.nav_history.dates[-1] if fund.nav_history else None
+            fund.update_nav(date, nav)
+            self._set_latest_nav(fund)
+            self._nav_block = None
+            self.version += 1
+            if previous_latest is None or fund.nav_history.dates[-1] > previous_latest:
+                self._refresh_incrementally([scheme_code])
+            else:
+                # Back-dated correction: leave it to the next read to refresh
+                fund.performance_as_of = None
 
     def update_aum(self, scheme_code, date, aum):
         if scheme_code in self.funds:
-            self.funds[scheme_code].update_aum(date, aum)
+            fund = self.funds[scheme_code]
+            fund.update_aum(date, aum)
+            self._range_indexes["aum"].set(scheme_code, fund.get_current_aum())
+            self._aum_ranks = None
+            self.version += 1
+
+    def compute_returns(self, as_of=None, scheme_codes=None):
+        # YTD and 1Y point-to-point, 3Y and 5Y CAGR, in percent, for every
+        # requested fund (all funds by default) in one vectorized pass.
+        # Each period starts at the last NAV on or before its anchor date;
+        # anchors are taken from `as_of`, or from each fund's latest NAV date.
+        # Periods the history doesn't cover come back as None.
+        if scheme_codes is not None and self._nav_block is None and len(scheme_codes) < len(self.funds) // 2:
+            # Concatenating a few histories is cheaper than rebuilding the
+            # whole universe block
+            block = _build_nav_block(self.funds, [code for code in dict.fromkeys(scheme_codes) if code in self.funds])
+        else:
+            block = self._get_nav_block()
+        if scheme_codes is None:
+            codes = block["codes"]
+            positions = np.arange(len(codes), dtype=np.int64)
+        else:
+            codes = [code for code in scheme_codes if code in block["position"]]
+            positions = np.array([block["position"][code] for code in codes], dtype=np.int64)
+        names = [name for name, _ in RETURN_PERIODS]
+        if not codes:
+            return {}
+        if not len(block["navs"]):
+            return {code: dict.fromkeys(names) for code in codes}
+
+        keys, navs, offsets = block["keys"], block["navs"], block["offsets"]
+        first = offsets[positions]
+        base = positions * ORDINAL_STRIDE
+        if as_of is None:
+            end = offsets[positions + 1] - 1
+        else:
+            end = np.searchsorted(keys, base + to_ordinal(as_of), side="right") - 1
+        has_end = end >= first
+        end = np.where(has_end, end, 0)
+        end_nav = navs[end]
+        if as_of is None:
+            anchor = (keys[end] - base - EPOCH_ORDINAL).astype("datetime64[D]")
+        else:
+            anchor = np.full(len(codes), to_ordinal(as_of) - EPOCH_ORDINAL).astype("datetime64[D]")
+        months = anchor.astype("datetime64[M]")
+        day_offset = anchor - months.astype("datetime64[D]")
+
+        columns = []
+        for name, years in RETURN_PERIODS:
+            if years == 0:
+                # Last day of the previous calendar year
+                target = anchor.astype("datetime64[Y]").astype("datetime64[D]") - 1
+            else:
+                month = months - 12 * years
+                month_end = (month + 1).astype("datetime64[D]") - 1
+                target = np.minimum(month.astype("datetime64[D]") + day_offset, month_end)
+            target_ordinal = target.astype(np.int64) + EPOCH_ORDINAL
+            start = np.searchsorted(keys, base + target_ordinal, side="right") - 1
+            valid = has_end & (start >= first)
+            ratio = end_nav / navs[np.where(valid, start, 0)]
+            value = ratio ** (1.0 / years) if years > 1 else ratio
+            value = np.round((value - 1.0) * 100.0, 2)
+            columns.append([v if ok else None for v, ok in zip(value.tolist(), valid.tolist())])
+
+        return {code: dict(zip(names, row)) for code, row in zip(codes, zip(*columns))}
+
+    def _get_nav_block(self):
+        # Universe block, rebuilt lazily after any NAV write
+        if self._nav_block is None:
+            self._nav_block = _build_nav_block(self.funds, list(self._sorted_codes))
+        return self._nav_block
+
+    def refresh_performance(self, scheme_codes=None):
+        # Recomputes the per-fund performance snapshots (all funds by default)
+        # and records how long the refresh took
+        started = time.perf_counter()
+        self.performance_refresh_stats = {
+            "funds": self._store_performance(scheme_codes),
+            "seconds": time.perf_counter() - started,
+            "refreshed_at": datetime.now()
+        }
+        return self.performance_refresh_stats
+
+    def _refresh_incrementally(self, scheme_codes):
+        started = time.perf_counter()
+        stats = self.incremental_refresh_stats
+        stats["funds"] += self._store_performance(scheme_codes)
+        stats["refreshes"] += 1
+        stats["seconds"] += time.perf_counter() - started
+
+    def _store_performance(self, scheme_codes):
+        returns = self.compute_returns(scheme_codes=scheme_codes)
+        for scheme_code, performance in returns.items():
+            fund = self.funds[scheme_code]
+            fund.performance = performance
+            fund.performance_as_of = fund.nav_history.dates[-1] if fund.nav_history else None
+        return len(returns)
+
+    def stale_performance(self):
+        # Scheme codes whose snapshot predates their latest NAV
+        return [code for code, fund in self.funds.items() if _performance_is_stale(fund)]
+
+    def get_performance(self, scheme_codes):
+        stale = [code for code in scheme_codes if code in self.funds and _performance_is_stale(self.funds[code])]
+        if stale:
+            self._refresh_incrementally(stale)
+        return {code: self.funds[code].performance or EMPTY_PERFORMANCE
+                for code in scheme_codes if code in self.funds}
+
+    def load_amfi_navall(self, source, chunk_size=1 << 20, refresh_performance=True):
+        # Streams an AMFI NAVAll.txt (or NAV history report) file in chunks of
+        # roughly `chunk_size` bytes. Schemes not seen before are created from
+        # the section and fund house headers preceding their rows.
+        if isinstance(source, str):
+            with open(source, encoding="utf-8", errors="replace") as f:
+                return self.load_amfi_navall(f, chunk_size, refresh_performance)
+
+        started = time.perf_counter()
+        columns = {"code": 0, "name": 3, "nav": 4, "date": 5}
+        section = (None, None, None)
+        fund_house = None
+        date_cache = {}
+        rows = skipped = created = 0
+        touched = set()
+
+        while True:
+            lines = source.readlines(chunk_size)
+            if not lines:
+                break
+            batch = {}
+            for line in lines:
+                fields = line.rstrip("\r\n").split(";")
+                if len(fields) == 1:
+                    header = fields[0].strip()
+                    if not header:
+                        continue
+                    if "Schemes" in header and "(" in header:
+                        section = _parse_amfi_section(header)
+                    else:
+                        fund_house = header
+                    continue
+                if fields[0] == "Scheme Code":
+                    columns = _parse_amfi_columns(fields)
+                    continue
+                rows += 1
+                try:
+                    nav = float(fields[columns["nav"]])
+                    date_text = fields[columns["date"]].strip()
+                    ordinal = date_cache.get(date_text)
+                    if ordinal is None:
+                        ordinal = datetime.strptime(date_text, "%d-%b-%Y").toordinal()
+                        date_cache[date_text] = ordinal
+                except (ValueError, IndexError):
+                    skipped += 1
+                    continue
+                scheme_code = fields[columns["code"]].strip()
+                entry = batch.get(scheme_code)
+                if entry is None:
+                    entry = batch[scheme_code] = (array("i"), array("d"), fields[columns["name"]].strip(), section, fund_house)
+                entry[0].append(ordinal)
+                entry[1].append(nav)
+
+            for scheme_code, (ordinals, navs, scheme_name, (scheme_type, category, sub_category), house) in batch.items():
+                fund = self.funds.get(scheme_code)
+                if fund is None:
+                    fund = Fund(scheme_code, scheme_name, house, scheme_type, category, sub_category)
+                    self.add_fund(fund)
+                    created += 1
+                self._extend_nav_history(fund, ordinals, navs)
+                touched.add(scheme_code)
+                self._set_latest_nav(fund)
+            self._nav_block = None
+            self.version += 1
+
+        if refresh_performance and touched:
+            self.refresh_performance(sorted(touched))
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": rows,
+            "loaded": rows - skipped,
+            "skipped": skipped,
+            "funds_created": created,
+            "seconds": elapsed,
+            "rows_per_sec": rows / elapsed if elapsed > 0 else 0.0
+        }
+
+def _build_nav_block(funds, codes):
+    # NAV histories of `codes` concatenated in order, with per-fund offsets
+    # Histories are copied up to the lengths counted here, so NAVs appended
+    # meanwhile neither shift the offsets nor find the live arrays exported
+    histories = [funds[code].nav_history for code in codes]
+    counts = np.array([len(history) for history in histories], dtype=np.int64)
+    offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    ordinals = np.concatenate([np.frombuffer(h.dates[:n], dtype=np.int32) for h, n in zip(histories, counts.tolist())]
+                              or [np.zeros(0, np.int32)])
+    navs = np.concatenate([np.frombuffer(h.values[:n], dtype=np.float64) for h, n in zip(histories, counts.tolist())]
+                          or [np.zeros(0)])
+    positions = np.repeat(np.arange(len(codes), dtype=np.int64), counts)
+    return {
+        "codes": codes,
+        "position": {code: i for i, code in enumerate(codes)},
+        "keys": positions * ORDINAL_STRIDE + ordinals,
+        "navs": navs,
+        "offsets": offsets
+    }
+
+def _performance_is_stale(fund):
+    latest = fund.nav_history.dates[-1] if fund.nav_history else None
+    return fund.performance_as_of != latest or (latest is not None and fund.performance is None)
+
+def _parse_amfi_columns(fields):
+    names = [name.strip() for name in fields]
+    return {
+        "code": names.index("Scheme Code"),
+        "name": names.index("Scheme Name"),
+        "nav": names.index("Net Asset Value"),
+        "date": names.index("Date")
+    }
+
+def _parse_amfi_section(header):
+    # e.g. "Open Ended Schemes(Equity Scheme - Large Cap Fund)"
+    scheme_type, _, rest = header.partition("(")
+    category, _, sub_category = rest.rstrip(")").partition(" - ")
+    return scheme_type.strip(), category.strip() or None, sub_category.strip() or None
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,493 @@
+import argparse
+import asyncio
+import gc
+import json
+import multiprocessing
+import random
+import shutil
+import tempfile
+import threading
+import tracemalloc
+import uuid
+from datetime import date, datetime, timedelta
+from time import perf_counter
+
+import serve
+
+# Every source file in one namespace, as the served apps see them
+mf = serve.load_module(serve.SHARED_FILES)
+
+def build_fund_manager(fund_count, days, seed=0):
+    rng = random.Random(seed)
+    fund_manager = mf.FundManager()
+    start = date(2023, 1, 2)
+    for i in range(fund_count):
+        fund_manager.add_fund(mf.Fund(f"F{i:05d}", f"Fund {i}", "House", "Open Ended", "Equity", "Large Cap"))
+    for i in range(fund_count):
+        nav = rng.uniform(10, 500)
+        history = fund_manager.funds[f"F{i:05d}"].nav_history
+        for d in range(days):
+            nav *= 1 + rng.uniform(-0.01, 0.01)
+            history.append(start + timedelta(days=d), nav)
+        fund_manager.reindex_fund(f"F{i:05d}")
+    return fund_manager, start + timedelta(days=days - 1)
+
+def build_order_book(fund_manager, order_count, last_day, seed=0):
+    # Orders are spread over the days up to the one before `last_day`, so
+    # every one has its NAV by then
+    rng = random.Random(seed)
+    oms = mf.OrderManagementSystem(fund_manager)
+    codes = sorted(fund_manager.funds)
+    created_at = datetime(2023, 1, 2, 10, 0)
+    minutes = max((last_day - created_at.date()).days - 1, 1) * 24 * 60
+    for i in range(order_count):
+        order_id, razorpay_order_id = oms.place_lump_sum_order(f"U{i % 10000}", rng.choice(codes),
+                                                               rng.randrange(500, 50000), "Buy")
+        oms.orders[order_id]["created_at"] = created_at + timedelta(minutes=i % minutes)
+        oms.orders[order_id]["nav_date"] = mf._nav_date(oms.orders[order_id]["created_at"])
+        oms.confirm_payment(order_id, *oms.razorpay_client.simulate_payment(razorpay_order_id))
+    return oms
+
+def bench_sharded(args):
+    fund_manager, execution_date = build_fund_manager(args.funds, args.days)
+    context = multiprocessing.get_context("fork")
+    baseline = None
+    for workers in args.workers:
+        oms = build_order_book(fund_manager, args.orders, execution_date)
+        started = perf_counter()
+        if workers == 1:
+            stats = oms.execute_orders(list(oms._orders_by_status["Pending"]), execution_date)
+        else:
+            stats = oms.execute_orders_parallel(list(oms._orders_by_status["Pending"]), execution_date, workers, context)
+        elapsed = perf_counter() - started
+        outcome = [(order["status"], order["units_allotted"]) for order in oms.orders.values()]
+        if baseline is None:
+            baseline = outcome
+        identical = outcome == baseline
+        print(f"workers={workers:2d}  orders={stats['orders']}  executed={stats['executed']}  "
+              f"seconds={elapsed:.3f}  orders/sec={stats['orders'] / elapsed:,.0f}  identical={identical}")
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def bench_journal(args):
+    fund_manager, _ = build_fund_manager(10, 5)
+    directory = tempfile.mkdtemp(prefix="order-journal-")
+    try:
+        journal = mf.OrderJournal(directory, fsync=not args.no_fsync)
+        # Snapshots run on a background thread; the placement latencies
+        # include any time spent waiting for one to capture the book
+        oms = mf.OrderManagementSystem(fund_manager, journal, snapshot_every=args.snapshot_every or None)
+        latencies = []
+        for i in range(args.orders):
+            started = perf_counter()
+            oms.place_lump_sum_order(f"U{i % 1000}", "F00001", 1000, "Buy")
+            latencies.append(perf_counter() - started)
+        oms.wait_for_snapshot()
+        journal.close()
+        print(f"placed {args.orders} orders  p50={percentile(latencies, 0.5) * 1e6:.0f}us  "
+              f"p99={percentile(latencies, 0.99) * 1e6:.0f}us  max={max(latencies) * 1e6:.0f}us")
+
+        started = perf_counter()
+        journal = mf.OrderJournal(directory)
+        recovered = mf.OrderManagementSystem.recover(fund_manager, journal)
+        print(f"recovered {len(recovered.orders)} orders in {perf_counter() - started:.3f}s  "
+              f"identical={recovered.orders == oms.orders}")
+        journal.close()
+    finally:
+        shutil.rmtree(directory)
+
+def bench_xirr(args):
+    fund_manager, as_of = build_fund_manager(args.funds, args.days)
+    rng = random.Random(0)
+    codes = sorted(fund_manager.funds)
+    portfolios = []
+    for u in range(args.users):
+        portfolio = mf.Portfolio(f"U{u}")
+        for scheme_code in rng.sample(codes, args.holdings):
+            fund = fund_manager.funds[scheme_code]
+            for m in range(args.installments):
+                day = as_of - timedelta(days=30 * (args.installments - m))
+                nav = fund.get_nav_on(day) or fund.nav_history.values[0]
+                portfolio.add_units(scheme_code, 1000 / nav, 1000)
+                portfolio.record_cash_flow(scheme_code, day, -1000)
+        portfolios.append(portfolio)
+
+    for by_scheme in (False, True):
+        started = perf_counter()
+        rates = mf.portfolio_xirr(portfolios, fund_manager, as_of, by_scheme)
+        elapsed = perf_counter() - started
+        solved = sum(rate is not None for rate in rates.values())
+        print(f"by_scheme={by_scheme!s:5}  series={len(rates)}  solved={solved}  "
+              f"flows={args.users * args.holdings * (args.installments + 1)}  seconds={elapsed:.3f}")
+
+def bench_payments(args):
+    fund_manager, _ = build_fund_manager(10, 5)
+    rng = random.Random(0)
+    client = mf.MockRazorpayClient()
+
+    # Raw signature check: rekeying HMAC per call vs copying a keyed state
+    pairs = [(f"order_{i}", f"pay_{i}") for i in range(args.callbacks)]
+    signatures = [client.sign(*pair) for pair in pairs]
+    started = perf_counter()
+    for (order_id, payment_id), signature in zip(pairs, signatures):
+        mf.hmac.compare_digest(mf.hmac.new(
+            b"rzp_test_secret", f"{order_id}|{payment_id}".encode(), mf.hashlib.sha256).hexdigest(), signature)
+    rekeyed = perf_counter() - started
+    started = perf_counter()
+    for (order_id, payment_id), signature in zip(pairs, signatures):
+        client.verify_signature(order_id, payment_id, signature)
+    copied = perf_counter() - started
+    print(f"verify  rekeyed={args.callbacks / rekeyed:,.0f}/s  keyed_copy={args.callbacks / copied:,.0f}/s")
+
+    for batch_size in args.batch_sizes:
+        directory = tempfile.mkdtemp(prefix="order-journal-") if args.journal else None
+        journal = mf.OrderJournal(directory) if directory else None
+        oms = mf.OrderManagementSystem(fund_manager, journal, razorpay_client=client)
+        callbacks = []
+        for i in range(args.callbacks):
+            order_id, razorpay_order_id = oms.place_lump_sum_order(f"U{i}", "F00001", 1000, "Buy")
+            payment_id, signature = client.simulate_payment(razorpay_order_id)
+            if rng.random() < args.bad_signatures:
+                signature = "0" * 64
+            callbacks.append((order_id, payment_id, signature))
+        # Webhooks are delivered at least once
+        callbacks += rng.sample(callbacks, int(len(callbacks) * args.duplicates))
+        rng.shuffle(callbacks)
+
+        started = perf_counter()
+        if batch_size == 1:
+            outcomes = [oms.confirm_payment(*callback) for callback in callbacks]
+            confirmed = len(oms.get_orders_by_status("Pending"))
+        else:
+            for i in range(0, len(callbacks), batch_size):
+                oms.confirm_payments(callbacks[i:i + batch_size])
+            confirmed = len(oms.get_orders_by_status("Pending"))
+        elapsed = perf_counter() - started
+        print(f"batch={batch_size:5d}  callbacks={len(callbacks)}  confirmed={confirmed}  "
+              f"payment_failed={len(oms.get_orders_by_status('Payment Failed'))}  "
+              f"seconds={elapsed:.3f}  callbacks/sec={len(callbacks) / elapsed:,.0f}")
+        if journal:
+            journal.close()
+            shutil.rmtree(directory)
+
+def legacy_order(user_id, fund_code, amount):
+    # An order as the dict place_lump_sum_order used to build
+    created_at = datetime.now()
+    return {
+        'order_id': str(uuid.uuid4()),
+        'user_id': user_id,
+        'fund_code': fund_code,
+        'amount': amount,
+        'order_type': 'Buy',
+        'status': 'Pending Payment',
+        'created_at': created_at,
+        'nav_date': mf._nav_date(created_at),
+        'executed_at': None,
+        'units_allotted': None,
+        'razorpay_order_id': f"order_{uuid.uuid4().hex}"
+    }
+
+def bench_memory(args):
+    # Heap bytes per order, and how long a full collection takes with the
+    # book in memory: dicts, as orders used to be, the OrderTable columns,
+    # and a whole OrderManagementSystem after placing and paying orders.
+    # Each user_id / fund_code string arrives fresh, as it would when parsed
+    # from a request.
+    def fill(orders):
+        for i in range(args.orders):
+            order = legacy_order(f"U{i % args.users}", f"F{i % args.funds:05d}", 1000.0 + i % 5000)
+            orders[order['order_id']] = order
+        return orders
+
+    def place(_):
+        oms = mf.OrderManagementSystem(mf.FundManager())
+        for i in range(args.orders):
+            order_id, razorpay_order_id = oms.place_lump_sum_order(f"U{i % args.users}", f"F{i % args.funds:05d}",
+                                                                   1000.0 + i % 5000, "Buy")
+            oms.confirm_payment(order_id, *oms.razorpay_client.simulate_payment(razorpay_order_id))
+        return oms
+
+    for name, build, store in (("dict", fill, dict), ("table", fill, mf.OrderTable), ("oms", place, None)):
+        gc.collect()
+        tracemalloc.start()
+        book = build(store() if store else None)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        pauses = []
+        for _ in range(5):
+            started = perf_counter()
+            gc.collect()
+            pauses.append(perf_counter() - started)
+        print(f"{name:6s}  orders={args.orders}  bytes/order={size / args.orders:.0f}  "
+              f"full_gc={min(pauses) * 1000:.1f}ms  tracked_objects={len(gc.get_objects())}")
+        del book
+
+def start_fake_gateway(**options):
+    # Runs the fake gateway on its own event loop thread
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    server = asyncio.run_coroutine_threadsafe(mf.FakeGatewayServer(**options).start(), loop).result()
+    return server, loop
+
+def bench_gateway(args):
+    fund_manager, as_of = build_fund_manager(10, 30)
+    server, loop = start_fake_gateway(latency=args.latency, failure_rate=args.failure_rate, seed=0)
+    try:
+        for connections in args.connections:
+            client = mf.AsyncGatewayClient(server.host, server.port, max_connections=connections,
+                                                       backoff=0.01)
+            oms = mf.OrderManagementSystem(fund_manager, gateway=client)
+            for i in range(args.sips):
+                oms.place_sip_order(f"U{i}", "F00001", 1000, "Monthly", as_of)
+            requests, opened = server.requests, server.connections
+            started = perf_counter()
+            stats = oms.process_orders(as_of)
+            elapsed = perf_counter() - started
+            # Installments still waiting for their NAV count as debited
+            debited = sum(order["status"] in ("Executed", "Pending") for order in oms.orders.values())
+            print(f"connections={connections:3d}  sips={stats['sip_installments']}  debited={debited}  "
+                  f"requests={server.requests - requests}  connections_opened={server.connections - opened}  "
+                  f"seconds={elapsed:.3f}")
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+FUND_HOUSES = ["Aditya Birla Sun Life", "Axis", "Bandhan", "Bank of India", "Baroda BNP Paribas", "Canara Robeco",
+               "DSP", "Edelweiss", "Franklin Templeton", "HDFC", "HSBC", "ICICI Prudential", "Invesco", "JM Financial",
+               "Kotak Mahindra", "LIC", "Mahindra Manulife", "Mirae Asset", "Motilal Oswal", "Nippon India", "PGIM India",
+               "Parag Parikh", "Quant", "Quantum", "SBI", "Sundaram", "Tata", "Union", "UTI", "WhiteOak Capital"]
+SCHEME_KINDS = [("Large Cap", "Nifty 100 TRI"), ("Mid Cap", "Nifty Midcap 150 TRI"), ("Small Cap", "Nifty Smallcap 250 TRI"),
+                ("Flexi Cap", "Nifty 500 TRI"), ("ELSS Tax Saver", "BSE 500 TRI"), ("Banking & PSU Debt", "CRISIL Banking and PSU Debt Index"),
+                ("Liquid", "CRISIL Liquid Debt A-I Index"), ("Corporate Bond", "CRISIL Corporate Debt A-II Index"),
+                ("Balanced Advantage", "CRISIL Hybrid 50+50 Moderate Index"), ("Nifty 50 Index", "Nifty 50 TRI"),
+                ("Gilt", "CRISIL Dynamic Gilt Index"), ("Arbitrage", "Nifty 50 Arbitrage Index"),
+                ("Focused Equity", "Nifty 500 TRI"), ("Multi Asset Allocation", "BSE 500 TRI"), ("Overnight", "CRISIL Liquid Overnight Index")]
+PLAN_VARIANTS = ["Direct Plan - Growth", "Regular Plan - Growth", "Direct Plan - IDCW", "Regular Plan - IDCW",
+                 "Direct Plan - IDCW Reinvestment", "Regular Plan - Bonus"]
+SEARCH_QUERIES = ["h", "hd", "hdfc", "hdfc m", "hdfc mid", "hdfc midcap", "sbi large", "nifty", "nifty 50 index direct",
+                  "axis small cap direct growth", "crisil", "d", "direct", "parag flexi", "tax", "zzz"]
+
+def build_search_universe(count, seed=0):
+    rng = random.Random(seed)
+    fund_manager = mf.FundManager()
+    for i in range(count):
+        house = FUND_HOUSES[i % len(FUND_HOUSES)]
+        kind, benchmark = SCHEME_KINDS[i // len(FUND_HOUSES) % len(SCHEME_KINDS)]
+        variant = PLAN_VARIANTS[i // (len(FUND_HOUSES) * len(SCHEME_KINDS)) % len(PLAN_VARIANTS)]
+        series = f" Series {i // 2700}" if i >= 2700 else ""
+        fund = mf.Fund(f"{100000 + i}", f"{house} {kind} Fund{series} - {variant}", f"{house} Mutual Fund",
+                               "Open Ended", "Equity", kind)
+        fund.benchmark = benchmark
+        fund_manager.add_fund(fund)
+        fund_manager.update_aum(fund.scheme_code, date(2024, 3, 31), rng.lognormvariate(20, 2))
+    return fund_manager
+
+def bench_search(args):
+    started = perf_counter()
+    fund_manager = build_search_universe(args.funds)
+    print(f"indexed {args.funds} funds in {perf_counter() - started:.2f}s")
+    for query in SEARCH_QUERIES:
+        # The first query for a prefix merges its trie node's postings
+        started = perf_counter()
+        fund_manager.search_funds(query, args.limit)
+        cold = perf_counter() - started
+        latencies = []
+        for _ in range(args.rounds):
+            started = perf_counter()
+            results = fund_manager.search_funds(query, args.limit)
+            latencies.append(perf_counter() - started)
+        latencies.sort()
+        top = results[0].scheme_name if results else "-"
+        print(f"{query!r:32s} results={len(results):3d}  cold={cold * 1e6:6.0f}us  "
+              f"p50={latencies[len(latencies) // 2] * 1e6:6.0f}us  "
+              f"max={latencies[-1] * 1e6:6.0f}us  top={top}")
+
+def bench_encode(args):
+    fund_manager, _ = build_fund_manager(args.funds, 30)
+    funds = list(fund_manager.funds.values())
+    performance = fund_manager.get_performance([f.scheme_code for f in funds])
+
+    def field_by_field():
+        # What /api/funds did before: a dict per fund through json.dumps
+        return json.dumps([{
+            "scheme_code": f.scheme_code,
+            "scheme_name": f.scheme_name,
+            "fund_house": f.fund_house,
+            "category": f.scheme_category,
+            "nav": f.get_current_nav(),
+            "aum": f.get_current_aum(),
+            "expense_ratio": f.expense_ratio,
+            "risk_grade": f.risk_grade,
+            **performance[f.scheme_code]
+        } for f in funds], separators=(",", ":"))
+
+    def spliced():
+        return f"[{','.join(mf.fund_json(f, performance[f.scheme_code]) for f in funds)}]"
+
+    assert json.loads(field_by_field()) == json.loads(spliced())
+    for name, encode in (("json.dumps", field_by_field), ("fragments", spliced)):
+        started = perf_counter()
+        for _ in range(args.rounds):
+            encode()
+        elapsed = (perf_counter() - started) / args.rounds
+        print(f"{name:10s}  funds={len(funds)}  ms/listing={elapsed * 1000:.2f}  us/fund={elapsed / len(funds) * 1e6:.2f}")
+
+async def http_exchange(reader, writer, message):
+    # One request/response on an open connection; returns the status and
+    # whether the server keeps the connection open
+    writer.write(message)
+    await writer.drain()
+    version, status = (await reader.readuntil(b"\r\n")).split()[:2]
+    headers = {}
+    while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readuntil(b"\r\n")
+    else:
+        await reader.read()
+        return int(status), False
+    connection = headers.get("connection", "keep-alive" if version == b"HTTP/1.1" else "close")
+    return int(status), connection == "keep-alive"
+
+def http_requests(args, host):
+    # GETs cycle through args.paths; a `write_ratio` share are lump-sum orders
+    rng = random.Random(0)
+    messages = []
+    for i in range(args.requests):
+        if rng.random() < args.write_ratio:
+            body = json.dumps({"user_id": f"U{i % args.users}", "fund_code": args.fund_code, "amount": 1000,
+                               "order_type": "Buy"}).encode()
+            head = (f"POST /orders/lumpsum HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n")
+            messages.append(head.encode() + body)
+        else:
+            path = args.paths[i % len(args.paths)]
+            messages.append(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+    return messages
+
+async def http_load(host, port, messages, concurrency):
+    # `concurrency` clients, each reusing its connection while the server
+    # allows it; a request's latency includes any reconnect it needed
+    pending = iter(messages)
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        connection = None
+        for message in pending:
+            started = perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(host, port)
+                status, keep_alive = await http_exchange(*connection, message)
+            except (OSError, asyncio.IncompleteReadError):
+                errors += 1
+                keep_alive = False
+            else:
+                latencies.append(perf_counter() - started)
+                errors += status >= 400
+            if not keep_alive and connection is not None:
+                connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    started = perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, perf_counter() - started
+
+def bench_http(args):
+    for target in args.targets:
+        name, _, address = target.rpartition("=")
+        host, port = address.rsplit(":", 1)
+        messages = http_requests(args, host)
+        latencies, errors, elapsed = asyncio.run(http_load(host, int(port), messages, args.concurrency))
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1e3 if latencies else float("nan")
+        p99 = latencies[int(len(latencies) * 0.99)] * 1e3 if latencies else float("nan")
+        print(f"{name or address:12s}  requests={len(messages)}  errors={errors}  "
+              f"req/s={len(latencies) / elapsed:,.0f}  p50={p50:.2f}ms  p99={p99:.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the fund and order back end")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sharded = commands.add_parser("sharded", help="process_orders with 1..N worker processes")
+    sharded.add_argument("--orders", type=int, default=200000)
+    sharded.add_argument("--funds", type=int, default=2000)
+    sharded.add_argument("--days", type=int, default=30)
+    sharded.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    sharded.set_defaults(run=bench_sharded)
+
+    journal = commands.add_parser("journal", help="order placement latency with the journal, then recovery time")
+    journal.add_argument("--orders", type=int, default=100000)
+    journal.add_argument("--snapshot-every", type=int, default=50000, help="journal records between snapshots, 0 for none")
+    journal.add_argument("--no-fsync", action="store_true")
+    journal.set_defaults(run=bench_journal)
+
+    xirr = commands.add_parser("xirr", help="batch XIRR over many SIP portfolios")
+    xirr.add_argument("--users", type=int, default=20000)
+    xirr.add_argument("--holdings", type=int, default=4)
+    xirr.add_argument("--installments", type=int, default=36)
+    xirr.add_argument("--funds", type=int, default=200)
+    xirr.add_argument("--days", type=int, default=1200)
+    xirr.set_defaults(run=bench_xirr)
+
+    payments = commands.add_parser("payments", help="payment callback verification, single vs batched")
+    payments.add_argument("--callbacks", type=int, default=100000)
+    payments.add_argument("--duplicates", type=float, default=0.1)
+    payments.add_argument("--bad-signatures", type=float, default=0.01)
+    payments.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 1000])
+    payments.add_argument("--journal", action="store_true", help="journal with fsync, as in production")
+    payments.set_defaults(run=bench_payments)
+
+    memory = commands.add_parser("memory", help="heap bytes per order and full GC pause, dict vs OrderTable")
+    memory.add_argument("--orders", type=int, default=500000)
+    memory.add_argument("--users", type=int, default=50000)
+    memory.add_argument("--funds", type=int, default=2000)
+    memory.set_defaults(run=bench_memory)
+
+    search = commands.add_parser("search", help="typeahead search latency over an AMFI-sized universe")
+    search.add_argument("--funds", type=int, default=15000)
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--rounds", type=int, default=200)
+    search.set_defaults(run=bench_search)
+
+    encode = commands.add_parser("encode", help="/api/funds listing encoding, json.dumps vs pre-encoded fragments")
+    encode.add_argument("--funds", type=int, default=10000)
+    encode.add_argument("--rounds", type=int, default=20)
+    encode.set_defaults(run=bench_encode)
+
+    # Start the servers with serve.py, e.g. `python serve.py mutual-fund-asgi.py --port 5001`
+    http = commands.add_parser("http", help="requests/sec and latency of running API servers, e.g. "
+                                             "flask=127.0.0.1:5000 asgi=127.0.0.1:5001")
+    http.add_argument("targets", nargs="+", metavar="[NAME=]HOST:PORT")
+    http.add_argument("--requests", type=int, default=20000)
+    http.add_argument("--concurrency", type=int, default=64)
+    http.add_argument("--paths", nargs="+", default=["/api/funds?limit=50", "/api/users/U1", "/api/users/U1/portfolio"])
+    # /orders/lumpsum is served by mutual-fund-api.py and the ASGI app
+    http.add_argument("--write-ratio", type=float, default=0.0)
+    http.add_argument("--fund-code", default="F00000")
+    http.add_argument("--users", type=int, default=1000)
+    http.set_defaults(run=bench_http)
+
+    gateway = commands.add_parser("gateway", help="SIP auto-debits through the async client and fake gateway")
+    gateway.add_argument("--sips", type=int, default=2000)
+    gateway.add_argument("--latency", type=float, default=0.02)
+    gateway.add_argument("--failure-rate", type=float, default=0.02)
+    gateway.add_argument("--connections", type=int, nargs="+", default=[1, 16, 64])
+    gateway.set_defaults(run=bench_gateway)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -1,166 +1,106 @@
 from flask import Flask, request, jsonify
-from datetime import datetime, timedelta
+import os
 import uuid
 
 app = Flask(__name__)
 
 # Assuming we have instances of our previously created classes
-fund_manager = FundManager()
-order_management_system = OrderManagementSystem(fund_manager)
-
-# Helper function to parse dates from strings
-def parse_date(date_string):
-    return datetime.strptime(date_string, "%Y-%m-%d").date()
+# Weekends plus the holidays listed in MF_TRADING_HOLIDAYS, if set
+trading_calendar = TradingCalendar(os.environ.get('MF_TRADING_HOLIDAYS'))
+# Payment signatures are checked against the merchant key secret; there is
+# no safe default, so refuse to start without it
+razorpay_key_secret = os.environ.get('RAZORPAY_KEY_SECRET')
+if not razorpay_key_secret:
+    raise RuntimeError('RAZORPAY_KEY_SECRET is not set')
+razorpay_client = MockRazorpayClient(razorpay_key_secret)
+# SIP auto-debits go through the async gateway client when it is configured
+payment_gateway = None
+if os.environ.get('PAYMENT_GATEWAY_ADDRESS'):
+    gateway_host, gateway_port = os.environ['PAYMENT_GATEWAY_ADDRESS'].rsplit(':', 1)
+    payment_gateway = AsyncGatewayClient(gateway_host, int(gateway_port), os.environ.get('RAZORPAY_KEY_ID', 'rzp_test'),
+                                         razorpay_key_secret)
+storage = None
+if os.environ.get('MF_DATABASE'):
+    # Shared SQLite database: every worker process sees the same funds and order book
+    storage = SQLiteStorage(os.environ['MF_DATABASE'])
+    fund_manager = SQLiteFundManager(storage, history_days=int(os.environ.get('MF_NAV_HISTORY_DAYS', 0)) or None)
+    order_management_system = SQLiteOrderManagementSystem(fund_manager, storage, calendar=trading_calendar,
+                                                          gateway=payment_gateway, razorpay_client=razorpay_client)
+elif os.environ.get('ORDER_JOURNAL_DIR'):
+    fund_manager = FundManager()
+    # Replay the durable order book left by the previous run
+    order_management_system = OrderManagementSystem.recover(
+        fund_manager, OrderJournal(os.environ['ORDER_JOURNAL_DIR']), snapshot_every=100000,
+        calendar=trading_calendar, gateway=payment_gateway, razorpay_client=razorpay_client)
+else:
+    fund_manager = FundManager()
+    order_management_system = OrderManagementSystem(fund_manager, calendar=trading_calendar, gateway=payment_gateway,
+                                                    razorpay_client=razorpay_client)
+
+@app.before_request
+def sync_fund_data():
+    # Pick up fund data written by other workers
+    if storage is not None:
+        fund_manager.sync()
+
+response_cache = ResponseCache()
+
+def cached_json_response(build, *args):
+    # `build(fund_manager, *args)` returns (payload, status) and only runs
+    # on a cache miss
+    status, body, etag = response_cache.lookup(cache_key(request.path, request.args), fund_manager.version,
+                                               lambda: build(fund_manager, *args))
+    response = app.response_class(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 # Fund Data API
 @app.route('/api/funds', methods=['GET'])
 def get_funds():
-    category = request.args.get('category')
-    fund_house = request.args.get('fund_house')
-    min_nav = request.args.get('min_nav')
-    max_nav = request.args.get('max_nav')
-
-    funds = fund_manager.funds.values()
-
-    if category:
-        funds = [f for f in funds if f.scheme_category == category]
-    if fund_house:
-        funds = [f for f in funds if f.fund_house == fund_house]
-    if min_nav:
-        funds = [f for f in funds if f.get_current_nav() >= float(min_nav)]
-    if max_nav:
-        funds = [f for f in funds if f.get_current_nav() <= float(max_nav)]
-
-    return jsonify([{
-        'scheme_code': f.scheme_code,
-        'scheme_name': f.scheme_name,
-        'fund_house': f.fund_house,
-        'category': f.scheme_category,
-        'nav': f.get_current_nav(),
-        'aum': f.get_current_aum(),
-        'expense_ratio': f.expense_ratio,
-        'risk_grade': f.risk_grade,
-        'ytd_return': calculate_ytd_return(f),
-        '1y_return': calculate_1y_return(f),
-        '3y_return': calculate_3y_return(f),
-        '5y_return': calculate_5y_return(f)
-    } for f in funds])
+    if wants_ndjson(request.args, request.accept_mimetypes):
+        return stream_funds_ndjson()
+    return cached_json_response(build_funds_payload, request.args)
+
+def stream_funds_ndjson():
+    # One JSON object per line, encoded a chunk of funds at a time
+    funds, error = find_streamed_funds(fund_manager, request.args)
+    if error:
+        return jsonify(error), 400
+
+    def generate():
+        for i in range(0, len(funds), STREAM_CHUNK_SIZE):
+            yield encode_funds_chunk(fund_manager, funds[i:i + STREAM_CHUNK_SIZE])
+
+    return app.response_class(generate(), mimetype='application/x-ndjson')
+
+@app.route('/api/funds/search', methods=['GET'])
+def search_funds():
+    return cached_json_response(build_search_payload, request.args)
 
 @app.route('/api/funds/<scheme_code>', methods=['GET'])
 def get_fund_details(scheme_code):
-    fund = fund_manager.get_fund(scheme_code)
-    if fund:
-        return jsonify({
-            'scheme_code': fund.scheme_code,
-            'scheme_name': fund.scheme_name,
-            'fund_house': fund.fund_house,
-            'category': fund.scheme_category,
-            'nav': fund.get_current_nav(),
-            'aum': fund.get_current_aum(),
-            'expense_ratio': fund.expense_ratio,
-            'risk_grade': fund.risk_grade,
-            'fund_manager': fund.fund_manager,
-            'inception_date': fund.inception_date.isoformat() if fund.inception_date else None,
-            'investment_objective': fund.investment_objective,
-            'min_investment': fund.min_investment,
-            'exit_load': fund.exit_load,
-            'benchmark': fund.benchmark,
-            'nav_history': get_nav_history(fund),
-            'performance': {
-                'ytd_return': calculate_ytd_return(fund),
-                '1y_return': calculate_1y_return(fund),
-                '3y_return': calculate_3y_return(fund),
-                '5y_return': calculate_5y_return(fund)
-            }
-        })
-    return jsonify({'error': 'Fund not found'}), 404
+    return cached_json_response(build_fund_details_payload, scheme_code)
+
+@app.route('/api/funds/<scheme_code>/nav', methods=['GET'])
+def get_fund_nav_history(scheme_code):
+    return cached_json_response(build_nav_history_payload, scheme_code, request.args)
 
 # User Data API
+dashboard_service = DashboardService(order_management_system, fund_manager,
+                                     lambda user_id: load_user_profile(storage, user_id))
+
 @app.route('/api/users/<user_id>', methods=['GET'])
 def get_user_data(user_id):
-    # This is a placeholder. In a real application, you would fetch this data from a database.
-    user = {
-        'user_id': user_id,
-        'name': 'John Doe',
-        'email': 'johndoe@example.com',
-        'phone': '+1234567890',
-        'kyc_status': 'Verified',
-        'account_opening_date': '2022-01-01',
-        'total_investment': 100000,
-        'current_value': 110000
-    }
-    
-    # Fetch user's portfolio
-    portfolio = get_user_portfolio(user_id)
-    
-    # Fetch user's orders
-    orders = order_management_system.get_user_orders(user_id)
-    
-    # Fetch user's SIPs
-    sips = order_management_system.get_user_sips(user_id)
-
-    return jsonify({
-        'user_info': user,
-        'portfolio': portfolio,
-        'orders': orders,
-        'sips': sips
-    })
+    # Home screen: served from the per-user cache on repeat loads
+    dashboard = dashboard_service.get(user_id)
+    if dashboard is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(dashboard.to_dict())
 
 @app.route('/api/users/<user_id>/portfolio', methods=['GET'])
 def get_user_portfolio(user_id):
-    # This is a placeholder. In a real application, you would fetch this data from a database.
-    portfolio = [
-        {
-            'scheme_code': 'HDFC001',
-            'scheme_name': 'HDFC Top 100 Fund',
-            'units': 100,
-            'average_cost': 350,
-            'current_nav': 400,
-            'current_value': 40000,
-            'profit_loss': 5000,
-            'returns': 14.28
-        },
-        {
-            'scheme_code': 'ICICI001',
-            'scheme_name': 'ICICI Prudential Bluechip Fund',
-            'units': 200,
-            'average_cost': 40,
-            'current_nav': 45,
-            'current_value': 9000,
-            'profit_loss': 1000,
-            'returns': 12.5
-        }
-    ]
-    return jsonify(portfolio)
-
-# Helper functions for calculating returns
-def calculate_ytd_return(fund):
-    # Placeholder implementation
-    return 10.5
-
-def calculate_1y_return(fund):
-    # Placeholder implementation
-    return 15.2
-
-def calculate_3y_return(fund):
-    # Placeholder implementation
-    return 12.8
-
-def calculate_5y_return(fund):
-    # Placeholder implementation
-    return 14.3
-
-def get_nav_history(fund):
-    # Placeholder implementation
-    today = datetime.now().date()
-    history = []
-    for i in range(30):  # Last 30 days
-        date = today - timedelta(days=i)
-        history.append({
-            'date': date.isoformat(),
-            'nav': round(fund.get_current_nav() * (1 + (random.random() - 0.5) * 0.02), 2)
-        })
-    return history
+    # Holdings valued at the latest NAVs, plus totals
+    return jsonify(order_management_system.get_portfolio(user_id).valuation(fund_manager))
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,258 @@
+from collections import OrderedDict
+from datetime import date, datetime
+import hashlib
+import json
+import threading
+
+# Request parsing and response bodies shared by the Flask apps and the ASGI
+# app, so both frontends answer every route the same way. Builders take the
+# query args as a mapping and return (payload, status); a bytes payload is
+# JSON that is already encoded.
+
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_SIZE = 500
+
+# Helper function to parse dates from strings
+def parse_date(date_string):
+    return datetime.strptime(date_string, "%Y-%m-%d").date()
+
+def encode_json(payload):
+    return payload if isinstance(payload, bytes) else json.dumps(payload, separators=(',', ':')).encode()
+
+class ResponseCache:
+    # Pre-encoded JSON responses keyed by path and normalized query params.
+    # Entries are only served while fund_manager.version is unchanged.
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1:]
+
+    def put(self, key, version, status, body, etag):
+        with self.lock:
+            self.entries[key] = (version, status, body, etag)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def lookup(self, key, version, build):
+        # (status, body, etag) for `key`; `build` returns (payload, status)
+        # and only runs on a miss
+        entry = self.get(key, version)
+        if entry is None:
+            payload, status = build()
+            body = encode_json(payload)
+            entry = (status, body, hashlib.blake2b(body, digest_size=16).hexdigest())
+            self.put(key, version, *entry)
+        return entry
+
+def cache_key(path, args):
+    return path, tuple(sorted(args.items(multi=True)))
+
+# Fund Management APIs
+
+def build_fund_list_payload(fund_manager):
+    return [{
+        'scheme_code': f.scheme_code,
+        'scheme_name': f.scheme_name,
+        'fund_house': f.fund_house,
+        'category': f.scheme_category,
+        'nav': f.get_current_nav()
+    } for f in list(fund_manager.funds.values())], 200
+
+def build_fund_payload(fund_manager, scheme_code):
+    fund = fund_manager.get_fund(scheme_code)
+    if fund:
+        return {
+            'scheme_code': fund.scheme_code,
+            'scheme_name': fund.scheme_name,
+            'fund_house': fund.fund_house,
+            'category': fund.scheme_category,
+            'nav': fund.get_current_nav(),
+            'aum': fund.get_current_aum(),
+            'expense_ratio': fund.expense_ratio,
+            'risk_grade': fund.risk_grade,
+            'fund_manager': fund.fund_manager,
+            'inception_date': fund.inception_date.isoformat() if fund.inception_date else None,
+        }, 200
+    return {'error': 'Fund not found'}, 404
+
+# Fund Data API
+
+def parse_funds_query(args):
+    # Returns the find_funds() keyword arguments, or an error payload
+    query = {
+        'ranges': {},
+        'after': args.get('cursor'),
+        'scheme_category': args.get('category'),
+        'scheme_sub_category': args.get('sub_category'),
+        'fund_house': args.get('fund_house'),
+        'scheme_type': args.get('scheme_type'),
+        'risk_grade': args.get('risk_grade')
+    }
+    for name in ('nav', 'aum', 'expense_ratio'):
+        low = args.get(f'min_{name}')
+        high = args.get(f'max_{name}')
+        if low or high:
+            try:
+                query['ranges'][name] = (float(low) if low else None, float(high) if high else None)
+            except ValueError:
+                return None, {'error': f'Invalid min_{name}/max_{name}'}
+    if args.get('limit'):
+        try:
+            query['limit'] = min(int(args['limit']), MAX_PAGE_SIZE)
+        except ValueError:
+            return None, {'error': 'Invalid limit'}
+        if query['limit'] < 1:
+            return None, {'error': 'Invalid limit'}
+    return query, None
+
+def wants_ndjson(args, accept_mimetypes):
+    return args.get('format') == 'ndjson' or accept_mimetypes.best == 'application/x-ndjson'
+
+def build_funds_payload(fund_manager, args):
+    query, error = parse_funds_query(args)
+    if error:
+        return error, 400
+
+    limit = query.pop('limit', None)
+    if limit is None:
+        funds = fund_manager.find_funds(**query)
+    else:
+        # One extra row tells us whether another page follows
+        funds = fund_manager.find_funds(limit=limit + 1, **query)
+        has_more = len(funds) > limit
+        funds = funds[:limit]
+
+    # Spliced from each fund's pre-encoded static fields
+    performance = fund_manager.get_performance([f.scheme_code for f in funds])
+    summaries = f"[{','.join(fund_json(f, performance[f.scheme_code]) for f in funds)}]"
+    if limit is None:
+        return summaries.encode(), 200
+    next_cursor = json.dumps(funds[-1].scheme_code if has_more else None)
+    return f'{{"funds":{summaries},"next_cursor":{next_cursor}}}'.encode(), 200
+
+def find_streamed_funds(fund_manager, args):
+    # (funds, None) for an NDJSON listing, which ignores `limit`, or
+    # (None, error payload)
+    query, error = parse_funds_query(args)
+    if error:
+        return None, error
+    query.pop('limit', None)
+    return fund_manager.find_funds(**query), None
+
+def encode_funds_chunk(fund_manager, chunk):
+    # One JSON object per line
+    performance = fund_manager.get_performance([f.scheme_code for f in chunk])
+    return ''.join(fund_json(f, performance[f.scheme_code]) + '\n' for f in chunk)
+
+def build_search_payload(fund_manager, args):
+    # Typeahead: ?q= matched as word prefixes against scheme name, fund
+    # house and benchmark
+    query = args.get('q', '').strip()
+    if not query:
+        return {'error': 'q is required'}, 400
+    try:
+        limit = min(int(args.get('limit', 20)), MAX_PAGE_SIZE)
+    except ValueError:
+        return {'error': 'Invalid limit'}, 400
+    if limit < 1:
+        return {'error': 'Invalid limit'}, 400
+    funds = fund_manager.search_funds(query, limit)
+    performance = fund_manager.get_performance([f.scheme_code for f in funds])
+    return f"[{','.join(fund_json(f, performance[f.scheme_code]) for f in funds)}]".encode(), 200
+
+def build_fund_details_payload(fund_manager, scheme_code):
+    fund = fund_manager.get_fund(scheme_code)
+    if fund:
+        performance = fund_manager.get_performance([scheme_code])[scheme_code]
+        return fund_json(fund, performance, view='details').encode(), 200
+    return {'error': 'Fund not found'}, 404
+
+def build_nav_history_payload(fund_manager, scheme_code, args):
+    fund = fund_manager.get_fund(scheme_code)
+    if not fund:
+        return {'error': 'Fund not found'}, 404
+
+    interval = args.get('interval', 'daily')
+    if interval not in RESAMPLE_INTERVALS:
+        return {'error': f'interval must be one of {", ".join(RESAMPLE_INTERVALS)}'}, 400
+    try:
+        start = parse_date(args['from']) if args.get('from') else None
+        end = parse_date(args['to']) if args.get('to') else None
+        max_points = int(args['max_points']) if args.get('max_points') else None
+    except ValueError:
+        return {'error': 'Invalid from/to/max_points'}, 400
+    # LTTB keeps the first and last points, so it needs room for one more
+    if max_points is not None and max_points < 3:
+        return {'error': 'max_points must be at least 3'}, 400
+
+    ordinals, navs = fund_manager.get_nav_range(scheme_code, start, end)
+    ordinals, navs = resample_last(ordinals, navs, interval)
+    if max_points is not None:
+        ordinals, navs = downsample_lttb(ordinals, navs, max_points)
+
+    return {
+        'scheme_code': scheme_code,
+        'interval': interval,
+        'points': [{'date': date.fromordinal(d).isoformat(), 'nav': v}
+                   for d, v in zip(ordinals.tolist(), navs.tolist())]
+    }, 200
+
+# Order Management APIs
+
+def payment_outcome_counts(payments, outcomes):
+    counts = dict.fromkeys(('confirmed', 'failed', 'duplicate', 'unknown'), 0)
+    for outcome in outcomes.values():
+        counts[outcome] += 1
+    counts['duplicate'] += len(payments) - len(outcomes)
+    return {'counts': counts, 'orders': outcomes}
+
+def user_history_filters(args):
+    # get_user_orders / get_user_sips keyword arguments; raises ValueError
+    filters = {
+        'status': args.get('status'),
+        'start': parse_date(args['from']) if args.get('from') else None,
+        'end': parse_date(args['to']) if args.get('to') else None,
+        'offset': int(args.get('offset', 0)),
+        'limit': int(args['limit']) if args.get('limit') else None
+    }
+    if filters['offset'] < 0 or (filters['limit'] is not None and filters['limit'] < 0):
+        raise ValueError('offset and limit must not be negative')
+    return filters
+
+def process_orders_payload(stats):
+    return {
+        'message': 'Orders processed successfully',
+        'executed': stats['executed'],
+        'failed': stats['failed'],
+        'waiting': stats['waiting'],
+        'sip_installments': stats['sip_installments'],
+        'seconds': stats['seconds']
+    }
+
+# User Data API
+
+def load_user_profile(storage, user_id):
+    # This is a placeholder. In a real application, you would fetch this data from a database.
+    user = {
+        'user_id': user_id,
+        'name': 'John Doe',
+        'email': 'johndoe@example.com',
+        'phone': '+1234567890',
+        'kyc_status': 'Verified',
+        'account_opening_date': '2022-01-01'
+    }
+    if storage is not None:
+        stored = storage.get_user(user_id)
+        if stored is None:
+            return None
+        user.update(stored)
+    return user
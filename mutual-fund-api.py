@@ -1,46 +1,59 @@
 from flask import Flask, request, jsonify
 from datetime import datetime
+import os
 import uuid
 
 app = Flask(__name__)
 
 # Assuming we have instances of our previously created classes
-fund_manager = FundManager()
-order_management_system = OrderManagementSystem(fund_manager)
-
-# Helper function to parse dates from strings
-def parse_date(date_string):
-    return datetime.strptime(date_string, "%Y-%m-%d").date()
+# Weekends plus the holidays listed in MF_TRADING_HOLIDAYS, if set
+trading_calendar = TradingCalendar(os.environ.get('MF_TRADING_HOLIDAYS'))
+# Payment signatures are checked against the merchant key secret; there is
+# no safe default, so refuse to start without it
+razorpay_key_secret = os.environ.get('RAZORPAY_KEY_SECRET')
+if not razorpay_key_secret:
+    raise RuntimeError('RAZORPAY_KEY_SECRET is not set')
+razorpay_client = MockRazorpayClient(razorpay_key_secret)
+# SIP auto-debits go through the async gateway client when it is configured
+payment_gateway = None
+if os.environ.get('PAYMENT_GATEWAY_ADDRESS'):
+    gateway_host, gateway_port = os.environ['PAYMENT_GATEWAY_ADDRESS'].rsplit(':', 1)
+    payment_gateway = AsyncGatewayClient(gateway_host, int(gateway_port), os.environ.get('RAZORPAY_KEY_ID', 'rzp_test'),
+                                         razorpay_key_secret)
+storage = None
+if os.environ.get('MF_DATABASE'):
+    # Shared SQLite database: every worker process sees the same funds and order book
+    storage = SQLiteStorage(os.environ['MF_DATABASE'])
+    fund_manager = SQLiteFundManager(storage, history_days=int(os.environ.get('MF_NAV_HISTORY_DAYS', 0)) or None)
+    order_management_system = SQLiteOrderManagementSystem(fund_manager, storage, calendar=trading_calendar,
+                                                          gateway=payment_gateway, razorpay_client=razorpay_client)
+elif os.environ.get('ORDER_JOURNAL_DIR'):
+    fund_manager = FundManager()
+    # Replay the durable order book left by the previous run
+    order_management_system = OrderManagementSystem.recover(
+        fund_manager, OrderJournal(os.environ['ORDER_JOURNAL_DIR']), snapshot_every=100000,
+        calendar=trading_calendar, gateway=payment_gateway, razorpay_client=razorpay_client)
+else:
+    fund_manager = FundManager()
+    order_management_system = OrderManagementSystem(fund_manager, calendar=trading_calendar, gateway=payment_gateway,
+                                                    razorpay_client=razorpay_client)
+
+@app.before_request
+def sync_fund_data():
+    # Pick up fund data written by other workers
+    if storage is not None:
+        fund_manager.sync()
 
 # Fund Management APIs
 @app.route('/funds', methods=['GET'])
 def get_all_funds():
-    funds = fund_manager.funds
-    return jsonify([{
-        'scheme_code': f.scheme_code,
-        'scheme_name': f.scheme_name,
-        'fund_house': f.fund_house,
-        'category': f.scheme_category,
-        'nav': f.get_current_nav()
-    } for f in funds.values()])
+    payload, status = build_fund_list_payload(fund_manager)
+    return jsonify(payload), status
 
 @app.route('/funds/<scheme_code>', methods=['GET'])
 def get_fund(scheme_code):
-    fund = fund_manager.get_fund(scheme_code)
-    if fund:
-        return jsonify({
-            'scheme_code': fund.scheme_code,
-            'scheme_name': fund.scheme_name,
-            'fund_house': fund.fund_house,
-            'category': fund.scheme_category,
-            'nav': fund.get_current_nav(),
-            'aum': fund.get_current_aum(),
-            'expense_ratio': fund.expense_ratio,
-            'risk_grade': fund.risk_grade,
-            'fund_manager': fund.fund_manager,
-            'inception_date': fund.inception_date.isoformat() if fund.inception_date else None,
-        })
-    return jsonify({'error': 'Fund not found'}), 404
+    payload, status = build_fund_payload(fund_manager, scheme_code)
+    return jsonify(payload), status
 
 # Order Management APIs
 @app.route('/orders/lumpsum', methods=['POST'])
@@ -60,14 +73,17 @@ def place_lumpsum_order():
 @app.route('/orders/sip', methods=['POST'])
 def place_sip_order():
     data = request.json
-    sip_id = order_management_system.place_sip_order(
-        data['user_id'],
-        data['fund_code'],
-        data['amount'],
-        data['frequency'],
-        parse_date(data['start_date']),
-        parse_date(data['end_date']) if 'end_date' in data else None
-    )
+    try:
+        sip_id = order_management_system.place_sip_order(
+            data['user_id'],
+            data['fund_code'],
+            data['amount'],
+            data['frequency'],
+            parse_date(data['start_date']),
+            parse_date(data['end_date']) if 'end_date' in data else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({'sip_id': sip_id}), 201
 
 @app.route('/orders/<order_id>/confirm-payment', methods=['POST'])
@@ -82,6 +98,16 @@ def confirm_payment(order_id):
         return jsonify({'message': 'Payment confirmed successfully'}), 200
     return jsonify({'error': 'Payment confirmation failed'}), 400
 
+@app.route('/orders/payments/confirm', methods=['POST'])
+def confirm_payments():
+    # Batched payment callbacks: a list of {order_id, payment_id, signature}
+    try:
+        payments = [(p['order_id'], p['payment_id'], p['signature']) for p in request.json]
+    except (KeyError, TypeError):
+        return jsonify({'error': 'Expected a list of {order_id, payment_id, signature}'}), 400
+    outcomes = order_management_system.confirm_payments(payments)
+    return jsonify(payment_outcome_counts(payments, outcomes)), 200
+
 @app.route('/orders/<order_id>/cancel', methods=['POST'])
 def cancel_order(order_id):
     success = order_management_system.cancel_order(order_id)
@@ -108,12 +134,20 @@ def get_sip_status(sip_id):
 
 @app.route('/users/<user_id>/orders', methods=['GET'])
 def get_user_orders(user_id):
-    orders = order_management_system.get_user_orders(user_id)
+    try:
+        filters = user_history_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid status/from/to/offset/limit'}), 400
+    orders = order_management_system.get_user_orders(user_id, **filters)
     return jsonify(orders)
 
 @app.route('/users/<user_id>/sips', methods=['GET'])
 def get_user_sips(user_id):
-    sips = order_management_system.get_user_sips(user_id)
+    try:
+        filters = user_history_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid status/from/to/offset/limit'}), 400
+    sips = order_management_system.get_user_sips(user_id, **filters)
     return jsonify(sips)
 
 # User Management APIs (assuming we have a User class)
@@ -140,8 +174,8 @@ def update_kyc(user_id):
 @app.route('/admin/process-orders', methods=['POST'])
 def process_orders():
     current_date = parse_date(request.json.get('date', datetime.now().strftime("%Y-%m-%d")))
-    order_management_system.process_orders(current_date)
-    return jsonify({'message': 'Orders processed successfully'}), 200
+    stats = order_management_system.process_orders(current_date)
+    return jsonify(process_orders_payload(stats)), 200
 
 if __name__ == '__main__':
     app.run(debug=True)
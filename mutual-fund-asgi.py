@@ -0,0 +1,279 @@
+from quart import Quart, request, jsonify
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+import asyncio
+import os
+
+app = Quart(__name__)
+
+# ASGI serving mode for the routes of mutual-fund-api.py and
+# mutual-fund-api (1).py. Handlers run on the event loop and never block it:
+# every change to the order book runs on AppState.writer, a single thread,
+# so changes apply one at a time in arrival order. Fund data reads (NAV
+# resampling, returns, fund listings) run on AppState.readers; reads of
+# orders, SIPs and portfolios go through AppState.read_orders, which only
+# uses the readers when the order book lives in SQLite. Payloads come from
+# the same builders the Flask apps use (mutual-fund-api-payloads.py).
+
+class AppState:
+    def __init__(self, environ=os.environ):
+        # Same wiring as the Flask apps
+        self.trading_calendar = TradingCalendar(environ.get('MF_TRADING_HOLIDAYS'))
+        # No safe default for the key secret payment signatures are checked with
+        key_secret = environ.get('RAZORPAY_KEY_SECRET')
+        if not key_secret:
+            raise RuntimeError('RAZORPAY_KEY_SECRET is not set')
+        self.razorpay_client = MockRazorpayClient(key_secret)
+        self.payment_gateway = None
+        if environ.get('PAYMENT_GATEWAY_ADDRESS'):
+            gateway_host, gateway_port = environ['PAYMENT_GATEWAY_ADDRESS'].rsplit(':', 1)
+            self.payment_gateway = AsyncGatewayClient(gateway_host, int(gateway_port), environ.get('RAZORPAY_KEY_ID', 'rzp_test'),
+                                                      key_secret)
+        options = {'calendar': self.trading_calendar, 'gateway': self.payment_gateway,
+                   'razorpay_client': self.razorpay_client}
+        self.storage = None
+        if environ.get('MF_DATABASE'):
+            self.storage = SQLiteStorage(environ['MF_DATABASE'])
+            self.fund_manager = SQLiteFundManager(self.storage,
+                                                  history_days=int(environ.get('MF_NAV_HISTORY_DAYS', 0)) or None)
+            self.order_management_system = SQLiteOrderManagementSystem(self.fund_manager, self.storage, **options)
+        elif environ.get('ORDER_JOURNAL_DIR'):
+            self.fund_manager = FundManager()
+            self.order_management_system = OrderManagementSystem.recover(
+                self.fund_manager, OrderJournal(environ['ORDER_JOURNAL_DIR']), snapshot_every=100000, **options)
+        else:
+            self.fund_manager = FundManager()
+            self.order_management_system = OrderManagementSystem(self.fund_manager, **options)
+        self.dashboard_service = DashboardService(self.order_management_system, self.fund_manager,
+                                                  lambda user_id: load_user_profile(self.storage, user_id))
+        self.response_cache = ResponseCache()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='oms-writer')
+        self.readers = ThreadPoolExecutor(max_workers=int(environ.get('MF_ASGI_READERS', 8)),
+                                          thread_name_prefix='oms-reader')
+
+    async def write(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.writer, partial(func, *args, **kwargs))
+
+    async def read(self, func, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self.readers, partial(func, *args, **kwargs))
+
+    async def read_orders(self, func, *args, **kwargs):
+        # The in-memory order book is only safe to read between writes, so
+        # queue behind them on the writer; SQLite reads get their own
+        # connection per reader thread
+        if self.storage is None:
+            return await self.write(func, *args, **kwargs)
+        return await self.read(func, *args, **kwargs)
+
+    def close(self):
+        self.writer.shutdown()
+        self.readers.shutdown()
+        self.dashboard_service.close()
+
+state = AppState()
+
+@app.after_serving
+async def shutdown():
+    state.close()
+
+@app.before_request
+async def sync_fund_data():
+    # Pick up fund data written by other workers
+    if state.storage is not None:
+        await state.read(state.fund_manager.sync)
+
+def json_response(payload, status=200):
+    return app.response_class(encode_json(payload), status=status, mimetype='application/json')
+
+async def cached_json_response(build, *args):
+    # `build(fund_manager, *args)` returns (payload, status) and only runs
+    # on a cache miss, on a reader thread
+    fund_manager = state.fund_manager
+    status, body, etag = await state.read(state.response_cache.lookup, cache_key(request.path, request.args),
+                                          fund_manager.version, lambda: build(fund_manager, *args))
+    if status == 200 and request.if_none_match.contains_weak(etag):
+        response = app.response_class(b'', status=304)
+    else:
+        response = app.response_class(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+# Fund Management APIs
+@app.route('/funds', methods=['GET'])
+async def get_all_funds():
+    return json_response(*await state.read(build_fund_list_payload, state.fund_manager))
+
+@app.route('/funds/<scheme_code>', methods=['GET'])
+async def get_fund(scheme_code):
+    return json_response(*build_fund_payload(state.fund_manager, scheme_code))
+
+# Order Management APIs
+@app.route('/orders/lumpsum', methods=['POST'])
+async def place_lumpsum_order():
+    data = await request.get_json()
+    order_id, razorpay_order_id = await state.write(
+        state.order_management_system.place_lump_sum_order,
+        data['user_id'],
+        data['fund_code'],
+        data['amount'],
+        data['order_type']
+    )
+    return jsonify({
+        'order_id': order_id,
+        'razorpay_order_id': razorpay_order_id
+    }), 201
+
+@app.route('/orders/sip', methods=['POST'])
+async def place_sip_order():
+    data = await request.get_json()
+    try:
+        sip_id = await state.write(
+            state.order_management_system.place_sip_order,
+            data['user_id'],
+            data['fund_code'],
+            data['amount'],
+            data['frequency'],
+            parse_date(data['start_date']),
+            parse_date(data['end_date']) if 'end_date' in data else None
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'sip_id': sip_id}), 201
+
+@app.route('/orders/<order_id>/confirm-payment', methods=['POST'])
+async def confirm_payment(order_id):
+    data = await request.get_json()
+    success = await state.write(state.order_management_system.confirm_payment, order_id, data['payment_id'],
+                                data['signature'])
+    if success:
+        return jsonify({'message': 'Payment confirmed successfully'}), 200
+    return jsonify({'error': 'Payment confirmation failed'}), 400
+
+@app.route('/orders/payments/confirm', methods=['POST'])
+async def confirm_payments():
+    # Batched payment callbacks: a list of {order_id, payment_id, signature}
+    try:
+        payments = [(p['order_id'], p['payment_id'], p['signature']) for p in await request.get_json()]
+    except (KeyError, TypeError):
+        return jsonify({'error': 'Expected a list of {order_id, payment_id, signature}'}), 400
+    outcomes = await state.write(state.order_management_system.confirm_payments, payments)
+    return jsonify(payment_outcome_counts(payments, outcomes)), 200
+
+@app.route('/orders/<order_id>/cancel', methods=['POST'])
+async def cancel_order(order_id):
+    success = await state.write(state.order_management_system.cancel_order, order_id)
+    if success:
+        return jsonify({'message': 'Order cancelled successfully'}), 200
+    return jsonify({'error': 'Order cancellation failed'}), 400
+
+@app.route('/orders/sip/<sip_id>/stop', methods=['POST'])
+async def stop_sip(sip_id):
+    success = await state.write(state.order_management_system.stop_sip, sip_id)
+    if success:
+        return jsonify({'message': 'SIP stopped successfully'}), 200
+    return jsonify({'error': 'SIP stop failed'}), 400
+
+@app.route('/orders/<order_id>', methods=['GET'])
+async def get_order_status(order_id):
+    status = await state.read_orders(state.order_management_system.get_order_status, order_id)
+    return jsonify({'order_id': order_id, 'status': status})
+
+@app.route('/orders/sip/<sip_id>', methods=['GET'])
+async def get_sip_status(sip_id):
+    status = await state.read_orders(state.order_management_system.get_sip_status, sip_id)
+    return jsonify({'sip_id': sip_id, 'status': status})
+
+@app.route('/users/<user_id>/orders', methods=['GET'])
+async def get_user_orders(user_id):
+    try:
+        filters = user_history_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid status/from/to/offset/limit'}), 400
+    return jsonify(await state.read_orders(state.order_management_system.get_user_orders, user_id, **filters))
+
+@app.route('/users/<user_id>/sips', methods=['GET'])
+async def get_user_sips(user_id):
+    try:
+        filters = user_history_filters(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid status/from/to/offset/limit'}), 400
+    return jsonify(await state.read_orders(state.order_management_system.get_user_sips, user_id, **filters))
+
+# User Management APIs (assuming we have a User class)
+@app.route('/users/<user_id>', methods=['GET'])
+async def get_user(user_id):
+    # This is a placeholder. You would typically fetch this from a database.
+    user = {
+        'user_id': user_id,
+        'name': 'John Doe',
+        'email': 'johndoe@example.com',
+        'kyc_status': 'Verified'
+    }
+    return jsonify(user)
+
+@app.route('/users/<user_id>/kyc', methods=['POST'])
+async def update_kyc(user_id):
+    data = await request.get_json()
+    # This is a placeholder. You would typically update this in a database.
+    # Assume we have a update_kyc method in our User class
+    # user.update_kyc(data)
+    return jsonify({'message': 'KYC updated successfully'}), 200
+
+# Admin APIs
+@app.route('/admin/process-orders', methods=['POST'])
+async def process_orders():
+    data = await request.get_json()
+    current_date = parse_date(data.get('date', datetime.now().strftime("%Y-%m-%d")))
+    # On the writer thread, which has no event loop of its own, so gateway
+    # debits can still run their own
+    stats = await state.write(state.order_management_system.process_orders, current_date)
+    return jsonify(process_orders_payload(stats)), 200
+
+# Fund Data API
+@app.route('/api/funds', methods=['GET'])
+async def get_funds():
+    if wants_ndjson(request.args, request.accept_mimetypes):
+        funds, error = await state.read(find_streamed_funds, state.fund_manager, request.args)
+        if error:
+            return jsonify(error), 400
+        return app.response_class(stream_funds_ndjson(funds), mimetype='application/x-ndjson')
+    return await cached_json_response(build_funds_payload, request.args)
+
+async def stream_funds_ndjson(funds):
+    # One JSON object per line, encoded a chunk of funds at a time
+    for i in range(0, len(funds), STREAM_CHUNK_SIZE):
+        chunk = await state.read(encode_funds_chunk, state.fund_manager, funds[i:i + STREAM_CHUNK_SIZE])
+        yield chunk.encode()
+
+@app.route('/api/funds/search', methods=['GET'])
+async def search_funds():
+    return await cached_json_response(build_search_payload, request.args)
+
+@app.route('/api/funds/<scheme_code>', methods=['GET'])
+async def get_fund_details(scheme_code):
+    return await cached_json_response(build_fund_details_payload, scheme_code)
+
+@app.route('/api/funds/<scheme_code>/nav', methods=['GET'])
+async def get_fund_nav_history(scheme_code):
+    return await cached_json_response(build_nav_history_payload, scheme_code, request.args)
+
+# User Data API
+@app.route('/api/users/<user_id>', methods=['GET'])
+async def get_user_data(user_id):
+    # Home screen: served from the per-user cache on repeat loads
+    dashboard = await state.read_orders(state.dashboard_service.get, user_id)
+    if dashboard is None:
+        return jsonify({'error': 'User not found'}), 404
+    return jsonify(dashboard.to_dict())
+
+@app.route('/api/users/<user_id>/portfolio', methods=['GET'])
+async def get_user_portfolio(user_id):
+    # Holdings valued at the latest NAVs, plus totals
+    return jsonify(await state.read_orders(portfolio_valuation, user_id))
+
+def portfolio_valuation(user_id):
+    return state.order_management_system.get_portfolio(user_id).valuation(state.fund_manager)
+
+if __name__ == '__main__':
+    app.run(host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', 5000)))
@@ -1,5 +1,8 @@
+from array import array
 from datetime import datetime
 
+import numpy as np
+
 class User:
     def __init__(self, user_id, name, email):
         self.user_id = user_id
@@ -64,9 +67,254 @@ class User:
 
 class Watchlist:
     # ... (unchanged)
+    def __init__(self, user_id):
+        self.user_id = user_id
 
 class Portfolio:
-    # ... (unchanged)
+    # Holdings ledger: one slot per scheme with units and cost basis in
+    # parallel arrays, so recording an execution is O(1) and valuation is a
+    # single vectorized pass over the holdings. Cash flows are kept alongside
+    # for XIRR, from the investor's side: purchases negative, redemptions
+    # positive.
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.scheme_codes = []
+        self._slots = {}
+        self.units = array("d")
+        self.cost = array("d")
+        self.flow_slots = array("i")
+        self.flow_days = array("i")
+        self.flow_amounts = array("d")
+        # Bumped by every change to the holdings or cash flows
+        self.version = 0
+        # (key, rates) of the last XIRR solve, see valuation()
+        self._xirr = None
+
+    def __len__(self):
+        return len(self.scheme_codes)
+
+    def _slot(self, scheme_code):
+        slot = self._slots.get(scheme_code)
+        if slot is None:
+            slot = self._slots[scheme_code] = len(self.scheme_codes)
+            self.scheme_codes.append(scheme_code)
+            self.units.append(0.0)
+            self.cost.append(0.0)
+        return slot
+
+    def add_units(self, scheme_code, units, amount):
+        slot = self._slot(scheme_code)
+        self.units[slot] += units
+        self.cost[slot] += amount
+        self.version += 1
+
+    def redeem_units(self, scheme_code, units):
+        # Cost basis is reduced at the average cost of the units held
+        slot = self._slots.get(scheme_code)
+        if slot is None or self.units[slot] <= 0:
+            return 0.0
+        units = min(units, self.units[slot])
+        self.cost[slot] -= self.cost[slot] * units / self.units[slot]
+        self.units[slot] -= units
+        self.version += 1
+        return units
+
+    def record_cash_flow(self, scheme_code, day, amount):
+        self.flow_slots.append(self._slot(scheme_code))
+        self.flow_days.append(day.toordinal())
+        self.flow_amounts.append(amount)
+        self.version += 1
+
+    def get_holding(self, scheme_code):
+        slot = self._slots.get(scheme_code)
+        if slot is None:
+            return None
+        return {"units": self.units[slot], "cost": self.cost[slot]}
+
+    def state(self):
+        # Copies, so the state can be pickled while the ledger moves on
+        return {
+            "scheme_codes": self.scheme_codes[:],
+            "units": self.units[:],
+            "cost": self.cost[:],
+            "flow_slots": self.flow_slots[:],
+            "flow_days": self.flow_days[:],
+            "flow_amounts": self.flow_amounts[:]
+        }
+
+    def ledger(self):
+        # (scheme codes, units, cost) copied at one length. numpy views over
+        # the live arrays would stop the executing writer from growing them,
+        # and _slot() appends cost last, so its length bounds the others.
+        count = len(self.cost)
+        return (self.scheme_codes[:count], np.frombuffer(self.units[:count], dtype=np.float64),
+                np.frombuffer(self.cost[:count], dtype=np.float64))
+
+    def flows(self):
+        # (amounts, date ordinals, slots) copied the same way; amounts are
+        # appended last. Take these before ledger() so every slot is covered.
+        count = len(self.flow_amounts)
+        return (np.frombuffer(self.flow_amounts[:count], dtype=np.float64),
+                np.frombuffer(self.flow_days[:count], dtype=np.int32),
+                np.frombuffer(self.flow_slots[:count], dtype=np.int32))
+
+    @classmethod
+    def from_state(cls, user_id, state):
+        portfolio = cls(user_id)
+        for name, value in state.items():
+            setattr(portfolio, name, value)
+        portfolio._slots = {code: slot for slot, code in enumerate(portfolio.scheme_codes)}
+        return portfolio
+
+    def valuation(self, fund_manager, as_of=None):
+        # Joins the holdings with the latest-NAV vector; holdings fully
+        # redeemed are left out. XIRR treats the current value as redeemed
+        # on `as_of` (default today).
+        version = self.version
+        flows = self.flows()
+        scheme_codes, units, cost = self.ledger()
+        held = units > 1e-9
+        navs = fund_manager.latest_navs(scheme_codes)
+        values = units * navs
+        with np.errstate(divide="ignore", invalid="ignore"):
+            average_cost = cost / units
+            returns = np.round((values - cost) / cost * 100.0, 2)
+        valued = ~np.isnan(values)
+        # The solve runs over the whole cash-flow history, so it is only
+        # repeated once the ledger, the NAVs or the valuation day move
+        key = (version, len(scheme_codes), fund_manager.version, as_of or datetime.now().date())
+        cached = self._xirr
+        if cached is not None and cached[0] == key:
+            rates = cached[1]
+        else:
+            # Series 0 is the whole portfolio, 1 + slot each holding
+            amounts, days, slots = _portfolio_flows(flows, values, as_of)
+            rates = xirr(np.concatenate([amounts, amounts]), np.concatenate([days, days]),
+                         np.concatenate([np.zeros(len(slots), dtype=np.int64), slots + 1]), len(scheme_codes) + 1)
+            self._xirr = (key, rates)
+
+        holdings = []
+        for i in np.flatnonzero(held).tolist():
+            fund = fund_manager.get_fund(scheme_codes[i])
+            holdings.append({
+                "scheme_code": scheme_codes[i],
+                "scheme_name": fund.scheme_name if fund else None,
+                "units": float(units[i]),
+                "average_cost": float(average_cost[i]),
+                "invested": float(cost[i]),
+                "current_nav": float(navs[i]) if valued[i] else None,
+                "current_value": float(values[i]) if valued[i] else None,
+                "profit_loss": float(values[i] - cost[i]) if valued[i] else None,
+                "returns": float(returns[i]) if valued[i] and cost[i] > 0 else None,
+                "xirr": _percent(rates[i + 1])
+            })
+        total_value = float(values[held & valued].sum())
+        total_cost = float(cost[held].sum())
+        return {
+            "holdings": holdings,
+            "total_investment": total_cost,
+            "current_value": total_value,
+            "profit_loss": total_value - float(cost[held & valued].sum()),
+            "xirr": _percent(rates[0])
+        }
+
+DAYS_PER_YEAR = 365.0
+
+def xirr(amounts, days, series, count, tol=1e-10, max_iterations=100):
+    # Annualized IRR of `count` cash-flow series solved together: flow k
+    # (amount, date ordinal) belongs to series[k]. Each series keeps a
+    # bracket around its root and a Newton step that would leave the
+    # bracket is replaced by bisection, so every iteration is a handful of
+    # array operations over all flows. Series without a sign change, or
+    # that don't converge, come back as NaN.
+    amounts = np.asarray(amounts, dtype=np.float64)
+    days = np.asarray(days, dtype=np.float64)
+    series = np.asarray(series, dtype=np.int64)
+    first = np.full(count, np.inf)
+    np.minimum.at(first, series, days)
+    years = (days - first[series]) / DAYS_PER_YEAR
+
+    def npv(rate):
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            discounted = amounts * np.exp(-years * np.log1p(rate)[series])
+            value = np.bincount(series, discounted, minlength=count)
+            slope = -np.bincount(series, years * discounted, minlength=count) / (1.0 + rate)
+        return value, slope
+
+    lo = np.full(count, -0.999999)
+    hi = np.full(count, 1.0)
+    f_lo = npv(lo)[0]
+    f_hi = npv(hi)[0]
+    for _ in range(8):
+        widen = np.sign(f_lo) == np.sign(f_hi)
+        if not widen.any():
+            break
+        hi = np.where(widen, hi * 10.0, hi)
+        f_hi = np.where(widen, npv(hi)[0], f_hi)
+
+    valid = (np.sign(f_lo) != np.sign(f_hi)) & np.isfinite(f_lo) & np.isfinite(f_hi)
+    # NPVs this close to zero, relative to the flows, are roots
+    scale = np.bincount(series, np.abs(amounts), minlength=count)
+    rate = np.full(count, 0.1)
+    active = valid.copy()
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        value, slope = npv(rate)
+        # Checked before the bracket moves: an exact guess would otherwise
+        # become a bracket end, and the Newton step onto it be rejected
+        converged = np.abs(value) <= tol * scale
+        below = (np.sign(value) == np.sign(f_lo)) & ~converged
+        lo = np.where(below, rate, lo)
+        f_lo = np.where(below, value, f_lo)
+        hi = np.where(below | converged, hi, rate)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = rate - value / slope
+        step = np.where(np.isfinite(step) & (step > lo) & (step < hi), step, (lo + hi) / 2)
+        step = np.where(converged, rate, step)
+        done = converged | (np.abs(step - rate) <= tol * (1.0 + np.abs(rate)))
+        rate = np.where(active, step, rate)
+        active &= ~done
+    return np.where(valid & ~active, rate, np.nan)
+
+def portfolio_xirr(portfolios, fund_manager, as_of=None, by_scheme=False):
+    # XIRR in percent for many portfolios in one solve: {user_id: rate}, or
+    # {(user_id, scheme_code): rate} with by_scheme
+    amounts, days, series, keys = [], [], [], []
+    for portfolio in portfolios:
+        flows = portfolio.flows()
+        scheme_codes, units, _ = portfolio.ledger()
+        values = units * fund_manager.latest_navs(scheme_codes)
+        flow_amounts, flow_days, slots = _portfolio_flows(flows, values, as_of)
+        amounts.append(flow_amounts)
+        days.append(flow_days)
+        if by_scheme:
+            series.append(slots + len(keys))
+            keys.extend((portfolio.user_id, code) for code in scheme_codes)
+        else:
+            series.append(np.full(len(slots), len(keys), dtype=np.int64))
+            keys.append(portfolio.user_id)
+    if not keys:
+        return {}
+    rates = xirr(np.concatenate(amounts), np.concatenate(days), np.concatenate(series), len(keys))
+    return {key: _percent(rate) for key, rate in zip(keys, rates.tolist())}
+
+def _portfolio_flows(flows, values, as_of):
+    # Recorded flows (Portfolio.flows()) plus each holding's current value
+    # as a final inflow on `as_of`, with the holding slot of every flow
+    amounts, days, slots = flows
+    today = (as_of or datetime.now().date()).toordinal()
+    holdings = np.arange(len(values), dtype=np.int64)
+    return (
+        np.concatenate([amounts, values]),
+        np.concatenate([days, np.full(len(values), today, dtype=np.int32)]),
+        np.concatenate([slots.astype(np.int64), holdings])
+    )
+
+def _percent(rate):
+    return None if np.isnan(rate) else round(float(rate) * 100.0, 2)
 
 class Orders:
     # ... (unchanged)
+    def __init__(self, user_id):
+        self.user_id = user_id
@@ -0,0 +1,226 @@
+from datetime import date, datetime
+import glob
+import os
+import pickle
+import struct
+import threading
+import time
+import zlib
+
+# Write-ahead journal for OrderManagementSystem. Every state transition is
+# appended as a length-prefixed, CRC-checked binary record; a background
+# thread writes and fsyncs whatever has accumulated (group commit), and
+# callers wait only for the commit covering their last record. Snapshots
+# roll the journal over to a new segment so recovery is "load the newest
+# snapshot, replay the segments after it".
+
+RECORD_HEADER = struct.Struct("<IIB")  # payload length, crc32, op code
+OPS = ("place", "place_sip", "status", "execute", "sip_status", "sip_progress")
+OP_CODES = {op: code for code, op in enumerate(OPS)}
+
+def encode_fields(fields):
+    out = bytearray()
+    for value in fields:
+        if value is None:
+            out += b"N"
+        elif isinstance(value, bool):
+            out += b"B" + struct.pack("<?", value)
+        elif isinstance(value, int):
+            out += b"I" + struct.pack("<q", value)
+        elif isinstance(value, float):
+            out += b"F" + struct.pack("<d", value)
+        elif isinstance(value, str):
+            data = value.encode()
+            out += b"S" + struct.pack("<H", len(data)) + data
+        elif isinstance(value, datetime):
+            out += b"T" + struct.pack("<q", (value - EPOCH) // MICROSECOND)
+        elif isinstance(value, date):
+            out += b"D" + struct.pack("<i", value.toordinal())
+        else:
+            raise TypeError(f"Cannot journal value of type {type(value).__name__}")
+    return bytes(out)
+
+def decode_fields(data):
+    fields = []
+    i = 0
+    while i < len(data):
+        tag = data[i:i + 1]
+        i += 1
+        if tag == b"N":
+            fields.append(None)
+        elif tag == b"B":
+            fields.append(data[i] != 0)
+            i += 1
+        elif tag == b"I":
+            fields.append(struct.unpack_from("<q", data, i)[0])
+            i += 8
+        elif tag == b"F":
+            fields.append(struct.unpack_from("<d", data, i)[0])
+            i += 8
+        elif tag == b"S":
+            (length,) = struct.unpack_from("<H", data, i)
+            fields.append(data[i + 2:i + 2 + length].decode())
+            i += 2 + length
+        elif tag == b"T":
+            fields.append(EPOCH + struct.unpack_from("<q", data, i)[0] * MICROSECOND)
+            i += 8
+        elif tag == b"D":
+            fields.append(date.fromordinal(struct.unpack_from("<i", data, i)[0]))
+            i += 4
+        else:
+            raise ValueError(f"Unknown field tag {tag!r}")
+    return tuple(fields)
+
+class OrderJournal:
+    def __init__(self, directory, fsync=True, commit_interval=0):
+        self.directory = directory
+        self.fsync = fsync
+        self.commit_interval = commit_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Condition()
+        # Serializes file writes between the writer thread and snapshot()
+        self._io_lock = threading.Lock()
+        self._buffer = bytearray()
+        self._appended = 0
+        self._committed = 0
+        self._closed = False
+
+        segments = self._segments()
+        self._segment = segments[-1] if segments else 0
+        self._file = open(self._segment_path(self._segment), "ab")
+        # Drop a torn record left by a crash so new appends stay readable
+        self._file.truncate(_valid_length(self._segment_path(self._segment)))
+        self._writer = threading.Thread(target=self._write_loop, name="order-journal", daemon=True)
+        self._writer.start()
+
+    @property
+    def appended(self):
+        return self._appended
+
+    def append(self, op, fields):
+        record = encode_fields(fields)
+        header = RECORD_HEADER.pack(len(record), zlib.crc32(record), OP_CODES[op])
+        with self._lock:
+            self._buffer += header
+            self._buffer += record
+            self._appended += 1
+            self._lock.notify_all()
+            return self._appended
+
+    def wait(self, sequence=None):
+        # Blocks until every record up to `sequence` (default: all appended
+        # so far) is on disk
+        with self._lock:
+            target = self._appended if sequence is None else sequence
+            while self._committed < target and not self._closed:
+                self._lock.wait()
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while not self._buffer and not self._closed:
+                    self._lock.wait()
+                if self._closed and not self._buffer:
+                    return
+            # Records appended while the previous fsync ran are committed
+            # together; an optional delay lets more of them pile up
+            if self.commit_interval:
+                time.sleep(self.commit_interval)
+            self._flush()
+
+    def _flush(self, roll_over=False):
+        with self._io_lock:
+            with self._lock:
+                data, self._buffer = self._buffer, bytearray()
+                sequence = self._appended
+            if data:
+                self._file.write(data)
+            self._file.flush()
+            if self.fsync or roll_over:
+                os.fsync(self._file.fileno())
+            if roll_over:
+                self._file.close()
+                self._segment += 1
+                self._file = open(self._segment_path(self._segment), "ab")
+            segment = self._segment
+        with self._lock:
+            self._committed = max(self._committed, sequence)
+            self._lock.notify_all()
+        return segment
+
+    def snapshot(self, state):
+        # Rolls over to a new segment and stores `state` as the starting
+        # point for it; older segments and snapshots are then removed
+        self.write_snapshot(self.roll_over(), state)
+
+    def roll_over(self):
+        # Starts a new segment and returns its number: a snapshot of the
+        # state as of this call belongs to it
+        return self._flush(roll_over=True)
+
+    def write_snapshot(self, segment, state):
+        path = os.path.join(self.directory, f"snapshot.{segment:08d}.pickle")
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+        for old in self._segments():
+            if old < segment:
+                os.remove(self._segment_path(old))
+        for old in glob.glob(os.path.join(self.directory, "snapshot.*.pickle")):
+            if old != path:
+                os.remove(old)
+
+    def load(self):
+        # Returns (snapshot state or None, iterator of (op, fields) to replay)
+        snapshots = sorted(glob.glob(os.path.join(self.directory, "snapshot.*.pickle")))
+        state, start = None, 0
+        if snapshots:
+            with open(snapshots[-1], "rb") as f:
+                state = pickle.load(f)
+            start = int(os.path.basename(snapshots[-1]).split(".")[1])
+        return state, self._replay(start)
+
+    def _replay(self, start):
+        for segment in self._segments():
+            if segment < start:
+                continue
+            with open(self._segment_path(segment), "rb") as f:
+                data = f.read()
+            for code, record in _records(data):
+                yield OPS[code], decode_fields(record)
+
+    def close(self):
+        self.wait()
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+        self._writer.join()
+        self._file.close()
+
+    def _segments(self):
+        paths = glob.glob(os.path.join(self.directory, "journal.*.log"))
+        return sorted(int(os.path.basename(path).split(".")[1]) for path in paths)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"journal.{segment:08d}.log")
+
+def _records(data):
+    # Yields (op code, payload) until the end of `data` or the first torn
+    # or corrupt record
+    i = 0
+    while i + RECORD_HEADER.size <= len(data):
+        length, crc, code = RECORD_HEADER.unpack_from(data, i)
+        record = data[i + RECORD_HEADER.size:i + RECORD_HEADER.size + length]
+        if len(record) < length or zlib.crc32(record) != crc:
+            return
+        yield code, record
+        i += RECORD_HEADER.size + length
+
+def _valid_length(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    return sum(RECORD_HEADER.size + len(record) for _, record in _records(data))
@@ -1,8 +1,33 @@
-from datetime import datetime, timedelta
+from array import array
+from bisect import bisect_left, bisect_right
+import asyncio
+from collections import defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from copy import copy
+from datetime import date, datetime, timedelta
+from functools import wraps
+from itertools import islice
+from time import perf_counter
+import hashlib
+import heapq
+import hmac
+import threading
 import uuid
+import zlib
+
+import numpy as np
+
+# Orders received before 3 PM get that day's NAV, later ones the next day's
+NAV_CUTOFF_HOUR = 15
 
 # Mock Razorpay client for demonstration purposes
 class MockRazorpayClient:
+    def __init__(self, key_secret="rzp_test_secret"):
+        self.key_secret = key_secret
+        # Keyed once; each signature copies this state rather than rekeying
+        self._mac = hmac.new(key_secret.encode(), digestmod=hashlib.sha256)
+
     def create_order(self, amount, currency="INR"):
         return {
             "id": f"order_{uuid.uuid4().hex}",
@@ -13,20 +38,405 @@ class MockRazorpayClient:
             "created_at": int(datetime.now().timestamp())
         }
 
+    def sign(self, razorpay_order_id, razorpay_payment_id):
+        return payment_signature(self.key_secret, razorpay_order_id, razorpay_payment_id, self._mac)
+
+    def simulate_payment(self, razorpay_order_id):
+        # The payment id and signature a successful checkout hands back
+        payment_id = f"pay_{uuid.uuid4().hex}"
+        return payment_id, self.sign(razorpay_order_id, payment_id)
+
+    def verify_signature(self, razorpay_order_id, razorpay_payment_id, signature):
+        if not isinstance(signature, str):
+            return False
+        return hmac.compare_digest(self.sign(razorpay_order_id, razorpay_payment_id).encode(), signature.encode())
+
     def verify_payment_signature(self, params_dict):
-        # In a real scenario, this would verify the signature
-        return True
+        return self.verify_signature(params_dict["razorpay_order_id"], params_dict["razorpay_payment_id"],
+                                     params_dict["razorpay_signature"])
+
+# numpy's NaT, so a batch of timestamps decodes with a datetime64 view
+NO_TIMESTAMP = -1 << 63
+
+class _Column:
+    # One field of a _Table, encoded into a typed array. get() and set()
+    # work on one row, take() and put() on a batch through a numpy view of
+    # the array. A view pins the array's buffer, so batches are only taken
+    # by the bulk paths, which run under the OMS write lock like appends.
+    typecode = dtype = None
+
+    def __init__(self):
+        self.data = array(self.typecode)
+
+    def encode(self, value):
+        return value
+
+    def decode(self, value):
+        return value
+
+    def decode_many(self, values):
+        return values.tolist()
+
+    def push(self, row, encoded):
+        self.data.append(encoded)
+
+    def get(self, row):
+        return self.decode(self.data[row])
+
+    def set(self, row, value):
+        self.data[row] = self.encode(value)
+
+    def take(self, rows):
+        return self.decode_many(np.frombuffer(self.data, self.dtype)[np.array(rows, dtype=np.intp)])
+
+    def put(self, rows, values):
+        view = np.frombuffer(self.data, self.typecode)
+        view[np.array(rows, dtype=np.intp)] = [self.encode(value) for value in values]
+
+    def copy(self):
+        column = copy(self)
+        column.data = copy(self.data)
+        return column
+
+class _StrColumn(_Column):
+    # Unique strings, in a row -> value dict rather than a list: a dict of
+    # strings is never visited by the garbage collector, a list is walked
+    # element by element
+    def __init__(self):
+        self.data = {}
+
+    def push(self, row, encoded):
+        self.data[row] = encoded
+
+    def take(self, rows):
+        return list(map(self.data.__getitem__, rows))
+
+    def put(self, rows, values):
+        for row, value in zip(rows, values):
+            self.data[row] = value
+
+class _InternedColumn(_Column):
+    # Repeated strings (user ids, fund codes, statuses) as small integer
+    # codes; both maps hold only strings and ints
+    typecode = 'i'
+    dtype = np.int32
+
+    def __init__(self):
+        super().__init__()
+        self.codes = {}
+        self.values = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values[code] = value
+            self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+    def decode_many(self, codes):
+        return list(map(self.values.__getitem__, codes.tolist()))
+
+class _FloatColumn(_Column):
+    # None is stored as NaN
+    typecode = 'd'
+    dtype = np.float64
+
+    def encode(self, value):
+        return np.nan if value is None else value
+
+    def decode(self, value):
+        return None if value != value else value
+
+    def decode_many(self, values):
+        decoded = values.tolist()
+        if np.isnan(values).any():
+            decoded = [None if value != value else value for value in decoded]
+        return decoded
+
+class _TimestampColumn(_Column):
+    # Microseconds since the epoch
+    typecode = 'q'
+    dtype = 'datetime64[us]'
+
+    def encode(self, value):
+        return NO_TIMESTAMP if value is None else (value - EPOCH) // MICROSECOND
+
+    def decode(self, value):
+        return None if value == NO_TIMESTAMP else EPOCH + value * MICROSECOND
+
+class _DateColumn(_Column):
+    # Ordinals; 0 is never a real date and stands for None
+    typecode = 'i'
+    dtype = np.int32
+
+    def encode(self, value):
+        return 0 if value is None else value.toordinal()
+
+    def decode(self, value):
+        return date.fromordinal(value) if value else None
+
+    def decode_many(self, ordinals):
+        days = (ordinals - EPOCH_ORDINAL).astype('datetime64[D]')
+        days[ordinals == 0] = np.datetime64('NaT')
+        return days.tolist()
+
+COLUMN_TYPES = {
+    'str': _StrColumn,
+    'interned': _InternedColumn,
+    'float': _FloatColumn,
+    'timestamp': _TimestampColumn,
+    'date': _DateColumn
+}
+
+class _Table(Mapping):
+    # Struct-of-arrays store for orders or SIPs: one _Column per field and
+    # id -> row in a dict. No container holds another container, so a
+    # million records add nothing for the garbage collector to traverse.
+    # Records are read and written one at a time through _Row views with
+    # the dict interface the rest of the code uses: record['status'],
+    # .get(), items(), dict(record), == against a dict. The bulk paths read
+    # and write whole batches with columns() and assign() instead.
+    KEY = None
+    COLUMNS = {}
+
+    def __init__(self, records=()):
+        self._rows = {}
+        self._columns = {name: COLUMN_TYPES[kind]() for name, kind in self.COLUMNS.items()}
+        for record in records:
+            self[record[self.KEY]] = record
+
+    def __getitem__(self, key):
+        return _Row(self._columns, self._rows[key])
+
+    def get(self, key, default=None):
+        row = self._rows.get(key)
+        return default if row is None else _Row(self._columns, row)
+
+    def row_of(self, key):
+        # Rows are numbered in insertion order and never reused
+        return self._rows[key]
+
+    def at(self, row):
+        return _Row(self._columns, row)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __setitem__(self, key, record):
+        # Adds a record (a mapping with every field), or overwrites every
+        # field of an existing one. Everything is encoded before the first
+        # column changes.
+        encoded = [(column, column.encode(record[name])) for name, column in self._columns.items()]
+        row = self._rows.get(key)
+        if row is None:
+            # One int object shared by every reference to the row
+            row = len(self._rows)
+            for column, value in encoded:
+                column.push(row, value)
+            # Published last, so a reader never finds a row without data
+            self._rows[key] = row
+        else:
+            for column, value in encoded:
+                column.data[row] = value
+
+    def columns(self, keys, names):
+        # One list of decoded values per name, in `keys` order
+        rows = list(map(self._rows.__getitem__, keys))
+        if not rows:
+            return [[] for _ in names]
+        return [self._columns[name].take(rows) for name in names]
+
+    def assign(self, keys, name, values):
+        rows = list(map(self._rows.__getitem__, keys))
+        if rows:
+            self._columns[name].put(rows, values)
+
+    def capture(self):
+        # Copies of the row index and the columns, cheap enough to take
+        # under a lock; decode_capture() turns them into plain dicts later.
+        # Interned codes are never reassigned, so the copies can share
+        # their maps.
+        return dict(self._rows), {name: column.copy() for name, column in self._columns.items()}
+
+    @staticmethod
+    def decode_capture(capture):
+        rows, columns = capture
+        if not rows:
+            return {}
+        names = list(columns)
+        values = [columns[name].take(list(rows.values())) for name in names]
+        return {key: dict(zip(names, record)) for key, record in zip(rows, zip(*values))}
+
+class _Row(Mapping):
+    # One record of a _Table; reads decode and writes encode in place
+    __slots__ = ('_columns', '_row')
+
+    def __init__(self, columns, row):
+        self._columns = columns
+        self._row = row
+
+    def __getitem__(self, key):
+        return self._columns[key].get(self._row)
+
+    def __setitem__(self, key, value):
+        self._columns[key].set(self._row, value)
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class _RowsByUser:
+    # user_id -> rows of a _Table in insertion order, kept as a chain: each
+    # row points back at the user's previous one. One dict of ints and one
+    # array however many users there are, so users add no objects for the
+    # garbage collector to track.
+    def __init__(self):
+        self._last = {}
+        self._previous = array('q')
+
+    def add(self, user_id, row):
+        # Rows arrive in order, so `row` is the next slot of the chain
+        self._previous.append(self._last.get(user_id, -1))
+        self._last[user_id] = row
+
+    def rows(self, user_id):
+        rows = []
+        row = self._last.get(user_id, -1)
+        while row >= 0:
+            rows.append(row)
+            row = self._previous[row]
+        rows.reverse()
+        return rows
+
+    def clear(self):
+        self._last.clear()
+        del self._previous[:]
+
+class OrderTable(_Table):
+    KEY = 'order_id'
+    COLUMNS = {
+        'order_id': 'str',
+        'user_id': 'interned',
+        'fund_code': 'interned',
+        'amount': 'float',
+        'order_type': 'interned',
+        'status': 'interned',
+        'created_at': 'timestamp',
+        'nav_date': 'date',
+        'executed_at': 'date',
+        'units_allotted': 'float',
+        'razorpay_order_id': 'str'
+    }
+
+class SipTable(_Table):
+    KEY = 'sip_id'
+    COLUMNS = {
+        'sip_id': 'str',
+        'user_id': 'interned',
+        'fund_code': 'interned',
+        'amount': 'float',
+        'frequency': 'interned',
+        'start_date': 'date',
+        'end_date': 'date',
+        'status': 'interned',
+        'created_at': 'timestamp',
+        'last_executed': 'date',
+        'next_execution': 'date'
+    }
+
+def _durable(method):
+    # Public mutators run one at a time under the write lock and return
+    # only once the journal has committed their records; nested calls (e.g.
+    # SIP installments inside process_orders) share the outermost call's
+    # group commit. The commit wait happens after the lock is released, so
+    # other writers can append meanwhile. Depth and the last record appended
+    # are tracked per thread, so each request waits for (and, with SQLite,
+    # commits) its own records whatever other threads are doing.
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        local = self._local
+        local.durable_depth = getattr(local, 'durable_depth', 0) + 1
+        try:
+            with self._write_lock:
+                if local.durable_depth == 1:
+                    self._begin_writes()
+                return method(self, *args, **kwargs)
+        finally:
+            local.durable_depth -= 1
+            if local.durable_depth == 0 and self.journal is not None:
+                self.journal.wait(getattr(local, 'sequence', 0))
+                if self.snapshot_every:
+                    self._snapshot_if_due()
+    return wrapper
 
 class OrderManagementSystem:
-    def __init__(self, fund_manager):
+    def __init__(self, fund_manager, journal=None, snapshot_every=None, calendar=None, gateway=None,
+                 razorpay_client=None):
         self.fund_manager = fund_manager
-        self.orders = {}
-        self.sip_orders = {}
-        self.razorpay_client = MockRazorpayClient()
+        # TradingCalendar that SIP dates are rolled forward on
+        self.calendar = calendar or TradingCalendar()
+        # Optional OrderJournal receiving every state transition
+        self.journal = journal
+        self.snapshot_every = snapshot_every
+        self._snapshot_mark = 0
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_thread = None
+        # Held by every public mutator, see _durable
+        self._write_lock = threading.RLock()
+        # Per-thread _durable nesting depth and last journal sequence
+        self._local = threading.local()
+        self.orders = OrderTable()
+        self.sip_orders = SipTable()
+        self.razorpay_client = razorpay_client or MockRazorpayClient()
+        # Optional AsyncGatewayClient; SIP installments are then debited
+        # concurrently instead of one gateway round trip at a time
+        self.gateway = gateway
+        # user_id -> order / SIP table rows in placement order
+        self._user_orders = _RowsByUser()
+        self._user_sips = _RowsByUser()
+        # status -> {order_id: None}; dicts keep placement order
+        self._orders_by_status = defaultdict(dict)
+        # next_execution -> {sip_id: None} for every active SIP, plus a
+        # min-heap of the bucket dates so a run takes whole buckets
+        self._sips_due = {}
+        self._sip_due_dates = []
+        # user_id -> Portfolio, updated as orders execute
+        self.portfolios = {}
+        # user_id -> counter bumped by every change to the user's orders,
+        # SIPs or holdings, for caches of per-user views
+        self._user_versions = defaultdict(int)
 
+    @_durable
     def place_lump_sum_order(self, user_id, fund_code, amount, order_type):
-        order_id = str(uuid.uuid4())
         razorpay_order = self.razorpay_client.create_order(amount * 100)  # Razorpay expects amount in paise
+        return self._record_order(user_id, fund_code, amount, order_type, razorpay_order['id']), razorpay_order['id']
+
+    def _record_order(self, user_id, fund_code, amount, order_type, razorpay_order_id, nav_date=None):
+        # `nav_date`: the first day whose NAV the order can be priced at,
+        # from the NAV cut-off unless given
+        order_id = str(uuid.uuid4())
+        created_at = datetime.now()
         order = {
             'order_id': order_id,
             'user_id': user_id,
@@ -34,15 +444,24 @@ class OrderManagementSystem:
             'amount': amount,
             'order_type': order_type,
             'status': 'Pending Payment',
-            'created_at': datetime.now(),
+            'created_at': created_at,
+            'nav_date': nav_date or _nav_date(created_at),
             'executed_at': None,
             'units_allotted': None,
-            'razorpay_order_id': razorpay_order['id']
+            'razorpay_order_id': razorpay_order_id
         }
+        # Journaled first, so a failed append leaves memory untouched
+        self._log('place', order_id, user_id, fund_code, amount, order_type, order['status'],
+                  order['created_at'], order['razorpay_order_id'], order['nav_date'])
         self.orders[order_id] = order
-        return order_id, razorpay_order['id']
+        self._user_orders.add(user_id, self.orders.row_of(order_id))
+        self._orders_by_status[order['status']][order_id] = None
+        self._user_versions[user_id] += 1
+        return order_id
 
+    @_durable
     def place_sip_order(self, user_id, fund_code, amount, frequency, start_date, end_date=None):
+        validate_frequency(frequency)
         sip_id = str(uuid.uuid4())
         sip_order = {
             'sip_id': sip_id,
@@ -55,118 +474,498 @@ class OrderManagementSystem:
             'status': 'Active',
             'created_at': datetime.now(),
             'last_executed': None,
-            'next_execution': start_date
+            'next_execution': first_due_date(start_date, frequency, self.calendar)
         }
+        self._log('place_sip', sip_id, user_id, fund_code, amount, frequency, start_date, end_date,
+                  sip_order['status'], sip_order['created_at'], sip_order['next_execution'])
         self.sip_orders[sip_id] = sip_order
+        self._user_sips.add(user_id, self.sip_orders.row_of(sip_id))
+        self._schedule_sip(sip_id, sip_order['next_execution'])
+        self._user_versions[user_id] += 1
         return sip_id
 
     def confirm_payment(self, order_id, payment_id, signature):
-        if order_id not in self.orders:
-            return False
-
-        order = self.orders[order_id]
-        params_dict = {
-            'razorpay_order_id': order['razorpay_order_id'],
-            'razorpay_payment_id': payment_id,
-            'razorpay_signature': signature
-        }
+        outcome = self.confirm_payments([(order_id, payment_id, signature)])[order_id]
+        if outcome == 'duplicate':
+            # A repeated callback for an order that is already paid
+            return self.orders[order_id]['status'] not in ('Payment Failed', 'Cancelled')
+        return outcome == 'confirmed'
 
-        if self.razorpay_client.verify_payment_signature(params_dict):
-            order['status'] = 'Pending'
-            return True
-        else:
-            order['status'] = 'Payment Failed'
-            return False
+    @_durable
+    def confirm_payments(self, payments):
+        # Verifies and applies many (order_id, payment_id, signature)
+        # callbacks in one call and one journal commit. Only orders still
+        # awaiting payment move: repeats within the batch are skipped and
+        # callbacks for orders already settled come back as 'duplicate'. A
+        # bad signature is rejected as 'failed' without touching the order,
+        # so a forged callback can't block the genuine one.
+        # Returns order_id -> 'confirmed' | 'failed' | 'duplicate' | 'unknown'.
+        outcomes = {}
+        verify = self.razorpay_client.verify_signature
+        for order_id, payment_id, signature in payments:
+            if outcomes.get(order_id, 'failed') != 'failed':
+                continue
+            order = self.orders.get(order_id)
+            if order is None:
+                outcomes[order_id] = 'unknown'
+            elif order['status'] != 'Pending Payment':
+                outcomes[order_id] = 'duplicate'
+            elif verify(order['razorpay_order_id'], payment_id, signature):
+                self._set_order_status(order, 'Pending')
+                outcomes[order_id] = 'confirmed'
+            else:
+                outcomes[order_id] = 'failed'
+        return outcomes
 
+    @_durable
     def cancel_order(self, order_id):
         if order_id in self.orders:
             if self.orders[order_id]['status'] in ['Pending Payment', 'Pending']:
-                self.orders[order_id]['status'] = 'Cancelled'
+                self._set_order_status(self.orders[order_id], 'Cancelled')
                 return True
         return False
 
+    def _set_order_status(self, order, status):
+        order_id = order['order_id']
+        self._log('status', order_id, status)
+        self._orders_by_status[order['status']].pop(order_id, None)
+        order['status'] = status
+        self._orders_by_status[status][order_id] = None
+        self._user_versions[order['user_id']] += 1
+
+    def _set_order_statuses(self, order_ids, status):
+        # _set_order_status for a batch
+        for order_id in order_ids:
+            self._log('status', order_id, status)
+        by_status = self._orders_by_status
+        moved = by_status[status]
+        for order_id, previous, user_id in zip(order_ids, *self.orders.columns(order_ids, ('status', 'user_id'))):
+            by_status[previous].pop(order_id, None)
+            moved[order_id] = None
+            self._user_versions[user_id] += 1
+        self.orders.assign(order_ids, 'status', [status] * len(order_ids))
+
+    def _set_sip_status(self, sip_order, status):
+        self._log('sip_status', sip_order['sip_id'], status)
+        if status != 'Active':
+            self._unschedule_sip(sip_order)
+        sip_order['status'] = status
+        self._user_versions[sip_order['user_id']] += 1
+
+    def _begin_writes(self):
+        pass  # the write lock alone guards a book no other process writes
+
+    def _log(self, op, *fields):
+        if self.journal is not None:
+            self._local.sequence = self.journal.append(op, fields)
+
+    def get_orders_by_status(self, status):
+        return [self.orders[order_id] for order_id in self._order_ids_with_status(status)]
+
+    def _order_ids_with_status(self, status):
+        return list(self._orders_by_status.get(status, ()))
+
+    @_durable
     def stop_sip(self, sip_id):
         if sip_id in self.sip_orders:
             if self.sip_orders[sip_id]['status'] == 'Active':
-                self.sip_orders[sip_id]['status'] = 'Stopped'
+                self._set_sip_status(self.sip_orders[sip_id], 'Stopped')
                 return True
         return False
 
-    def process_orders(self, current_date=None):
+    @_durable
+    def process_orders(self, current_date=None, workers=1):
         if current_date is None:
             current_date = datetime.now().date()
 
-        for order_id, order in self.orders.items():
-            if order['status'] == 'Pending':
-                self._execute_order(order_id, current_date)
+        # Take the due-date buckets up to today and raise their installment
+        # orders; they are executed in the same batch as the other pending
+        # orders
+        due = [sip_id for sip_id in self._pop_due_sips(current_date) if self.sip_orders[sip_id]['status'] == 'Active']
+        if self.gateway is not None:
+            installments = self._debit_sip_installments(due)
+        else:
+            installments = [(sip_id, self._start_sip_installment(sip_id)) for sip_id in due]
 
-        for sip_id, sip_order in self.sip_orders.items():
-            if sip_order['status'] == 'Active' and sip_order['next_execution'].date() <= current_date:
-                self._execute_sip_installment(sip_id, current_date)
+        pending = self._order_ids_with_status('Pending')
+        if workers > 1:
+            stats = self.execute_orders_parallel(pending, current_date, workers)
+        else:
+            stats = self.execute_orders(pending, current_date)
 
-    def _execute_order(self, order_id, execution_date):
-        order = self.orders[order_id]
-        fund = self.fund_manager.get_fund(order['fund_code'])
-        
-        if fund:
-            current_nav = fund.get_current_nav()
-            if current_nav:
-                units_allotted = order['amount'] / current_nav
-                order['status'] = 'Executed'
-                order['executed_at'] = execution_date
-                order['units_allotted'] = units_allotted
+        # Re-queue after the batch so each SIP runs at most one installment
+        # per processing run
+        for sip_id, order_id in installments:
+            sip_order = self.sip_orders[sip_id]
+            if order_id is not None:
+                self._finish_sip_installment(sip_id, order_id, current_date)
+            if sip_order['status'] == 'Active':
+                self._schedule_sip(sip_id, sip_order['next_execution'])
+        stats['sip_installments'] = len(installments)
+        return stats
 
-                # Here you would update the user's portfolio
-                # portfolio.add_units(order['fund_code'], units_allotted)
+    def _schedule_sip(self, sip_id, due):
+        due = _as_date(due)
+        bucket = self._sips_due.get(due)
+        if bucket is None:
+            bucket = self._sips_due[due] = {}
+            heapq.heappush(self._sip_due_dates, due)
+        bucket[sip_id] = None
 
-                return True
-        
-        order['status'] = 'Failed'
-        return False
+    def _unschedule_sip(self, sip_order):
+        bucket = self._sips_due.get(_as_date(sip_order['next_execution']))
+        if bucket:
+            bucket.pop(sip_order['sip_id'], None)
+
+    def _pop_due_sips(self, current_date):
+        due = []
+        while self._sip_due_dates and self._sip_due_dates[0] <= current_date:
+            due.extend(self._sips_due.pop(heapq.heappop(self._sip_due_dates), ()))
+        return due
+
+    @_durable
+    def execute_orders(self, order_ids, execution_date):
+        # Executes orders grouped by fund: each group's applicable NAVs come
+        # from one searchsorted over the fund's NAV dates and units are
+        # allotted for the whole group in one array division. Orders whose
+        # NAV isn't published yet, or whose applicable date is after
+        # `execution_date`, stay Pending for a later run.
+        started = perf_counter()
+        batches = []
+        for fund_code, group in self._group_by_fund(order_ids).items():
+            batch_started = perf_counter()
+            fund = self.fund_manager.get_fund(fund_code)
+            dates, values = _nav_arrays(fund)
+            nav_dates, amounts = self.orders.columns(group, ('nav_date', 'amount'))
+            targets = np.array([day.toordinal() for day in nav_dates])
+            units, executed, waiting = _allot_units(dates, values, np.array(amounts, dtype=np.float64), targets)
+            executed, waiting = _hold_until_due(executed, waiting, targets, execution_date, fund is not None)
+            executed = self._fail_uncovered_sells(fund_code, group, units, executed)
+            self._apply_executions(group, targets.tolist(), units.tolist(), executed.tolist(), waiting.tolist(),
+                                   execution_date)
+            batches.append(_batch_stats(fund_code, executed, waiting, perf_counter() - batch_started))
+        return _execution_stats(len(order_ids), batches, perf_counter() - started)
+
+    @_durable
+    def execute_orders_parallel(self, order_ids, execution_date, workers=4, mp_context=None):
+        # Shards the funds across a process pool by a stable hash of
+        # fund_code. Each worker gets only the slice of NAVs its orders can
+        # resolve to and computes units with the same _allot_units as
+        # execute_orders. Results are applied here, in order_ids order and
+        # only after every shard has returned, so the book ends up identical
+        # whatever the worker count, and untouched if any shard fails.
+        started = perf_counter()
+        groups = self._group_by_fund(order_ids)
+        shards = [[] for _ in range(workers)]
+        targets = {}
+        for fund_code, group in groups.items():
+            nav_dates, amounts = self.orders.columns(group, ('nav_date', 'amount'))
+            targets[fund_code] = [day.toordinal() for day in nav_dates]
+            dates, values = _nav_arrays(self.fund_manager.get_fund(fund_code))
+            lo = np.searchsorted(dates, min(targets[fund_code]), side='left')
+            hi = np.searchsorted(dates, max(targets[fund_code]), side='left') + 1
+            shards[zlib.crc32(fund_code.encode()) % workers].append((
+                fund_code,
+                dates[lo:hi].tobytes(),
+                values[lo:hi].tobytes(),
+                amounts,
+                targets[fund_code]
+            ))
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            results = {}
+            for shard_result in pool.map(_execute_shard, [shard for shard in shards if shard]):
+                results.update(shard_result)
+
+        batches = []
+        for fund_code, group in groups.items():
+            units, executed, waiting, seconds = results[fund_code]
+            executed, waiting = _hold_until_due(executed, waiting, np.array(targets[fund_code]), execution_date,
+                                                self.fund_manager.get_fund(fund_code) is not None)
+            executed = self._fail_uncovered_sells(fund_code, group, units, executed)
+            self._apply_executions(group, targets[fund_code], units.tolist(), executed.tolist(), waiting.tolist(),
+                                   execution_date)
+            batches.append(_batch_stats(fund_code, executed, waiting, seconds))
+        return _execution_stats(len(order_ids), batches, perf_counter() - started)
+
+    def _group_by_fund(self, order_ids):
+        # fund_code -> order ids
+        groups = defaultdict(list)
+        fund_codes, = self.orders.columns(order_ids, ('fund_code',))
+        for order_id, fund_code in zip(order_ids, fund_codes):
+            groups[fund_code].append(order_id)
+        return groups
+
+    def _fail_uncovered_sells(self, fund_code, order_ids, units, executed):
+        # A sell executes only if the user holds its units, counting the
+        # buys and sells ahead of it in the fund's batch; otherwise it fails
+        # instead of redeeming less than it was priced for
+        user_ids, order_types = self.orders.columns(order_ids, ('user_id', 'order_type'))
+        sellers = {user_id for user_id, order_type in zip(user_ids, order_types) if order_type == 'Sell'}
+        if not sellers:
+            return executed
+        executed = executed.copy()
+        held = {}
+        for i, (user_id, order_type) in enumerate(zip(user_ids, order_types)):
+            if user_id not in sellers or not executed[i]:
+                continue
+            if user_id not in held:
+                holding = self.get_portfolio(user_id).get_holding(fund_code)
+                held[user_id] = holding['units'] if holding else 0.0
+            if order_type != 'Sell':
+                held[user_id] += units[i]
+            # Redeeming a whole holding by amount can overshoot by a rounding
+            elif units[i] <= held[user_id] * (1 + 1e-9):
+                held[user_id] = max(held[user_id] - units[i], 0.0)
+            else:
+                executed[i] = False
+        return executed
+
+    def _apply_executions(self, order_ids, targets, units, executed, waiting, execution_date):
+        # Journaled and applied a column at a time: statuses first, then
+        # the executions, then the holdings they change. `targets` are the
+        # ordinals of the NAV dates the orders are priced at.
+        done, days, allotted, failed = [], [], [], []
+        for order_id, target, ok, wait, units_allotted in zip(order_ids, targets, executed, waiting, units):
+            if wait:
+                continue
+            if ok:
+                done.append(order_id)
+                days.append(date.fromordinal(target))
+                allotted.append(units_allotted)
+            else:
+                failed.append(order_id)
+        self._set_order_statuses(failed, 'Failed')
+        self._set_order_statuses(done, 'Executed')
+        for order_id, units_allotted in zip(done, allotted):
+            self._log('execute', order_id, execution_date, units_allotted)
+        self.orders.assign(done, 'executed_at', [execution_date] * len(done))
+        self.orders.assign(done, 'units_allotted', allotted)
+        self._update_portfolios(done, days)
+
+    def _update_portfolios(self, order_ids, days):
+        # Cash flows are dated by the NAV each order was priced at, `days`
+        columns = self.orders.columns(order_ids, ('user_id', 'fund_code', 'amount', 'order_type', 'units_allotted'))
+        for user_id, fund_code, amount, order_type, units, day in zip(*columns, days):
+            portfolio = self.portfolios.get(user_id)
+            if portfolio is None:
+                portfolio = self.portfolios[user_id] = Portfolio(user_id)
+            if order_type == 'Sell':
+                redeemed = portfolio.redeem_units(fund_code, units)
+                if redeemed:
+                    portfolio.record_cash_flow(fund_code, day, amount * redeemed / units)
+            else:
+                portfolio.add_units(fund_code, units, amount)
+                portfolio.record_cash_flow(fund_code, day, -amount)
+
+    def get_portfolio(self, user_id):
+        return self.portfolios.get(user_id) or Portfolio(user_id)
+
+    def compute_xirr(self, user_ids=None, as_of=None, by_scheme=False):
+        # Batch XIRR (percent) for statements: every portfolio by default
+        if user_ids is None:
+            portfolios = list(self.portfolios.values())
+        else:
+            portfolios = [self.get_portfolio(user_id) for user_id in user_ids]
+        return portfolio_xirr(portfolios, self.fund_manager, as_of, by_scheme)
+
+    def _execute_order(self, order_id, execution_date):
+        return self.execute_orders([order_id], execution_date)['executed'] == 1
 
     def _execute_sip_installment(self, sip_id, execution_date):
+        order_id = self._start_sip_installment(sip_id)
+        if order_id is not None:
+            self._execute_order(order_id, execution_date)
+            self._finish_sip_installment(sip_id, order_id, execution_date)
+
+    def _start_sip_installment(self, sip_id):
         sip_order = self.sip_orders[sip_id]
         
-        # Create a lump sum order for this SIP installment
-        lump_sum_order_id, razorpay_order_id = self.place_lump_sum_order(
+        # Create a lump sum order for this SIP installment, priced at the
+        # NAV of its due date rather than of the day it's processed
+        razorpay_order_id = self.razorpay_client.create_order(sip_order['amount'] * 100)['id']
+        lump_sum_order_id = self._record_order(
             sip_order['user_id'],
             sip_order['fund_code'],
             sip_order['amount'],
-            'Buy'
+            'Buy',
+            razorpay_order_id,
+            _as_date(sip_order['next_execution'])
         )
 
         # In a real scenario, you would initiate automatic payment here
         # For demonstration, we'll assume payment is successful
-        payment_id = f"pay_{uuid.uuid4().hex}"
-        signature = "mocked_signature"
+        payment_id, signature = self.razorpay_client.simulate_payment(razorpay_order_id)
         if self.confirm_payment(lump_sum_order_id, payment_id, signature):
-            # Execute the lump sum order
-            if self._execute_order(lump_sum_order_id, execution_date):
-                sip_order['last_executed'] = execution_date
-                sip_order['next_execution'] = self._calculate_next_execution(sip_order)
+            return lump_sum_order_id
 
-                if sip_order['end_date'] and execution_date >= sip_order['end_date']:
-                    sip_order['status'] = 'Completed'
-        else:
-            # Handle failed payment
-            self.sip_orders[sip_id]['status'] = 'Payment Failed'
-
-    def _calculate_next_execution(self, sip_order):
-        last_execution = sip_order['last_executed']
-        frequency = sip_order['frequency']
-
-        if frequency == 'Monthly':
-            next_execution = last_execution + timedelta(days=30)
-        elif frequency == 'Quarterly':
-            next_execution = last_execution + timedelta(days=91)
-        elif frequency == 'Semi-Annually':
-            next_execution = last_execution + timedelta(days=182)
-        elif frequency == 'Annually':
-            next_execution = last_execution + timedelta(days=365)
-        else:
-            raise ValueError(f"Unsupported frequency: {frequency}")
+        # Handle failed payment
+        self._set_sip_status(sip_order, 'Payment Failed')
+        return None
+
+    def _debit_sip_installments(self, sip_ids):
+        # Every mandate is debited concurrently through the gateway, then the
+        # outcomes are recorded here in order. A debit the gateway couldn't
+        # complete for now leaves the SIP due, and the next run retries it
+        # under the same idempotency keys; one it refused fails the SIP.
+        sip_orders = [self.sip_orders[sip_id] for sip_id in sip_ids]
+        results = asyncio.run(_debit_mandates(self.gateway, sip_orders))
+        installments = []
+        for sip_order, (razorpay_order, payment, error) in zip(sip_orders, results):
+            if error is not None and error.retryable:
+                installments.append((sip_order['sip_id'], None))
+                continue
+            if razorpay_order is None:
+                self._set_sip_status(sip_order, 'Payment Failed')
+                installments.append((sip_order['sip_id'], None))
+                continue
+            order_id = self._record_order(sip_order['user_id'], sip_order['fund_code'], sip_order['amount'], 'Buy',
+                                          razorpay_order['id'], _as_date(sip_order['next_execution']))
+            if payment is not None and self.razorpay_client.verify_payment_signature(payment):
+                self._set_order_status(self.orders[order_id], 'Pending')
+                installments.append((sip_order['sip_id'], order_id))
+            else:
+                self._set_order_status(self.orders[order_id], 'Payment Failed')
+                self._set_sip_status(sip_order, 'Payment Failed')
+                installments.append((sip_order['sip_id'], None))
+        return installments
+
+    def _finish_sip_installment(self, sip_id, order_id, execution_date):
+        # A paid installment moves the schedule on even if its NAV isn't
+        # out yet; the order itself executes on a later run
+        sip_order = self.sip_orders[sip_id]
+        if self.orders[order_id]['status'] not in ('Executed', 'Pending'):
+            return
+        next_execution = self._calculate_next_execution(sip_order, execution_date)
+        self._log('sip_progress', sip_id, execution_date, next_execution)
+        sip_order['last_executed'] = execution_date
+        sip_order['next_execution'] = next_execution
+        self._user_versions[sip_order['user_id']] += 1
+
+        if sip_order['end_date'] and sip_order['next_execution'] > _as_date(sip_order['end_date']):
+            self._set_sip_status(sip_order, 'Completed')
+
+    def _calculate_next_execution(self, sip_order, last_executed):
+        # Installments missed while processing was down are skipped, not
+        # bunched up
+        return next_due_date(sip_order['start_date'], sip_order['frequency'], last_executed, self.calendar)
+
+    def snapshot(self):
+        # The book is captured and the journal rolled over together under
+        # the write lock, so every record is either in the snapshot or in a
+        # segment after it. Decoding, pickling and fsyncing the capture run
+        # after the lock is released.
+        with self._snapshot_lock:
+            with self._write_lock:
+                orders = self.orders.capture()
+                sip_orders = self.sip_orders.capture()
+                portfolios = {user_id: portfolio.state() for user_id, portfolio in self.portfolios.items()}
+                segment = self.journal.roll_over()
+                self._snapshot_mark = self.journal.appended
+            # Plain dicts on disk, whatever the in-memory record type
+            self.journal.write_snapshot(segment, {
+                'orders': OrderTable.decode_capture(orders),
+                'sip_orders': SipTable.decode_capture(sip_orders),
+                'portfolios': portfolios
+            })
+
+    def _snapshot_if_due(self):
+        # Every `snapshot_every` records a snapshot starts on a background
+        # thread, so the request that crosses the mark doesn't pay for it
+        with self._write_lock:
+            if self.journal.appended - self._snapshot_mark < self.snapshot_every:
+                return
+            self._snapshot_mark = self.journal.appended
+        self._snapshot_thread = threading.Thread(target=self.snapshot, name='order-snapshot', daemon=True)
+        self._snapshot_thread.start()
+
+    def wait_for_snapshot(self):
+        thread = self._snapshot_thread
+        if thread is not None:
+            thread.join()
+
+    @classmethod
+    def recover(cls, fund_manager, journal, snapshot_every=None, **options):
+        # Rebuilds the order book from the journal's latest snapshot plus
+        # the records written after it; `options` go to the constructor
+        oms = cls(fund_manager, **options)
+        state, records = journal.load()
+        if state:
+            oms.orders = OrderTable(state['orders'].values())
+            oms.sip_orders = SipTable(state['sip_orders'].values())
+            for user_id, portfolio in state['portfolios'].items():
+                oms.portfolios[user_id] = Portfolio.from_state(user_id, portfolio)
+        for op, fields in records:
+            oms._replay(op, fields)
+        oms._rebuild_indexes()
+        oms.journal = journal
+        oms.snapshot_every = snapshot_every
+        return oms
 
-        return next_execution
+    def _replay(self, op, fields):
+        if op == 'place':
+            order_id, user_id, fund_code, amount, order_type, status, created_at, razorpay_order_id, nav_date = fields
+            self.orders[order_id] = {
+                'order_id': order_id,
+                'user_id': user_id,
+                'fund_code': fund_code,
+                'amount': amount,
+                'order_type': order_type,
+                'status': status,
+                'created_at': created_at,
+                'nav_date': nav_date,
+                'executed_at': None,
+                'units_allotted': None,
+                'razorpay_order_id': razorpay_order_id
+            }
+        elif op == 'place_sip':
+            sip_id, user_id, fund_code, amount, frequency, start_date, end_date, status, created_at, next_execution = fields
+            self.sip_orders[sip_id] = {
+                'sip_id': sip_id,
+                'user_id': user_id,
+                'fund_code': fund_code,
+                'amount': amount,
+                'frequency': frequency,
+                'start_date': start_date,
+                'end_date': end_date,
+                'status': status,
+                'created_at': created_at,
+                'last_executed': None,
+                'next_execution': next_execution
+            }
+        elif op == 'status':
+            self.orders[fields[0]]['status'] = fields[1]
+        elif op == 'execute':
+            order = self.orders[fields[0]]
+            order['executed_at'], order['units_allotted'] = fields[1:]
+            self._update_portfolios(fields[:1], [order['nav_date']])
+        elif op == 'sip_status':
+            self.sip_orders[fields[0]]['status'] = fields[1]
+        elif op == 'sip_progress':
+            sip_order = self.sip_orders[fields[0]]
+            sip_order['last_executed'], sip_order['next_execution'] = fields[1:]
+
+    def _rebuild_indexes(self):
+        self._user_orders.clear()
+        self._user_sips.clear()
+        self._orders_by_status.clear()
+        for order_id, order in self.orders.items():
+            self._user_orders.add(order['user_id'], self.orders.row_of(order_id))
+            self._orders_by_status[order['status']][order_id] = None
+        self._sips_due = {}
+        self._sip_due_dates = []
+        for sip_id, sip_order in self.sip_orders.items():
+            self._user_sips.add(sip_order['user_id'], self.sip_orders.row_of(sip_id))
+            if sip_order['status'] == 'Active':
+                self._schedule_sip(sip_id, sip_order['next_execution'])
+
+    def user_version(self, user_id):
+        return self._user_versions.get(user_id, 0)
+
+    def ledger_version(self, user_id):
+        # Changes to the user's holdings and cash flows, wherever they came from
+        portfolio = self.portfolios.get(user_id)
+        return portfolio.version if portfolio is not None else 0
 
     def get_order_status(self, order_id):
         return self.orders.get(order_id, {}).get('status', 'Order not found')
@@ -174,11 +973,114 @@ class OrderManagementSystem:
     def get_sip_status(self, sip_id):
         return self.sip_orders.get(sip_id, {}).get('status', 'SIP not found')
 
-    def get_user_orders(self, user_id):
-        return [order for order in self.orders.values() if order['user_id'] == user_id]
+    def get_user_orders(self, user_id, status=None, start=None, end=None, offset=0, limit=None):
+        return self._user_records(self._user_orders.rows(user_id), self.orders, status, start, end, offset, limit)
+
+    def get_user_sips(self, user_id, status=None, start=None, end=None, offset=0, limit=None):
+        return self._user_records(self._user_sips.rows(user_id), self.sip_orders, status, start, end, offset, limit)
+
+    def _user_records(self, rows, records, status, start, end, offset, limit):
+        # `rows` are in creation order, so a created_at window is two bisections
+        created_at = lambda row: records.at(row)['created_at']
+        lo = bisect_left(rows, _as_datetime(start), key=created_at) if start else 0
+        hi = bisect_right(rows, _as_datetime(end, end_of_day=True), key=created_at) if end else len(rows)
+        selected = (records.at(row) for row in rows[lo:hi])
+        if status:
+            selected = (record for record in selected if record['status'] == status)
+        # Plain dicts, ready for JSON
+        return [dict(record) for record in islice(selected, offset, offset + limit if limit is not None else None)]
+
+async def _debit_mandates(gateway, sip_orders):
+    # (razorpay order, payment, GatewayError) per SIP, in order
+    async def debit(sip_order):
+        key = f"{sip_order['sip_id']}:{_as_date(sip_order['next_execution']).isoformat()}"
+        try:
+            razorpay_order = await gateway.create_order(sip_order['amount'] * 100, idempotency_key=f"{key}:order")
+        except GatewayError as e:
+            return None, None, e
+        try:
+            payment = await gateway.charge_mandate(razorpay_order['id'], sip_order['sip_id'],
+                                                   idempotency_key=f"{key}:charge")
+        except GatewayError as e:
+            return razorpay_order, None, e
+        return razorpay_order, payment, None
+
+    async with gateway:
+        return await asyncio.gather(*(debit(sip_order) for sip_order in sip_orders))
+
+def _nav_arrays(fund):
+    if fund is None:
+        return np.zeros(0, dtype=np.int32), np.zeros(0)
+    dates, values = fund.nav_history.range()
+    return np.frombuffer(dates, dtype=np.int32), np.frombuffer(values, dtype=np.float64)
+
+def _allot_units(dates, values, amounts, targets):
+    # Units bought by each amount at the first NAV on or after its target
+    # date ordinal, a mask of the orders that could be executed and a mask
+    # of those whose NAV isn't published yet
+    positions = np.searchsorted(dates, targets, side='left')
+    waiting = positions >= len(dates)
+    if len(dates):
+        navs = np.where(waiting, np.nan, values[np.minimum(positions, len(dates) - 1)])
+    else:
+        navs = np.full(len(amounts), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        units = amounts / navs
+    return units, np.isfinite(units) & (navs > 0), waiting
+
+def _hold_until_due(executed, waiting, targets, execution_date, fund_exists):
+    # Orders applicable after the execution date wait regardless of NAVs;
+    # orders for an unknown fund fail rather than wait for ever
+    early = targets > execution_date.toordinal()
+    waiting = (waiting & fund_exists) | early
+    return executed & ~early, waiting
+
+def _execute_shard(shard):
+    # Process-pool worker for execute_orders_parallel
+    results = {}
+    for fund_code, dates, values, amounts, targets in shard:
+        started = perf_counter()
+        units, executed, waiting = _allot_units(
+            np.frombuffer(dates, dtype=np.int32),
+            np.frombuffer(values, dtype=np.float64),
+            np.array(amounts, dtype=np.float64),
+            np.array(targets)
+        )
+        results[fund_code] = (units, executed, waiting, perf_counter() - started)
+    return results
+
+def _batch_stats(fund_code, executed, waiting, seconds):
+    count = int(executed.sum())
+    held = int(waiting.sum())
+    return {
+        'fund_code': fund_code,
+        'orders': len(executed),
+        'executed': count,
+        'failed': len(executed) - count - held,
+        'waiting': held,
+        'seconds': seconds
+    }
+
+def _execution_stats(order_count, batches, seconds):
+    return {
+        'orders': order_count,
+        'executed': sum(batch['executed'] for batch in batches),
+        'failed': sum(batch['failed'] for batch in batches),
+        'waiting': sum(batch['waiting'] for batch in batches),
+        'seconds': seconds,
+        'batches': batches
+    }
+
+def _nav_date(received):
+    # An order received then is priced at the first NAV published on or
+    # after this date
+    return received.date() if received.hour < NAV_CUTOFF_HOUR else received.date() + timedelta(days=1)
 
-    def get_user_sips(self, user_id):
-        return [sip for sip in self.sip_orders.values() if sip['user_id'] == user_id]
+def _as_datetime(value, end_of_day=False):
+    # Dates bound whole days: a date `end` includes everything on that day
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, datetime.max.time() if end_of_day else datetime.min.time())
 
 # Example usage:
 if __name__ == "__main__":
@@ -195,8 +1097,7 @@ if __name__ == "__main__":
     print(f"Lump sum order placed: {lump_sum_order_id}, Razorpay Order ID: {razorpay_order_id}")
 
     # Simulate payment confirmation
-    payment_id = f"pay_{uuid.uuid4().hex}"
-    signature = "mocked_signature"
+    payment_id, signature = oms.razorpay_client.simulate_payment(razorpay_order_id)
     payment_confirmed = oms.confirm_payment(lump_sum_order_id, payment_id, signature)
     print(f"Payment confirmed: {payment_confirmed}")
 
@@ -0,0 +1,221 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+from http import HTTPStatus
+import json
+import random
+import uuid
+from datetime import datetime
+
+# asyncio client for the payment gateway's REST API, plus an in-process
+# fake of that API. Requests go over a pool of keep-alive HTTP/1.1
+# connections; the pool size bounds how many are in flight at once.
+# Failed requests are retried with exponential backoff under the same
+# Idempotency-Key, so a retried POST never charges twice.
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+class GatewayError(Exception):
+    def __init__(self, message, status=None, retryable=False):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+
+class AsyncGatewayClient:
+    def __init__(self, host, port, key_id="rzp_test", key_secret="rzp_test_secret", ssl=None, max_connections=32, retries=3,
+                 backoff=0.05, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.ssl = ssl
+        self._authorization = base64.b64encode(f"{key_id}:{key_secret}".encode()).decode()
+        self.max_connections = max_connections
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._idle = []
+        self._slots = None
+        self.connections_opened = 0
+
+    # Connections belong to the event loop that opened them, so the pool
+    # lives for one `async with client:` block
+
+    async def __aenter__(self):
+        self._slots = asyncio.Semaphore(self.max_connections)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        await asyncio.gather(*(writer.wait_closed() for _, writer in idle), return_exceptions=True)
+
+    async def create_order(self, amount, currency="INR", idempotency_key=None):
+        return await self.request("POST", "/v1/orders", {"amount": amount, "currency": currency}, idempotency_key)
+
+    async def charge_mandate(self, razorpay_order_id, mandate_id, idempotency_key=None):
+        # Auto-debit against a registered mandate; returns the payment id
+        # and signature to verify as for a checkout payment
+        return await self.request("POST", "/v1/payments/mandate",
+                                  {"order_id": razorpay_order_id, "mandate_id": mandate_id}, idempotency_key)
+
+    async def request(self, method, path, payload=None, idempotency_key=None):
+        if idempotency_key is None and method == "POST":
+            idempotency_key = uuid.uuid4().hex
+        body = json.dumps(payload, separators=(",", ":")).encode() if payload is not None else b""
+        head = (f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nAuthorization: Basic {self._authorization}\r\n")
+        if idempotency_key:
+            head += f"Idempotency-Key: {idempotency_key}\r\n"
+        message = head.encode() + b"\r\n" + body
+
+        for attempt in range(self.retries + 1):
+            try:
+                status, data = await asyncio.wait_for(self._send(message), self.timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                error = GatewayError(f"{method} {path}: {e!r}", retryable=True)
+            else:
+                if status < 300:
+                    return json.loads(data)
+                error = GatewayError(f"{method} {path}: HTTP {status}", status, status in RETRYABLE_STATUSES)
+            if not error.retryable or attempt == self.retries:
+                raise error
+            await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    async def _send(self, message):
+        async with self._slots:
+            reader, writer = self._idle.pop() if self._idle else await self._connect()
+            try:
+                writer.write(message)
+                await writer.drain()
+                status, keep_alive, data = await _read_response(reader)
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, data
+
+    async def _connect(self):
+        self.connections_opened += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+async def _read_response(reader):
+    status_line = await reader.readuntil(b"\r\n")
+    status = int(status_line.split()[1])
+    headers = await _read_headers(reader)
+    data = await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() != "close", data
+
+async def _read_headers(reader):
+    headers = {}
+    while True:
+        line = await reader.readuntil(b"\r\n")
+        if line == b"\r\n":
+            return headers
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+def payment_signature(key_secret, razorpay_order_id, razorpay_payment_id, keyed_mac=None):
+    # HMAC-SHA256 of "order_id|payment_id", as Razorpay signs payments. A
+    # `keyed_mac` already keyed with `key_secret` is copied instead of
+    # keying a new one
+    mac = keyed_mac.copy() if keyed_mac is not None else hmac.new(key_secret.encode(), digestmod=hashlib.sha256)
+    mac.update(f"{razorpay_order_id}|{razorpay_payment_id}".encode())
+    return mac.hexdigest()
+
+class FakeGatewayServer:
+    # In-process stand-in for the gateway. `latency` is added to every
+    # request; `failure_rate` of requests fail with 503 before doing
+    # anything, and charges against `declined_mandates` are declined. Responses
+    # are remembered per Idempotency-Key and replayed for repeats.
+    def __init__(self, key_secret="rzp_test_secret", latency=0.0, failure_rate=0.0, declined_mandates=(), seed=None):
+        self.key_secret = key_secret
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.declined_mandates = set(declined_mandates)
+        self._random = random.Random(seed)
+        self._responses = {}
+        self.orders = {}
+        self.payments = {}
+        self.requests = 0
+        self.connections = 0
+        self._server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._handle, host, port)
+        self.host, self.port = self._server.sockets[0].getsockname()[:2]
+        return self
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                try:
+                    request_line = await reader.readuntil(b"\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = await _read_headers(reader)
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self._respond(method, path, headers.get("idempotency-key"), body)
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _respond(self, method, path, idempotency_key, body):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            return 503, {"error": "Service unavailable"}
+        if idempotency_key in self._responses:
+            return self._responses[idempotency_key]
+
+        payload = json.loads(body) if body else {}
+        if method == "POST" and path == "/v1/orders":
+            order = {
+                "id": f"order_{uuid.uuid4().hex}",
+                "entity": "order",
+                "amount": payload["amount"],
+                "currency": payload.get("currency", "INR"),
+                "status": "created",
+                "created_at": int(datetime.now().timestamp())
+            }
+            self.orders[order["id"]] = order
+            response = 200, order
+        elif method == "POST" and path == "/v1/payments/mandate":
+            order = self.orders.get(payload.get("order_id"))
+            if order is None:
+                response = 400, {"error": "Unknown order"}
+            elif payload.get("mandate_id") in self.declined_mandates:
+                response = 402, {"error": "Mandate declined"}
+            else:
+                payment_id = f"pay_{uuid.uuid4().hex}"
+                self.payments[payment_id] = order["id"]
+                order["status"] = "paid"
+                response = 200, {
+                    "razorpay_order_id": order["id"],
+                    "razorpay_payment_id": payment_id,
+                    "razorpay_signature": payment_signature(self.key_secret, order["id"], payment_id)
+                }
+        else:
+            response = 404, {"error": "Not found"}
+        if idempotency_key:
+            self._responses[idempotency_key] = response
+        return response
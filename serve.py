@@ -0,0 +1,77 @@
+import argparse
+import asyncio
+import gc
+import inspect
+import os
+import sys
+import types
+
+# Runs one of the API apps. The source files share one namespace instead of
+# importing each other, so they are executed in order into a single module,
+# registered as "mfapp" so process-pool workers can unpickle its functions.
+#
+#   python serve.py mutual-fund-api.py --port 5000     # Flask, threaded server
+#   python serve.py mutual-fund-asgi.py --port 5001    # Quart, under Hypercorn
+#   MF_APP=mutual-fund-asgi.py hypercorn serve:app
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SHARED_FILES = [
+    "amfi-funds-data.py",
+    "mutual-fund-backend-classes.py",
+    "sip-schedule.py",
+    "payment-gateway.py",
+    "order-management-system (1).py",
+    "order-journal.py",
+    "sqlite-storage.py",
+    "user-dashboard.py",
+    "mutual-fund-api-payloads.py",
+]
+
+def load_module(filenames, name="mfapp"):
+    # `filenames` executed in order into one new module, registered as `name`
+    module = types.ModuleType(name)
+    module.__file__ = os.path.join(HERE, filenames[-1])
+    sys.modules[name] = module
+    for path in filenames:
+        with open(os.path.join(HERE, path)) as f:
+            exec(compile(f.read(), path, "exec"), module.__dict__)
+    return module
+
+def load_app(filename, name="mfapp"):
+    return load_module(SHARED_FILES + [filename], name).app
+
+def load_app_for_serving(filename):
+    app = load_app(filename)
+    # What the app built at startup (a recovered order book, fund data)
+    # lives as long as the process: move it out of the collector's
+    # generations so full collections don't re-scan it
+    gc.freeze()
+    return app
+
+def is_asgi(app):
+    return inspect.iscoroutinefunction(app.__call__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve one of the mutual fund API apps")
+    parser.add_argument("app", help="mutual-fund-api.py, mutual-fund-api (1).py or mutual-fund-asgi.py")
+    parser.add_argument("--host", default=os.environ.get("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 5000)))
+    args = parser.parse_args()
+
+    app = load_app_for_serving(args.app)
+    if not is_asgi(app):
+        app.run(host=args.host, port=args.port, threaded=True)
+        return
+
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    config = Config()
+    config.bind = [f"{args.host}:{args.port}"]
+    asyncio.run(serve(app, config))
+
+if os.environ.get("MF_APP") and __name__ != "__main__":
+    app = load_app_for_serving(os.environ["MF_APP"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from calendar import monthrange
+from datetime import date, datetime, timedelta
+
+# SIP installment dates. Each installment is anchored on the SIP's start
+# date (the k-th monthly installment is start + k calendar months, clamped
+# to the end of shorter months) and then rolled forward to the next trading
+# day, so dates never drift.
+
+# frequency -> (unit, step)
+FREQUENCIES = {
+    "Daily": ("days", 1),
+    "Weekly": ("days", 7),
+    "Monthly": ("months", 1),
+    "Quarterly": ("months", 3),
+    "Semi-Annually": ("months", 6),
+    "Annually": ("months", 12)
+}
+
+class TradingCalendar:
+    # Weekends plus the holidays listed in `holiday_file`: one ISO date
+    # (YYYY-MM-DD) per line, blank lines and "#" comments ignored
+    def __init__(self, holiday_file=None, holidays=()):
+        self.holidays = {_as_date(day) for day in holidays}
+        if holiday_file:
+            with open(holiday_file) as f:
+                for line in f:
+                    line = line.split("#", 1)[0].strip()
+                    if line:
+                        self.holidays.add(date.fromisoformat(line))
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in self.holidays
+
+    def roll_forward(self, day):
+        day = _as_date(day)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+def validate_frequency(frequency):
+    if frequency not in FREQUENCIES:
+        raise ValueError(f"Unsupported frequency: {frequency}. Expected one of {', '.join(FREQUENCIES)}")
+
+def nominal_date(start_date, frequency, k):
+    # The k-th installment date before holiday adjustment
+    start_date = _as_date(start_date)
+    unit, step = FREQUENCIES[frequency]
+    if unit == "days":
+        return start_date + timedelta(days=step * k)
+    months = start_date.month - 1 + step * k
+    year, month = start_date.year + months // 12, months % 12 + 1
+    return date(year, month, min(start_date.day, monthrange(year, month)[1]))
+
+def first_due_date(start_date, frequency, calendar):
+    return calendar.roll_forward(nominal_date(start_date, frequency, 0))
+
+def next_due_date(start_date, frequency, after, calendar):
+    # First installment date strictly after `after`
+    start_date, after = _as_date(start_date), _as_date(after)
+    unit, step = FREQUENCIES[frequency]
+    if unit == "days":
+        k = (after - start_date).days // step
+    else:
+        k = ((after.year - start_date.year) * 12 + after.month - start_date.month) // step
+    # k lands in after's period; step back one because the previous
+    # installment may have been rolled forward past `after`
+    k = max(k - 1, 0)
+    while True:
+        due = calendar.roll_forward(nominal_date(start_date, frequency, k))
+        if due > after:
+            return due
+        k += 1
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
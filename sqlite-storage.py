@@ -0,0 +1,676 @@
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from itertools import groupby
+import sqlite3
+import threading
+
+# SQLite (WAL) storage shared by every API worker process. Funds, NAV/AUM
+# history, orders, SIPs and users live in one database file; each thread
+# keeps its own connection with SQLite's prepared-statement cache, and the
+# classes below keep the FundManager / OrderManagementSystem interfaces.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS funds (
+    scheme_code TEXT PRIMARY KEY,
+    scheme_name TEXT,
+    fund_house TEXT,
+    scheme_type TEXT,
+    scheme_category TEXT,
+    scheme_sub_category TEXT,
+    expense_ratio REAL,
+    risk_grade TEXT,
+    benchmark TEXT,
+    fund_manager TEXT,
+    inception_date TEXT,
+    exit_load TEXT,
+    min_investment REAL,
+    investment_objective TEXT
+);
+CREATE TABLE IF NOT EXISTS nav_history (
+    scheme_code TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    nav REAL NOT NULL,
+    PRIMARY KEY (scheme_code, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS aum_history (
+    scheme_code TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    aum REAL NOT NULL,
+    PRIMARY KEY (scheme_code, date)
+) WITHOUT ROWID;
+-- meta.fund_data_version counts fund data writes; each scheme keeps the
+-- count at its last change, so workers reload only the schemes that moved
+CREATE TABLE IF NOT EXISTS fund_versions (
+    scheme_code TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS fund_versions_version ON fund_versions (version);
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    fund_code TEXT NOT NULL,
+    amount REAL NOT NULL,
+    order_type TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    nav_date TEXT NOT NULL,
+    executed_at TEXT,
+    units_allotted REAL,
+    razorpay_order_id TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_user_created ON orders (user_id, created_at);
+CREATE INDEX IF NOT EXISTS orders_fund_status ON orders (fund_code, status);
+CREATE INDEX IF NOT EXISTS orders_status_created ON orders (status, created_at);
+CREATE TABLE IF NOT EXISTS sip_orders (
+    sip_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    fund_code TEXT NOT NULL,
+    amount REAL NOT NULL,
+    frequency TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT,
+    status TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    last_executed TEXT,
+    next_execution TEXT
+);
+CREATE INDEX IF NOT EXISTS sip_orders_user_created ON sip_orders (user_id, created_at);
+CREATE INDEX IF NOT EXISTS sip_orders_status_next ON sip_orders (status, next_execution);
+CREATE TABLE IF NOT EXISTS holdings (
+    user_id TEXT NOT NULL,
+    scheme_code TEXT NOT NULL,
+    units REAL NOT NULL,
+    cost REAL NOT NULL,
+    PRIMARY KEY (user_id, scheme_code)
+) WITHOUT ROWID;
+-- Investor-side cash flows for XIRR, one per executed order, dated by the
+-- NAV it was priced at: purchases negative, redemptions positive and
+-- prorated to the units actually redeemed (Portfolio.record_cash_flow)
+CREATE TABLE IF NOT EXISTS cash_flows (
+    order_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    scheme_code TEXT NOT NULL,
+    day TEXT NOT NULL,
+    amount REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cash_flows_user ON cash_flows (user_id);
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    name TEXT,
+    email TEXT,
+    phone TEXT,
+    kyc_status TEXT,
+    account_opening_date TEXT
+);
+-- Bumped on every write to a user's orders, SIPs, holdings or profile, so
+-- any worker can tell its cached views are stale
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+USER_VERSION_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS {table}_{event}_user_version AFTER {event} ON {table} BEGIN
+    INSERT INTO user_versions (user_id, version) VALUES (NEW.user_id, 1)
+    ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+END;
+"""
+
+FUND_COLUMNS = ("scheme_code", "scheme_name", "fund_house", "scheme_type", "scheme_category", "scheme_sub_category",
+                "expense_ratio", "risk_grade", "benchmark", "fund_manager", "inception_date", "exit_load",
+                "min_investment", "investment_objective")
+ORDER_COLUMNS = ("order_id", "user_id", "fund_code", "amount", "order_type", "status", "created_at", "nav_date",
+                 "executed_at", "units_allotted", "razorpay_order_id")
+SIP_COLUMNS = ("sip_id", "user_id", "fund_code", "amount", "frequency", "start_date", "end_date", "status",
+               "created_at", "last_executed", "next_execution")
+USER_COLUMNS = ("user_id", "name", "email", "phone", "kyc_status", "account_opening_date")
+
+# OrderManagementSystem journal records -> SQL statements run in order
+JOURNAL_STATEMENTS = {
+    "place": ("INSERT INTO orders (order_id, user_id, fund_code, amount, order_type, status, created_at, "
+              "razorpay_order_id, nav_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",),
+    "place_sip": ("INSERT INTO sip_orders (sip_id, user_id, fund_code, amount, frequency, start_date, end_date, "
+                  "status, created_at, next_execution) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",),
+    "status": ("UPDATE orders SET status = ?2 WHERE order_id = ?1",),
+    "execute": ("UPDATE orders SET executed_at = ?2, units_allotted = ?3 WHERE order_id = ?1",),
+    # Written by SQLiteOrderManagementSystem._update_portfolios after the
+    # execute record. Redemptions are valued against the units held before
+    # the holdings record runs.
+    "cash_flow": (
+        "INSERT INTO cash_flows (order_id, user_id, scheme_code, day, amount) "
+        "SELECT order_id, user_id, fund_code, ?2, -amount FROM orders WHERE order_id = ?1 AND order_type != 'Sell'",
+        "INSERT INTO cash_flows (order_id, user_id, scheme_code, day, amount) "
+        "SELECT o.order_id, o.user_id, o.fund_code, ?2, o.amount * min(o.units_allotted, h.units) / o.units_allotted "
+        "FROM orders o JOIN holdings h ON (h.user_id, h.scheme_code) = (o.user_id, o.fund_code) "
+        "WHERE o.order_id = ?1 AND o.order_type = 'Sell' AND h.units > 0"
+    ),
+    # Holdings follow Portfolio.add_units / redeem_units
+    "holdings": (
+        "INSERT INTO holdings (user_id, scheme_code, units, cost) "
+        "SELECT user_id, fund_code, units_allotted, amount FROM orders WHERE order_id = ?1 AND order_type != 'Sell' "
+        "ON CONFLICT (user_id, scheme_code) DO UPDATE SET units = units + excluded.units, cost = cost + excluded.cost",
+        "UPDATE holdings SET cost = cost - cost * min(o.units_allotted / units, 1.0), "
+        "units = max(units - o.units_allotted, 0.0) "
+        "FROM (SELECT user_id, fund_code, units_allotted FROM orders WHERE order_id = ?1 AND order_type = 'Sell') o "
+        "WHERE units > 0 AND (holdings.user_id, holdings.scheme_code) = (o.user_id, o.fund_code)"
+    ),
+    "sip_status": ("UPDATE sip_orders SET status = ?2 WHERE sip_id = ?1",),
+    "sip_progress": ("UPDATE sip_orders SET last_executed = ?2, next_execution = ?3 WHERE sip_id = ?1",)
+}
+
+def to_db(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def _end_of_day(value):
+    # Sorts after every stored date or datetime on that day
+    return f"{value.isoformat()} 99"
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else None
+
+def _parse_date(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value) if len(value) > 10 else date.fromisoformat(value)
+
+def _order_from_row(row):
+    order = dict(zip(ORDER_COLUMNS, row))
+    order["created_at"] = _parse_datetime(order["created_at"])
+    order["nav_date"] = _parse_date(order["nav_date"])
+    order["executed_at"] = _parse_date(order["executed_at"])
+    return order
+
+def _sip_from_row(row):
+    sip_order = dict(zip(SIP_COLUMNS, row))
+    sip_order["created_at"] = _parse_datetime(sip_order["created_at"])
+    for key in ("start_date", "end_date", "last_executed", "next_execution"):
+        sip_order[key] = _parse_date(sip_order[key])
+    return sip_order
+
+class SQLiteStorage:
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._appended = 0
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+            for table in ("orders", "sip_orders", "holdings", "users"):
+                for event in ("INSERT", "UPDATE"):
+                    conn.executescript(USER_VERSION_TRIGGER.format(table=table, event=event))
+
+    def connection(self):
+        # One connection per thread, opened on first use
+        conn = getattr(self._local, "connection", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self.connection()
+        with conn:
+            yield conn
+
+    def close(self):
+        conn = getattr(self._local, "connection", None)
+        if conn is not None:
+            conn.close()
+            self._local.connection = None
+
+    # Journal interface used by OrderManagementSystem: records are applied
+    # inside the calling thread's open transaction and wait() commits them
+
+    @property
+    def appended(self):
+        return self._appended
+
+    def append(self, op, fields):
+        conn = self.connection()
+        params = [to_db(value) for value in fields]
+        for statement in JOURNAL_STATEMENTS[op]:
+            conn.execute(statement, params)
+        self._appended += 1
+        return self._appended
+
+    def wait(self, sequence=None):
+        self.connection().commit()
+
+    def begin_immediate(self):
+        # Takes the database write lock up front instead of at the first
+        # write, so rows read before writing can't change until the commit
+        conn = self.connection()
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+
+    def load(self):
+        return None, iter(())
+
+    # Funds
+
+    def data_version(self):
+        row = self.connection().execute("SELECT value FROM meta WHERE key = 'fund_data_version'").fetchone()
+        return row[0] if row else 0
+
+    def bump_data_version(self, conn, scheme_codes):
+        # Returns the new data version, recorded against every scheme in
+        # `scheme_codes`
+        conn.execute("INSERT INTO meta (key, value) VALUES ('fund_data_version', 1) "
+                     "ON CONFLICT (key) DO UPDATE SET value = value + 1")
+        version = conn.execute("SELECT value FROM meta WHERE key = 'fund_data_version'").fetchone()[0]
+        conn.executemany("INSERT INTO fund_versions (scheme_code, version) VALUES (?, ?) "
+                         "ON CONFLICT (scheme_code) DO UPDATE SET version = excluded.version",
+                         [(scheme_code, version) for scheme_code in scheme_codes])
+        return version
+
+    def changed_funds(self, since):
+        rows = self.connection().execute("SELECT scheme_code FROM fund_versions WHERE version > ?", (since,))
+        return [row[0] for row in rows]
+
+    def save_fund(self, conn, fund):
+        conn.execute(f"INSERT OR REPLACE INTO funds ({', '.join(FUND_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' * len(FUND_COLUMNS))})",
+                     [to_db(getattr(fund, column)) for column in FUND_COLUMNS])
+
+    def save_history(self, conn, table, scheme_code, ordinals, values):
+        column = "nav" if table == "nav_history" else "aum"
+        conn.executemany(f"INSERT OR REPLACE INTO {table} (scheme_code, date, {column}) VALUES (?, ?, ?)",
+                         zip([scheme_code] * len(ordinals), ordinals, values))
+
+    def load_funds(self, scheme_codes=None):
+        # Every fund, or just those in `scheme_codes`
+        sql = f"SELECT {', '.join(FUND_COLUMNS)} FROM funds"
+        conn = self.connection()
+        if scheme_codes is None:
+            rows = conn.execute(sql + " ORDER BY scheme_code")
+        else:
+            rows = (row for scheme_code in scheme_codes
+                    for row in conn.execute(sql + " WHERE scheme_code = ?", (scheme_code,)))
+        return [dict(zip(FUND_COLUMNS, row)) for row in rows]
+
+    def load_history(self, table, since=None, scheme_codes=None):
+        # Yields (scheme_code, date ordinals, values) per scheme, for every
+        # scheme or just those in `scheme_codes`
+        column = "nav" if table == "nav_history" else "aum"
+        sql = f"SELECT scheme_code, date, {column} FROM {table} WHERE date >= ?"
+        conn = self.connection()
+        if scheme_codes is None:
+            batches = [conn.execute(sql + " ORDER BY scheme_code, date", (since or 0,))]
+        else:
+            batches = (conn.execute(sql + " AND scheme_code = ? ORDER BY date", (since or 0, scheme_code))
+                       for scheme_code in scheme_codes)
+        for rows in batches:
+            for scheme_code, group in groupby(rows, key=lambda row: row[0]):
+                ordinals, values = array("i"), array("d")
+                for _, ordinal, value in group:
+                    ordinals.append(ordinal)
+                    values.append(value)
+                yield scheme_code, ordinals, values
+
+    def nav_range(self, scheme_code, start=None, end=None):
+        rows = self.connection().execute(
+            "SELECT date, nav FROM nav_history WHERE scheme_code = ? AND date BETWEEN ? AND ? ORDER BY date",
+            (scheme_code, start.toordinal() if start else 0, end.toordinal() if end else 1 << 31))
+        ordinals, values = array("i"), array("d")
+        for ordinal, value in rows:
+            ordinals.append(ordinal)
+            values.append(value)
+        return ordinals, values
+
+    # Orders and SIPs
+
+    def get_record(self, table, key, value):
+        columns = ORDER_COLUMNS if table == "orders" else SIP_COLUMNS
+        row = self.connection().execute(
+            f"SELECT {', '.join(columns)} FROM {table} WHERE {key} = ?", (value,)).fetchone()
+        if row is None:
+            return None
+        return _order_from_row(row) if table == "orders" else _sip_from_row(row)
+
+    def get_records(self, table, key, values):
+        # key -> record for every one of `values` that exists, a few hundred
+        # per query
+        columns = ORDER_COLUMNS if table == "orders" else SIP_COLUMNS
+        from_row = _order_from_row if table == "orders" else _sip_from_row
+        sql = f"SELECT {', '.join(columns)} FROM {table} WHERE {key} IN "
+        conn = self.connection()
+        records = {}
+        values = list(values)
+        for i in range(0, len(values), 500):
+            batch = values[i:i + 500]
+            for row in conn.execute(sql + f"({', '.join('?' * len(batch))})", batch):
+                record = from_row(row)
+                records[record[key]] = record
+        return records
+
+    def record_ids(self, table, key):
+        return [row[0] for row in self.connection().execute(f"SELECT {key} FROM {table}")]
+
+    def count(self, table):
+        return self.connection().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def order_ids_with_status(self, status):
+        rows = self.connection().execute("SELECT order_id FROM orders WHERE status = ? ORDER BY created_at", (status,))
+        return [row[0] for row in rows]
+
+    def due_sips(self, current_date):
+        rows = self.connection().execute(
+            "SELECT next_execution, sip_id FROM sip_orders WHERE status = 'Active' AND next_execution <= ?",
+            (_end_of_day(current_date),))
+        return [(_parse_date(next_execution), sip_id) for next_execution, sip_id in rows]
+
+    def user_records(self, table, user_id, status=None, start=None, end=None, offset=0, limit=None):
+        columns = ORDER_COLUMNS if table == "orders" else SIP_COLUMNS
+        sql = f"SELECT {', '.join(columns)} FROM {table} WHERE user_id = ?"
+        params = [user_id]
+        if start:
+            sql += " AND created_at >= ?"
+            params.append(to_db(start))
+        if end:
+            sql += " AND created_at <= ?"
+            params.append(to_db(end) if isinstance(end, datetime) else _end_of_day(end))
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " ORDER BY created_at LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        from_row = _order_from_row if table == "orders" else _sip_from_row
+        return [from_row(row) for row in self.connection().execute(sql, params)]
+
+    def holdings(self, user_id):
+        return self.connection().execute(
+            "SELECT scheme_code, units, cost FROM holdings WHERE user_id = ? ORDER BY scheme_code", (user_id,)).fetchall()
+
+    def cash_flows(self, user_id):
+        return self.connection().execute(
+            "SELECT scheme_code, day, amount FROM cash_flows WHERE user_id = ? ORDER BY rowid", (user_id,)).fetchall()
+
+    def holding_user_ids(self):
+        return [row[0] for row in self.connection().execute("SELECT DISTINCT user_id FROM holdings")]
+
+    # Users
+
+    def user_version(self, user_id):
+        row = self.connection().execute("SELECT version FROM user_versions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def get_user(self, user_id):
+        row = self.connection().execute(
+            f"SELECT {', '.join(USER_COLUMNS)} FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return dict(zip(USER_COLUMNS, row)) if row else None
+
+    def save_user(self, user):
+        with self.transaction() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO users ({', '.join(USER_COLUMNS)}) "
+                         f"VALUES ({', '.join('?' * len(USER_COLUMNS))})",
+                         [to_db(user.get(column)) for column in USER_COLUMNS])
+
+class SQLiteRecords(MutableMapping):
+    # Stands in for OrderManagementSystem.orders / sip_orders. Every lookup
+    # reads the current row, so all workers see one book; rows are written
+    # by the journal records that accompany every change, so assignment
+    # itself has nothing left to do.
+    def __init__(self, storage, table, key):
+        self.storage = storage
+        self.table = table
+        self.key = key
+
+    def __getitem__(self, record_id):
+        record = self.storage.get_record(self.table, self.key, record_id)
+        if record is None:
+            raise KeyError(record_id)
+        return record
+
+    def __contains__(self, record_id):
+        return self.storage.get_record(self.table, self.key, record_id) is not None
+
+    def __setitem__(self, record_id, record):
+        pass
+
+    # Rows are addressed by their key
+    def row_of(self, record_id):
+        return record_id
+
+    def at(self, record_id):
+        return self[record_id]
+
+    def columns(self, record_ids, names):
+        # As _Table.columns(), from one query per few hundred ids
+        records = self.storage.get_records(self.table, self.key, record_ids)
+        return [[records[record_id][name] for record_id in record_ids] for name in names]
+
+    def assign(self, record_ids, name, values):
+        pass
+
+    def __delitem__(self, record_id):
+        with self.storage.transaction() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE {self.key} = ?", (record_id,))
+
+    def __iter__(self):
+        return iter(self.storage.record_ids(self.table, self.key))
+
+    def __len__(self):
+        return self.storage.count(self.table)
+
+class _Unindexed:
+    # Per-user and per-status id collections are answered by SQL instead of
+    # being kept in memory; additions, to the returned throwaway collections
+    # or through add(), are dropped
+    def __init__(self, factory=None):
+        self.factory = factory
+
+    def __getitem__(self, key):
+        return self.factory()
+
+    def get(self, key, default=None):
+        return default
+
+    def add(self, key, value):
+        pass
+
+class SQLiteFundManager(FundManager):
+    # Writes go through to SQLite; reads are served from memory after
+    # loading the funds, all AUM and the last `history_days` of NAVs. sync()
+    # picks up the schemes other processes have changed since.
+    def __init__(self, storage, history_days=None):
+        super().__init__()
+        self.storage = storage
+        self.history_days = history_days
+        self._history_start = None
+        if history_days:
+            self._history_start = (date.today() - timedelta(days=history_days)).toordinal()
+        self._sync_lock = threading.Lock()
+        self._loaded_version = storage.data_version()
+        for fund in self._load_funds().values():
+            FundManager.add_fund(self, fund)
+        self.refresh_performance()
+
+    def _load_funds(self, scheme_codes=None):
+        # Fresh Fund objects with their in-memory window of history, built
+        # without touching the live state
+        funds = {}
+        for row in self.storage.load_funds(scheme_codes):
+            fund = Fund(row["scheme_code"], row["scheme_name"], row["fund_house"], row["scheme_type"],
+                        row["scheme_category"], row["scheme_sub_category"])
+            fund.set_fund_details(row["expense_ratio"], row["risk_grade"], row["benchmark"], row["fund_manager"],
+                                  _parse_date(row["inception_date"]), row["exit_load"], row["min_investment"],
+                                  row["investment_objective"])
+            funds[fund.scheme_code] = fund
+        for scheme_code, ordinals, values in self.storage.load_history("nav_history", self._history_start,
+                                                                       scheme_codes):
+            if scheme_code in funds:
+                funds[scheme_code].nav_history.extend(ordinals, values)
+        for scheme_code, ordinals, values in self.storage.load_history("aum_history", None, scheme_codes):
+            if scheme_code in funds:
+                funds[scheme_code].aum_history.extend(ordinals, values)
+        return funds
+
+    def sync(self):
+        # Reloads only the schemes written since the last sync. Each one is
+        # rebuilt off to the side and replaces the old Fund object whole, so
+        # readers see either version of a fund, never one half loaded.
+        if self.storage.data_version() == self._loaded_version:
+            return
+        with self._sync_lock:
+            version = self.storage.data_version()
+            if version == self._loaded_version:
+                return
+            funds = self._load_funds(self.storage.changed_funds(self._loaded_version))
+            for fund in funds.values():
+                FundManager.add_fund(self, fund)
+            self._loaded_version = version
+        if funds:
+            self._refresh_incrementally(list(funds))
+
+    def _written(self, conn, scheme_codes):
+        # Our own writes are already in memory: skip them in sync() unless
+        # another process wrote in between
+        version = self.storage.bump_data_version(conn, scheme_codes)
+        if version == self._loaded_version + 1:
+            self._loaded_version = version
+
+    def add_fund(self, fund):
+        super().add_fund(fund)
+        with self.storage.transaction() as conn:
+            self.storage.save_fund(conn, fund)
+            self._written(conn, [fund.scheme_code])
+
+    def set_fund_details(self, scheme_code, *args, **kwargs):
+        super().set_fund_details(scheme_code, *args, **kwargs)
+        if scheme_code in self.funds:
+            with self.storage.transaction() as conn:
+                self.storage.save_fund(conn, self.funds[scheme_code])
+                self._written(conn, [scheme_code])
+
+    def update_nav(self, scheme_code, date, nav):
+        super().update_nav(scheme_code, date, nav)
+        if scheme_code in self.funds:
+            self._save_history("nav_history", scheme_code, [to_ordinal(date)], [nav])
+
+    def update_aum(self, scheme_code, date, aum):
+        super().update_aum(scheme_code, date, aum)
+        if scheme_code in self.funds:
+            self._save_history("aum_history", scheme_code, [to_ordinal(date)], [aum])
+
+    def _extend_nav_history(self, fund, ordinals, navs):
+        super()._extend_nav_history(fund, ordinals, navs)
+        self._save_history("nav_history", fund.scheme_code, ordinals, navs)
+
+    def _save_history(self, table, scheme_code, ordinals, values):
+        with self.storage.transaction() as conn:
+            self.storage.save_history(conn, table, scheme_code, ordinals, values)
+            self._written(conn, [scheme_code])
+
+    def get_nav_range(self, scheme_code, start=None, end=None):
+        # Anything before the in-memory window is read from disk
+        if self._history_start and (start is None or to_ordinal(start) < self._history_start):
+            return self.storage.nav_range(scheme_code, start, end)
+        return super().get_nav_range(scheme_code, start, end)
+
+class SQLiteOrderManagementSystem(OrderManagementSystem):
+    max_cached_portfolios = 10000
+
+    def __init__(self, fund_manager, storage, **options):
+        super().__init__(fund_manager, journal=storage, **options)
+        self.storage = storage
+        self.orders = SQLiteRecords(storage, "orders", "order_id")
+        self.sip_orders = SQLiteRecords(storage, "sip_orders", "sip_id")
+        self._orders_by_status = _Unindexed(dict)
+        self._user_orders = _Unindexed()
+        self._user_sips = _Unindexed()
+        # user_id -> (user version, Portfolio), least recently used first
+        self._portfolios = OrderedDict()
+        self._portfolios_lock = threading.Lock()
+
+    def _begin_writes(self):
+        # Other workers write the same rows: a status is checked and changed
+        # under one database write lock, or a cancel committed in between
+        # could be overwritten
+        self.storage.begin_immediate()
+
+    def _set_order_status(self, order, status):
+        # The status record is the whole write: one UPDATE of the indexed
+        # column, whose trigger also bumps the user's version
+        self._log("status", order["order_id"], status)
+        order["status"] = status
+
+    def snapshot(self):
+        pass  # the database is already the durable copy
+
+    def _order_ids_with_status(self, status):
+        return self.storage.order_ids_with_status(status)
+
+    # The (status, next_execution) index is the due-date index
+    def _schedule_sip(self, sip_id, due):
+        pass
+
+    def _unschedule_sip(self, sip_order):
+        pass
+
+    def _pop_due_sips(self, current_date):
+        return [sip_id for _, sip_id in sorted(self.storage.due_sips(current_date))]
+
+    def _set_order_statuses(self, order_ids, status):
+        for order_id in order_ids:
+            self._log("status", order_id, status)
+
+    def _update_portfolios(self, order_ids, days):
+        # Each order's cash flow goes in just before its holdings record
+        for order_id, day in zip(order_ids, days):
+            self._log("cash_flow", order_id, day)
+            self._log("holdings", order_id)
+
+    def get_portfolio(self, user_id):
+        # Rebuilt from the holdings and cash_flows tables only once the
+        # user's version moves; until then reads share one Portfolio, and
+        # with it the XIRR its valuation() caches
+        version = self.storage.user_version(user_id)
+        with self._portfolios_lock:
+            entry = self._portfolios.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._portfolios.move_to_end(user_id)
+                return entry[1]
+
+        portfolio = Portfolio(user_id)
+        for scheme_code, units, cost in self.storage.holdings(user_id):
+            portfolio.add_units(scheme_code, units, cost)
+        for scheme_code, day, amount in self.storage.cash_flows(user_id):
+            portfolio.record_cash_flow(scheme_code, _parse_date(day), amount)
+        with self._portfolios_lock:
+            self._portfolios[user_id] = (version, portfolio)
+            self._portfolios.move_to_end(user_id)
+            while len(self._portfolios) > self.max_cached_portfolios:
+                self._portfolios.popitem(last=False)
+        return portfolio
+
+    def compute_xirr(self, user_ids=None, as_of=None, by_scheme=False):
+        if user_ids is None:
+            user_ids = self.storage.holding_user_ids()
+        return super().compute_xirr(user_ids, as_of, by_scheme)
+
+    def user_version(self, user_id):
+        return self.storage.user_version(user_id)
+
+    def ledger_version(self, user_id):
+        return 0  # holdings writes bump user_version
+
+    def get_user_orders(self, user_id, status=None, start=None, end=None, offset=0, limit=None):
+        return self.storage.user_records("orders", user_id, status, start, end, offset, limit)
+
+    def get_user_sips(self, user_id, status=None, start=None, end=None, offset=0, limit=None):
+        return self.storage.user_records("sip_orders", user_id, status, start, end, offset, limit)
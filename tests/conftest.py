@@ -0,0 +1,57 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import serve
+
+# The source files share one namespace instead of importing each other (see
+# serve.py), so tests run against a module they are executed into. It is
+# registered as "mfapp", like the served apps, so process-pool workers can
+# unpickle its functions; apps are loaded under names of their own.
+
+@pytest.fixture(scope="session")
+def mf():
+    return serve.load_module(serve.SHARED_FILES)
+
+@pytest.fixture(scope="module")
+def load_app():
+    # load_app(filename, name, **environ) -> the app's module
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        def load(filename, name, **environ):
+            monkeypatch.setenv("RAZORPAY_KEY_SECRET", "test_secret")
+            for key in ("MF_DATABASE", "ORDER_JOURNAL_DIR", "PAYMENT_GATEWAY_ADDRESS"):
+                monkeypatch.delenv(key, raising=False)
+            for key, value in environ.items():
+                monkeypatch.setenv(key, value)
+            serve.load_app(filename, name)
+            return sys.modules[name]
+        yield load
+
+@pytest.fixture
+def add_priced_funds(mf):
+    # add_priced_funds(fund_manager, *codes): funds with a NAV every day from
+    # 30 days back to 10 days ahead, so orders placed at any time of day
+    # can execute from tomorrow on
+    def add(fund_manager, *codes):
+        today = date.today()
+        for code in codes:
+            fund_manager.add_fund(mf.Fund(code, f"Fund {code}", "House", "Open Ended", "Equity", "Large Cap"))
+            for offset in range(-30, 11):
+                fund_manager.update_nav(code, today + timedelta(days=offset), 100.0 + offset)
+        return fund_manager
+    return add
+
+@pytest.fixture
+def place_paid():
+    # place_paid(oms, user_id, fund_code, amount, order_type) -> id of a
+    # lump-sum order whose payment has been confirmed
+    def place(oms, user_id, fund_code, amount=1000, order_type="Buy"):
+        order_id, razorpay_order_id = oms.place_lump_sum_order(user_id, fund_code, amount, order_type)
+        assert oms.confirm_payment(order_id, *oms.razorpay_client.simulate_payment(razorpay_order_id))
+        return order_id
+    return place
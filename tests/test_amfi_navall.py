@@ -0,0 +1,101 @@
+import io
+from datetime import date
+
+NAVALL = """Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date
+
+Open Ended Schemes(Equity Scheme - Large Cap Fund)
+
+Axis Mutual Fund
+
+120465;INF846K01EW2;-;Axis Bluechip Fund - Direct Plan - Growth;58.12;14-Jun-2024
+120466;INF846K01EX0;-;Axis Bluechip Fund - Regular Plan - Growth;51.40;14-Jun-2024
+
+HDFC Mutual Fund
+
+119062;INF179K01XQ0;-;HDFC Top 100 Fund - Direct Plan - Growth;1120.5;14-Jun-2024
+119063;-;-;HDFC Top 100 Fund - Segregated;N.A.;14-Jun-2024
+
+Open Ended Schemes(Debt Scheme - Liquid Fund)
+
+HDFC Mutual Fund
+
+119091;INF179KB1HK0;-;HDFC Liquid Fund - Direct Plan - Growth;4801.3;14-Jun-2024
+119092;INF179KB1HL8;-;HDFC Liquid Fund - Daily IDCW;1019.8;31-Jun-2024
+"""
+
+# NAV history report: one scheme over several days, different column order
+HISTORY = """Scheme Code;Scheme Name;ISIN Div Payout/ISIN Growth;ISIN Div Reinvestment;Net Asset Value;Repurchase Price;Sale Price;Date
+
+Open Ended Schemes(Equity Scheme - Large Cap Fund)
+
+Axis Mutual Fund
+
+120465;Axis Bluechip Fund - Direct Plan - Growth;INF846K01EW2;;57.80;;;12-Jun-2024
+120465;Axis Bluechip Fund - Direct Plan - Growth;INF846K01EW2;;57.95;;;13-Jun-2024
+120465;Axis Bluechip Fund - Direct Plan - Growth;INF846K01EW2;;58.12;;;14-Jun-2024
+"""
+
+def test_creates_funds_from_section_and_fund_house_headers(mf):
+    fund_manager = mf.FundManager()
+    stats = fund_manager.load_amfi_navall(io.StringIO(NAVALL))
+
+    assert stats["funds_created"] == 4
+    axis = fund_manager.get_fund("120465")
+    assert axis.scheme_name == "Axis Bluechip Fund - Direct Plan - Growth"
+    assert axis.fund_house == "Axis Mutual Fund"
+    assert (axis.scheme_type, axis.scheme_category, axis.scheme_sub_category) == \
+        ("Open Ended Schemes", "Equity Scheme", "Large Cap Fund")
+    liquid = fund_manager.get_fund("119091")
+    assert liquid.fund_house == "HDFC Mutual Fund"
+    assert liquid.scheme_sub_category == "Liquid Fund"
+    assert liquid.get_current_nav() == 4801.3
+    assert liquid.nav_history.latest_date() == date(2024, 6, 14)
+    assert [f.scheme_code for f in fund_manager.find_funds(scheme_category="Debt Scheme")] == ["119091"]
+
+def test_skips_rows_without_a_nav_or_valid_date(mf):
+    fund_manager = mf.FundManager()
+    stats = fund_manager.load_amfi_navall(io.StringIO(NAVALL))
+
+    assert (stats["rows"], stats["loaded"], stats["skipped"]) == (6, 4, 2)
+    assert fund_manager.get_fund("119063") is None
+    assert fund_manager.get_fund("119092") is None
+
+def test_small_chunks_load_the_same_histories(mf):
+    whole = mf.FundManager()
+    whole.load_amfi_navall(io.StringIO(NAVALL + HISTORY))
+    chunked = mf.FundManager()
+    stats = chunked.load_amfi_navall(io.StringIO(NAVALL + HISTORY), chunk_size=64)
+
+    assert stats["funds_created"] == 4
+    assert sorted(chunked.funds) == sorted(whole.funds)
+    for code, fund in whole.funds.items():
+        assert list(chunked.funds[code].nav_history) == list(fund.nav_history)
+
+def test_extends_existing_funds_and_refreshes_performance(mf, tmp_path):
+    fund_manager = mf.FundManager()
+    fund_manager.add_fund(mf.Fund("120465", "Axis Bluechip Fund", "Axis Mutual Fund", "Open Ended", "Equity",
+                                  "Large Cap"))
+    fund_manager.update_nav("120465", date(2023, 6, 14), 50.0)
+    path = tmp_path / "NAVAll.txt"
+    path.write_text(HISTORY, encoding="utf-8")
+
+    stats = fund_manager.load_amfi_navall(str(path))
+
+    assert stats["funds_created"] == 0
+    fund = fund_manager.get_fund("120465")
+    # The existing fund keeps its own name and classification
+    assert fund.scheme_name == "Axis Bluechip Fund"
+    assert [point["nav"] for point in fund.nav_history] == [50.0, 57.80, 57.95, 58.12]
+    assert fund.performance_as_of == date(2024, 6, 14).toordinal()
+    assert round(fund.performance["1y_return"], 2) == 16.24
+    assert [f.scheme_code for f in fund_manager.find_funds(ranges={"nav": (58, 59)})] == ["120465"]
+
+def test_refresh_can_be_deferred(mf):
+    fund_manager = mf.FundManager()
+    fund_manager.load_amfi_navall(io.StringIO(HISTORY), refresh_performance=False)
+
+    fund = fund_manager.get_fund("120465")
+    assert fund.performance is None
+    # Refreshed on first read instead
+    fund_manager.get_performance(["120465"])
+    assert fund.performance_as_of == date(2024, 6, 14).toordinal()
@@ -0,0 +1,150 @@
+import asyncio
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from serve import is_asgi
+
+TOMORROW = date.today() + timedelta(days=1)
+
+# Quart's test client is async; each test drives it with asyncio.run. The
+# app's lifespan isn't started, so its executors are shut down here.
+
+@pytest.fixture(scope="module")
+def asgi(load_app):
+    module = load_app("mutual-fund-asgi.py", "mfapp_asgi")
+    fund_manager = module.state.fund_manager
+    for code, category in (("EQ1", "Equity"), ("EQ2", "Equity"), ("DB1", "Debt")):
+        fund_manager.add_fund(module.Fund(code, f"Fund {code}", "House", "Open Ended", category, "Sub"))
+        for offset in range(-30, 11):
+            fund_manager.update_nav(code, date.today() + timedelta(days=offset), 100.0 + offset)
+    yield module
+    module.state.close()
+
+def run(coro):
+    return asyncio.run(coro)
+
+def test_is_served_as_asgi(asgi):
+    assert is_asgi(asgi.app)
+
+def test_fund_routes(asgi):
+    async def scenario():
+        client = asgi.app.test_client()
+        funds = await (await client.get("/funds")).get_json()
+        assert sorted(fund["scheme_code"] for fund in funds) == ["DB1", "EQ1", "EQ2"]
+        assert (await client.get("/funds/NOPE")).status_code == 404
+
+        details = await client.get("/api/funds/EQ1")
+        assert details.status_code == 200
+        assert (await details.get_json())["nav"] == 110.0
+        assert (await client.get("/api/funds/NOPE")).status_code == 404
+
+        page = await (await client.get("/api/funds?category=Equity&limit=1")).get_json()
+        assert [fund["scheme_code"] for fund in page["funds"]] == ["EQ1"]
+        assert page["next_cursor"] == "EQ1"
+        nav = await (await client.get("/api/funds/DB1/nav?interval=weekly&max_points=3")).get_json()
+        assert len(nav["points"]) == 3
+        assert (await client.get("/api/funds/DB1/nav?interval=hourly")).status_code == 400
+    run(scenario())
+
+def test_etag_revalidation(asgi):
+    async def scenario():
+        client = asgi.app.test_client()
+        first = await client.get("/api/funds/EQ2")
+        etag = first.headers["ETag"]
+        again = await client.get("/api/funds/EQ2", headers={"If-None-Match": etag})
+        assert again.status_code == 304
+        assert await again.get_data() == b""
+
+        # Any fund data write makes cached bodies stale
+        asgi.state.fund_manager.update_aum("EQ2", date.today(), 5000.0)
+        changed = await client.get("/api/funds/EQ2", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.headers["ETag"] != etag
+        assert (await changed.get_json())["aum"] == 5000.0
+    run(scenario())
+
+def test_streams_ndjson(asgi, monkeypatch):
+    monkeypatch.setitem(asgi.__dict__, "STREAM_CHUNK_SIZE", 2)
+
+    async def scenario():
+        client = asgi.app.test_client()
+        response = await client.get("/api/funds?format=ndjson")
+        assert response.mimetype == "application/x-ndjson"
+        lines = (await response.get_data(as_text=True)).splitlines()
+        assert [json.loads(line)["scheme_code"] for line in lines] == ["DB1", "EQ1", "EQ2"]
+        assert (await client.get("/api/funds?format=ndjson&min_nav=x")).status_code == 400
+    run(scenario())
+
+def test_order_lifecycle(asgi):
+    async def scenario():
+        client = asgi.app.test_client()
+        response = await client.post("/orders/lumpsum", json={"user_id": "life", "fund_code": "EQ1", "amount": 1000,
+                                                              "order_type": "Buy"})
+        assert response.status_code == 201
+        order = await response.get_json()
+        payment_id, signature = asgi.state.razorpay_client.simulate_payment(order["razorpay_order_id"])
+        url = f"/orders/{order['order_id']}/confirm-payment"
+        assert (await client.post(url, json={"payment_id": payment_id, "signature": "bad"})).status_code == 400
+        assert (await client.post(url, json={"payment_id": payment_id, "signature": signature})).status_code == 200
+        status = await (await client.get(f"/orders/{order['order_id']}")).get_json()
+        assert status == {"order_id": order["order_id"], "status": "Pending"}
+
+        stats = await (await client.post("/admin/process-orders", json={"date": TOMORROW.isoformat()})).get_json()
+        assert stats["executed"] >= 1
+        orders = await (await client.get("/users/life/orders?status=Executed")).get_json()
+        assert [o["order_id"] for o in orders] == [order["order_id"]]
+        assert (await client.get("/users/life/orders?offset=-1")).status_code == 400
+        portfolio = await (await client.get("/api/users/life/portfolio")).get_json()
+        assert portfolio["total_investment"] == 1000
+        assert [holding["scheme_code"] for holding in portfolio["holdings"]] == ["EQ1"]
+        dashboard = await (await client.get("/api/users/life")).get_json()
+        assert dashboard["user_info"]["user_id"] == "life"
+        assert [o["order_id"] for o in dashboard["orders"]] == [order["order_id"]]
+    run(scenario())
+
+def test_sip_routes(asgi):
+    async def scenario():
+        client = asgi.app.test_client()
+        sip = {"user_id": "saver", "fund_code": "EQ1", "amount": 500, "frequency": "Monthly",
+               "start_date": "2024-06-03"}
+        response = await client.post("/orders/sip", json=dict(sip, frequency="Hourly"))
+        assert response.status_code == 400
+        sip_id = (await (await client.post("/orders/sip", json=sip)).get_json())["sip_id"]
+        assert (await (await client.get(f"/orders/sip/{sip_id}")).get_json())["status"] == "Active"
+        assert (await client.post(f"/orders/sip/{sip_id}/stop")).status_code == 200
+        assert (await client.post(f"/orders/sip/{sip_id}/stop")).status_code == 400
+        sips = await (await client.get("/users/saver/sips")).get_json()
+        assert [s["status"] for s in sips] == ["Stopped"]
+    run(scenario())
+
+def test_concurrent_writes_apply_one_at_a_time(asgi):
+    async def scenario():
+        client = asgi.app.test_client()
+        responses = await asyncio.gather(*(
+            client.post("/orders/lumpsum", json={"user_id": "busy", "fund_code": "EQ2", "amount": 100 + i,
+                                                 "order_type": "Buy"})
+            for i in range(40)))
+        order_ids = [(await response.get_json())["order_id"] for response in responses]
+        assert len(set(order_ids)) == 40
+        payments = [{"order_id": order_id, "payment_id": "pay", "signature": "bad"} for order_id in order_ids]
+        result = await (await client.post("/orders/payments/confirm", json=payments)).get_json()
+        assert result["counts"]["failed"] == 40
+        orders = await (await client.get("/users/busy/orders")).get_json()
+        assert sorted(o["amount"] for o in orders) == list(range(100, 140))
+    run(scenario())
+
+def test_sqlite_mode_reads_on_reader_threads(load_app, tmp_path):
+    module = load_app("mutual-fund-asgi.py", "mfapp_asgi_sqlite", MF_DATABASE=str(tmp_path / "mf.db"))
+    try:
+        async def scenario():
+            client = module.app.test_client()
+            order = await (await client.post("/orders/lumpsum", json={
+                "user_id": "u1", "fund_code": "EQ1", "amount": 100, "order_type": "Buy"})).get_json()
+            status = await (await client.get(f"/orders/{order['order_id']}")).get_json()
+            assert status["status"] == "Pending Payment"
+            assert module.state.storage.count("orders") == 1
+        run(scenario())
+    finally:
+        module.state.close()
@@ -0,0 +1,81 @@
+import json
+from datetime import date
+
+import pytest
+
+@pytest.fixture
+def index(mf):
+    index = mf.SortedIndex()
+    for code, key in (("C", 3.0), ("A", 1.0), ("B", 2.0), ("B2", 2.0), ("D", 4.0)):
+        index.set(code, key)
+    return index
+
+def test_range_bounds_are_inclusive_and_optional(index):
+    assert index.range() == ["A", "B", "B2", "C", "D"]
+    assert index.range(2.0, 3.0) == ["B", "B2", "C"]
+    assert index.range(low=2.5) == ["C", "D"]
+    assert index.range(high=2.0) == ["A", "B", "B2"]
+    assert index.range(5.0) == []
+    assert index.range(3.5, 2.5) == []
+
+def test_set_moves_and_discard_removes(index):
+    # Moving one of two equal keys leaves the other in place
+    index.set("B", 3.5)
+    assert index.range(2.0, 2.0) == ["B2"]
+    assert index.range(3.5, 3.5) == ["B"]
+    index.set("B", 3.5)
+    assert len(index) == 5
+
+    index.discard("B2")
+    index.discard("missing")
+    assert index.range() == ["A", "C", "B", "D"]
+    # A None key takes the code out of the index
+    index.set("A", None)
+    assert index.range() == ["C", "B", "D"]
+    assert "A" not in index.key_of
+
+@pytest.fixture
+def fund_manager(mf):
+    fund_manager = mf.FundManager()
+    for i in range(5):
+        code = f"F{i}"
+        fund_manager.add_fund(mf.Fund(code, f"Fund {i}", "House", "Open Ended", "Equity", "Sub"))
+        fund_manager.update_nav(code, date(2024, 6, 14), 10.0 + i)
+        fund_manager.update_aum(code, date(2024, 6, 14), 100.0 * (5 - i))
+    fund_manager.set_fund_details("F1", 0.5, "High", "NIFTY 50 TRI", "Manager", date(2010, 1, 1), "1%", 500, "Growth")
+    # Never priced: no NAV, no AUM, no expense ratio
+    fund_manager.add_fund(mf.Fund("NEW", "New Fund", "House", "Open Ended", "Equity", "Sub"))
+    return fund_manager
+
+def find(fund_manager, **ranges):
+    return [f.scheme_code for f in fund_manager.find_funds(ranges=ranges)]
+
+def test_funds_without_a_value_never_match(fund_manager):
+    assert find(fund_manager, nav=(11.0, 13.0)) == ["F1", "F2", "F3"]
+    assert find(fund_manager, nav=(12.5, None)) == ["F3", "F4"]
+    assert find(fund_manager, nav=(None, 11.0)) == ["F0", "F1"]
+    assert find(fund_manager, nav=(None, None)) == ["F0", "F1", "F2", "F3", "F4"]
+    assert find(fund_manager, expense_ratio=(None, 1.0)) == ["F1"]
+    assert find(fund_manager, aum=(200.0, None), nav=(11.0, None)) == ["F1", "F2", "F3"]
+    with pytest.raises(ValueError):
+        find(fund_manager, returns=(None, 1.0))
+
+def test_nav_updates_move_funds_between_ranges(fund_manager):
+    fund_manager.update_nav("F0", date(2024, 6, 17), 20.0)
+    fund_manager.update_nav("NEW", date(2024, 6, 17), 12.0)
+    # A back-dated NAV leaves the latest one in place
+    fund_manager.update_nav("F4", date(2024, 6, 13), 1.0)
+
+    assert find(fund_manager, nav=(None, 12.0)) == ["F1", "F2", "NEW"]
+    assert find(fund_manager, nav=(14.0, None)) == ["F0", "F4"]
+
+def test_payload_takes_either_end_of_a_range(mf, fund_manager):
+    def payload(**args):
+        body, status = mf.build_funds_payload(fund_manager, args)
+        assert status == 200
+        return [fund["scheme_code"] for fund in json.loads(body)]
+
+    assert payload(min_nav="13") == ["F3", "F4"]
+    assert payload(max_nav="11.5") == ["F0", "F1"]
+    assert payload(min_nav="11", max_nav="12", max_aum="350") == ["F2"]
+    assert mf.build_funds_payload(fund_manager, {"min_nav": "ten"})[1] == 400
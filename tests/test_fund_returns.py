@@ -0,0 +1,47 @@
+from datetime import date
+
+import pytest
+
+HISTORY = {
+    # 29 December is the last NAV of 2023
+    "LONG": {date(2019, 6, 14): 50.0, date(2021, 6, 14): 80.0, date(2023, 6, 14): 90.0, date(2023, 12, 29): 95.0,
+             date(2024, 6, 14): 100.0},
+    "NEW": {date(2023, 2, 28): 20.0, date(2023, 3, 1): 30.0, date(2024, 2, 29): 33.0},
+    "EMPTY": {}
+}
+
+@pytest.fixture
+def fund_manager(mf):
+    fund_manager = mf.FundManager()
+    for code, navs in HISTORY.items():
+        fund_manager.add_fund(mf.Fund(code, f"Fund {code}", "House", "Open Ended", "Equity", "Large Cap"))
+        for day, nav in navs.items():
+            fund_manager.update_nav(code, day, nav)
+    return fund_manager
+
+def test_returns_from_each_fund_latest_nav(fund_manager):
+    returns = fund_manager.compute_returns()
+
+    # Point to point up to a year, CAGR beyond
+    assert returns["LONG"] == {"ytd_return": 5.26, "1y_return": 11.11, "3y_return": 7.72, "5y_return": 14.87}
+    # 29 February 2024 less a year is 28 February 2023, not 1 March; the
+    # year starts from the last NAV before it, however old
+    assert returns["NEW"] == {"ytd_return": 10.0, "1y_return": 65.0, "3y_return": None, "5y_return": None}
+    assert returns["EMPTY"] == dict.fromkeys(("ytd_return", "1y_return", "3y_return", "5y_return"))
+
+def test_returns_as_of_a_date(fund_manager):
+    returns = fund_manager.compute_returns(as_of=date(2024, 3, 1), scheme_codes=["NEW", "LONG", "MISSING"])
+
+    assert list(returns) == ["NEW", "LONG"]
+    # Each period ends at the last NAV on or before `as_of`
+    assert returns["LONG"]["ytd_return"] == 0.0
+    assert returns["NEW"]["1y_return"] == 10.0
+    assert fund_manager.compute_returns(as_of=date(2019, 1, 1), scheme_codes=["LONG"])["LONG"]["1y_return"] is None
+    assert fund_manager.compute_returns(scheme_codes=["MISSING"]) == {}
+
+def test_performance_snapshots_follow_new_navs(fund_manager):
+    fund_manager.refresh_performance()
+    assert fund_manager.get_fund("LONG").performance["1y_return"] == 11.11
+
+    fund_manager.update_nav("LONG", date(2024, 6, 17), 99.0)
+    assert fund_manager.get_fund("LONG").performance["1y_return"] == 10.0
@@ -0,0 +1,81 @@
+import json
+from datetime import date
+
+import pytest
+
+FUNDS = (
+    # scheme code, name, fund house, benchmark, AUM
+    ("H1", "HDFC Top 100 Fund", "HDFC Mutual Fund", "NIFTY 100 TRI", 300.0),
+    ("H2", "HDFC Liquid Fund", "HDFC Mutual Fund", "CRISIL Liquid Index", 900.0),
+    ("A1", "Axis Bluechip Fund", "Axis Mutual Fund", "NIFTY 100 TRI", 500.0),
+    ("A2", "Axis Liquid Fund", "Axis Mutual Fund", "CRISIL Liquid Index", 100.0),
+    ("T1", "Tata Hdfcs Special", "Tata Mutual Fund", "NIFTY 50 TRI", 50.0),
+)
+
+@pytest.fixture
+def fund_manager(mf):
+    fund_manager = mf.FundManager()
+    for code, name, house, benchmark, aum in FUNDS:
+        fund_manager.add_fund(mf.Fund(code, name, house, "Open Ended", "Equity", "Large Cap"))
+        fund_manager.set_fund_details(code, 1.0, "High", benchmark, "Manager", date(2010, 1, 1), "1%", 500, "Growth")
+        fund_manager.update_aum(code, date(2024, 6, 14), aum)
+    return fund_manager
+
+def search(fund_manager, query, limit=20):
+    return [f.scheme_code for f in fund_manager.search_funds(query, limit)]
+
+def test_every_word_matches_as_a_prefix(fund_manager):
+    assert search(fund_manager, "liq") == ["H2", "A2"]
+    assert search(fund_manager, "hdfc liq") == ["H2"]
+    assert search(fund_manager, "Axis, BLUE") == ["A1"]
+    # Words are matched from their start only
+    assert search(fund_manager, "chip") == []
+    assert search(fund_manager, "axis hdfc") == []
+    assert search(fund_manager, "zzz") == []
+    assert search(fund_manager, "  ") == []
+
+def test_whole_words_and_names_rank_first(fund_manager):
+    # Whole word in the name, larger fund first, then a prefix of "hdfcs"
+    assert search(fund_manager, "hdfc") == ["H2", "H1", "T1"]
+    # Name over benchmark, whatever the AUM
+    assert search(fund_manager, "100") == ["H1", "A1"]
+    assert search(fund_manager, "nifty") == ["A1", "H1", "T1"]
+    assert search(fund_manager, "liq", limit=1) == ["H2"]
+
+def test_aum_changes_reorder_ties(fund_manager):
+    fund_manager.update_aum("A2", date(2024, 6, 15), 1000.0)
+    assert search(fund_manager, "liquid") == ["A2", "H2"]
+
+def test_reindexed_on_rename_and_new_details(mf, fund_manager):
+    fund_manager.add_fund(mf.Fund("A2", "Axis Overnight Fund", "Axis Mutual Fund", "Open Ended", "Debt", "Overnight"))
+    fund_manager.set_fund_details("H1", 1.0, "High", "BSE Sensex TRI", "Manager", None, None, None, None)
+
+    assert search(fund_manager, "liquid") == ["H2"]
+    assert search(fund_manager, "overnight") == ["A2"]
+    assert search(fund_manager, "sensex") == ["H1"]
+    assert search(fund_manager, "nifty") == ["A1", "T1"]
+
+def test_search_payload(mf, fund_manager):
+    body, status = mf.build_search_payload(fund_manager, {"q": "hdfc", "limit": "2"})
+    assert status == 200
+    assert [fund["scheme_code"] for fund in json.loads(body)] == ["H2", "H1"]
+    for args in ({}, {"q": " "}, {"q": "hdfc", "limit": "0"}, {"q": "hdfc", "limit": "two"}):
+        payload, status = mf.build_search_payload(fund_manager, args)
+        assert status == 400
+        assert "error" in payload
+
+@pytest.fixture(scope="module")
+def api(load_app):
+    module = load_app("mutual-fund-api (1).py", "mfapp_flask_search")
+    for code, name, house, benchmark, aum in FUNDS:
+        module.fund_manager.add_fund(module.Fund(code, name, house, "Open Ended", "Equity", "Large Cap"))
+        module.fund_manager.update_aum(code, date(2024, 6, 14), aum)
+    return module
+
+def test_search_route(api):
+    client = api.app.test_client()
+    response = client.get("/api/funds/search?q=axis%20liq")
+    assert [fund["scheme_code"] for fund in response.get_json()] == ["A2"]
+    assert client.get("/api/funds/search?q=axis%20liq", headers={"If-None-Match": response.headers["ETag"]}) \
+        .status_code == 304
+    assert client.get("/api/funds/search").status_code == 400
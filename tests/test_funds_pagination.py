@@ -0,0 +1,100 @@
+import json
+from datetime import date
+
+import pytest
+
+def add_funds(mf, fund_manager, count=7):
+    for i in range(count):
+        code = f"F{i:02d}"
+        category = "Equity" if i % 2 == 0 else "Debt"
+        fund_manager.add_fund(mf.Fund(code, f"Fund {i}", "House", "Open Ended", category, "Sub"))
+        fund_manager.update_nav(code, date(2024, 6, 14), 10.0 + i)
+
+@pytest.fixture
+def fund_manager(mf):
+    fund_manager = mf.FundManager()
+    add_funds(mf, fund_manager)
+    return fund_manager
+
+def codes(funds):
+    return [f.scheme_code for f in funds]
+
+def test_find_funds_pages_by_cursor(fund_manager):
+    assert codes(fund_manager.find_funds(limit=3)) == ["F00", "F01", "F02"]
+    assert codes(fund_manager.find_funds(after="F02", limit=3)) == ["F03", "F04", "F05"]
+    assert codes(fund_manager.find_funds(after="F05", limit=3)) == ["F06"]
+    assert codes(fund_manager.find_funds(after="F06", limit=3)) == []
+    # A cursor need not be a listed code
+    assert codes(fund_manager.find_funds(after="F025", limit=2)) == ["F03", "F04"]
+    assert codes(fund_manager.find_funds(scheme_category="Equity", after="F02")) == ["F04", "F06"]
+
+def test_funds_payload_walks_every_page(mf, fund_manager):
+    seen, cursor, pages = [], None, 0
+    while True:
+        args = {"limit": "3", "category": "Equity"}
+        if cursor:
+            args["cursor"] = cursor
+        body, status = mf.build_funds_payload(fund_manager, args)
+        assert status == 200
+        page = json.loads(body)
+        seen += [fund["scheme_code"] for fund in page["funds"]]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["F00", "F02", "F04", "F06"]
+    assert pages == 2
+
+def test_funds_payload_exact_last_page_has_no_cursor(mf, fund_manager):
+    page = json.loads(mf.build_funds_payload(fund_manager, {"limit": "7"})[0])
+    assert len(page["funds"]) == 7
+    assert page["next_cursor"] is None
+
+def test_funds_payload_without_limit_is_a_plain_list(mf, fund_manager):
+    body, status = mf.build_funds_payload(fund_manager, {"min_nav": "15"})
+    assert status == 200
+    assert [(f["scheme_code"], f["nav"]) for f in json.loads(body)] == [("F05", 15.0), ("F06", 16.0)]
+
+@pytest.mark.parametrize("args", [{"limit": "0"}, {"limit": "-1"}, {"limit": "ten"}, {"min_nav": "x"}])
+def test_funds_payload_rejects_bad_arguments(mf, fund_manager, args):
+    payload, status = mf.build_funds_payload(fund_manager, args)
+    assert status == 400
+    assert "error" in payload
+
+def test_stream_chunks_are_one_fund_per_line(mf, fund_manager):
+    funds, error = mf.find_streamed_funds(fund_manager, {"category": "Debt", "limit": "1"})
+    assert error is None
+    # NDJSON listings ignore limit
+    assert codes(funds) == ["F01", "F03", "F05"]
+    lines = mf.encode_funds_chunk(fund_manager, funds).splitlines()
+    assert [json.loads(line)["scheme_code"] for line in lines] == ["F01", "F03", "F05"]
+    assert mf.find_streamed_funds(fund_manager, {"max_aum": "?"}) == (None, {"error": "Invalid min_aum/max_aum"})
+
+@pytest.fixture(scope="module")
+def api(load_app):
+    module = load_app("mutual-fund-api (1).py", "mfapp_flask_funds")
+    add_funds(module, module.fund_manager)
+    return module
+
+def test_flask_streams_ndjson_across_chunks(api, monkeypatch):
+    monkeypatch.setitem(api.__dict__, "STREAM_CHUNK_SIZE", 2)
+    client = api.app.test_client()
+
+    response = client.get("/api/funds?format=ndjson")
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert [json.loads(line)["scheme_code"] for line in response.get_data(as_text=True).splitlines()] == \
+        [f"F{i:02d}" for i in range(7)]
+
+    response = client.get("/api/funds?category=Equity", headers={"Accept": "application/x-ndjson"})
+    assert response.mimetype == "application/x-ndjson"
+    assert len(response.get_data(as_text=True).splitlines()) == 4
+
+    assert client.get("/api/funds?format=ndjson&min_nav=x").status_code == 400
+
+def test_flask_pages_with_cursor(api):
+    client = api.app.test_client()
+    first = client.get("/api/funds?limit=4").get_json()
+    second = client.get(f"/api/funds?limit=4&cursor={first['next_cursor']}").get_json()
+    assert [f["scheme_code"] for f in first["funds"] + second["funds"]] == [f"F{i:02d}" for i in range(7)]
+    assert second["next_cursor"] is None
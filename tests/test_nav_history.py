@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+# 1 January 2024 is a Monday
+START = date(2024, 1, 1)
+
+def series(days, values=None):
+    ordinals = [(START + timedelta(days=i)).toordinal() for i in range(days)]
+    return ordinals, values if values is not None else [100.0 + i for i in range(days)]
+
+def dates(ordinals):
+    return [date.fromordinal(d) for d in ordinals.tolist()]
+
+def test_daily_is_passed_through(mf):
+    ordinals, values = series(10)
+    kept, navs = mf.resample_last(ordinals, values, "daily")
+    assert kept.tolist() == ordinals
+    assert navs.tolist() == values
+
+def test_weekly_keeps_each_weeks_last_nav(mf):
+    # Monday 1 to Wednesday 17 January, without the weekends
+    ordinals, values = series(17)
+    weekdays = [i for i, d in enumerate(ordinals) if date.fromordinal(d).weekday() < 5]
+    kept, navs = mf.resample_last([ordinals[i] for i in weekdays], [values[i] for i in weekdays], "weekly")
+    assert dates(kept) == [date(2024, 1, 5), date(2024, 1, 12), date(2024, 1, 17)]
+    assert navs.tolist() == [104.0, 111.0, 116.0]
+
+def test_monthly_keeps_each_months_last_nav(mf):
+    ordinals, values = series(70)
+    kept, navs = mf.resample_last(ordinals, values, "monthly")
+    assert dates(kept) == [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 10)]
+    assert navs.tolist() == [130.0, 159.0, 169.0]
+
+def test_unknown_intervals_are_rejected(mf):
+    ordinals, values = series(10)
+    with pytest.raises(ValueError, match="hourly"):
+        mf.resample_last(ordinals, values, "hourly")
+
+def test_lttb_keeps_the_endpoints_and_returns_max_points(mf):
+    ordinals, values = series(1000, [100.0 + np.sin(i / 20) for i in range(1000)])
+    for max_points in (3, 10, 251):
+        kept, navs = mf.downsample_lttb(ordinals, values, max_points)
+        assert len(kept) == len(navs) == max_points
+        assert (kept[0], kept[-1]) == (ordinals[0], ordinals[-1])
+        assert (navs[0], navs[-1]) == (values[0], values[-1])
+        assert np.all(np.diff(kept) > 0)
+        # Every point kept is one of the inputs, with its own NAV
+        assert navs.tolist() == [values[ordinals.index(d)] for d in kept.tolist()]
+
+def test_lttb_keeps_a_spike(mf):
+    values = [100.0] * 500
+    values[123] = 150.0
+    ordinals, _ = series(500)
+    kept, navs = mf.downsample_lttb(ordinals, values, 20)
+    assert ordinals[123] in kept.tolist()
+    assert navs.max() == 150.0
+
+def test_short_series_are_not_downsampled(mf):
+    ordinals, values = series(10)
+    for max_points in (10, 50, 2):
+        kept, navs = mf.downsample_lttb(ordinals, values, max_points)
+        assert kept.tolist() == ordinals
+        assert navs.tolist() == values
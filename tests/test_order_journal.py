@@ -0,0 +1,103 @@
+import glob
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+TOMORROW = date.today() + timedelta(days=1)
+
+@pytest.fixture
+def fund_manager(mf, add_priced_funds):
+    return add_priced_funds(mf.FundManager(), "EQ1", "EQ2")
+
+@pytest.fixture
+def journal_dir(tmp_path):
+    return str(tmp_path / "journal")
+
+def open_journal(mf, journal_dir):
+    return mf.OrderJournal(journal_dir, fsync=False)
+
+def trade(oms, place_paid, user_id):
+    # Buys, a sell, a cancel, an unpaid order and a weekly SIP that takes
+    # an installment, then one processing run
+    place_paid(oms, user_id, "EQ1", 1000)
+    place_paid(oms, user_id, "EQ2", 500)
+    place_paid(oms, user_id, "EQ1", 300, "Sell")
+    oms.cancel_order(place_paid(oms, user_id, "EQ2", 700))
+    oms.place_lump_sum_order(user_id, "EQ1", 200, "Buy")
+    oms.place_sip_order(user_id, "EQ2", 100, "Weekly", date.today() - timedelta(days=14))
+    oms.process_orders(TOMORROW)
+
+def book(oms):
+    # Everything recovery has to restore, indexes included. Status buckets
+    # are rebuilt in creation order, not in the order orders moved.
+    return {
+        "orders": {order_id: dict(order) for order_id, order in oms.orders.items()},
+        "sip_orders": {sip_id: dict(sip_order) for sip_id, sip_order in oms.sip_orders.items()},
+        "portfolios": {user_id: portfolio.state() for user_id, portfolio in oms.portfolios.items()},
+        "by_status": {status: sorted(ids) for status, ids in oms._orders_by_status.items() if ids},
+        "user_orders": {user_id: [order["order_id"] for order in oms.get_user_orders(user_id)]
+                        for user_id in ("u1", "u2")},
+        "sips_due": {due: list(bucket) for due, bucket in oms._sips_due.items() if bucket},
+        "sip_due_dates": sorted(oms._sip_due_dates)
+    }
+
+def test_fields_round_trip(mf):
+    fields = (None, True, -7, 2.5, "ünïcode", datetime(2024, 6, 3, 15, 30, 0, 123456), date(2024, 6, 3))
+    assert mf.decode_fields(mf.encode_fields(fields)) == fields
+    with pytest.raises(TypeError):
+        mf.encode_fields([object()])
+
+def test_recovered_book_matches_the_live_one(mf, fund_manager, journal_dir, place_paid):
+    journal = open_journal(mf, journal_dir)
+    oms = mf.OrderManagementSystem(fund_manager, journal=journal)
+    trade(oms, place_paid, "u1")
+    trade(oms, place_paid, "u2")
+    journal.close()
+
+    recovered = mf.OrderManagementSystem.recover(fund_manager, open_journal(mf, journal_dir))
+
+    assert book(recovered) == book(oms)
+    assert len(recovered.get_orders_by_status("Executed")) == 8
+    recovered.journal.close()
+
+def test_replay_continues_after_a_snapshot(mf, fund_manager, journal_dir, place_paid):
+    journal = open_journal(mf, journal_dir)
+    oms = mf.OrderManagementSystem(fund_manager, journal=journal)
+    trade(oms, place_paid, "u1")
+    oms.snapshot()
+    # Changes to records already in the snapshot, and new ones
+    oms.stop_sip(next(iter(oms.sip_orders)))
+    trade(oms, place_paid, "u2")
+    journal.close()
+
+    # Only the snapshot and the segment written after it are kept
+    assert len(glob.glob(os.path.join(journal_dir, "snapshot.*.pickle"))) == 1
+    assert len(glob.glob(os.path.join(journal_dir, "journal.*.log"))) == 1
+    recovered = mf.OrderManagementSystem.recover(fund_manager, open_journal(mf, journal_dir))
+
+    assert book(recovered) == book(oms)
+    recovered.journal.close()
+
+def test_a_torn_last_record_is_dropped(mf, fund_manager, journal_dir, place_paid):
+    journal = open_journal(mf, journal_dir)
+    oms = mf.OrderManagementSystem(fund_manager, journal=journal)
+    trade(oms, place_paid, "u1")
+    journal.close()
+    expected = book(oms)
+    # A crash halfway through writing a record
+    segment = sorted(glob.glob(os.path.join(journal_dir, "journal.*.log")))[-1]
+    record = mf.encode_fields(["torn", "u1"])
+    with open(segment, "ab") as f:
+        f.write(mf.RECORD_HEADER.pack(len(record), 0, mf.OP_CODES["status"]) + record[:5])
+
+    recovered = mf.OrderManagementSystem.recover(fund_manager, open_journal(mf, journal_dir))
+    assert book(recovered) == expected
+
+    # The torn bytes were cut off, so records appended after them replay
+    order_id = place_paid(recovered, "u1", "EQ2", 250)
+    recovered.journal.close()
+    again = mf.OrderManagementSystem.recover(fund_manager, open_journal(mf, journal_dir))
+    assert again.get_order_status(order_id) == "Pending"
+    assert book(again) == book(recovered)
+    again.journal.close()
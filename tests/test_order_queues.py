@@ -0,0 +1,142 @@
+from datetime import date, timedelta
+
+import pytest
+
+TOMORROW = date.today() + timedelta(days=1)
+
+@pytest.fixture
+def oms(mf, add_priced_funds):
+    return mf.OrderManagementSystem(add_priced_funds(mf.FundManager(), "EQ1", "EQ2"))
+
+def ids_with_status(oms, status):
+    return [order["order_id"] for order in oms.get_orders_by_status(status)]
+
+def test_orders_move_between_status_buckets(oms, place_paid):
+    unpaid, _ = oms.place_lump_sum_order("u1", "EQ1", 500, "Buy")
+    paid = [place_paid(oms, "u1", "EQ1"), place_paid(oms, "u2", "EQ2")]
+    cancelled = place_paid(oms, "u2", "EQ1")
+    assert oms.cancel_order(cancelled)
+
+    assert ids_with_status(oms, "Pending Payment") == [unpaid]
+    assert ids_with_status(oms, "Pending") == paid
+    assert ids_with_status(oms, "Cancelled") == [cancelled]
+
+    stats = oms.process_orders(TOMORROW)
+
+    assert (stats["executed"], stats["failed"], stats["waiting"]) == (2, 0, 0)
+    assert ids_with_status(oms, "Pending") == []
+    assert ids_with_status(oms, "Executed") == paid
+    # Only pending orders are picked up
+    assert ids_with_status(oms, "Pending Payment") == [unpaid]
+    assert ids_with_status(oms, "Cancelled") == [cancelled]
+    assert oms.get_portfolio("u2").get_holding("EQ2")["units"] > 0
+
+def test_every_order_is_in_exactly_one_bucket(oms, place_paid):
+    orders = [place_paid(oms, "u1", code) for code in ("EQ1", "EQ2", "NOPE", "EQ1")]
+    oms.cancel_order(orders[3])
+    oms.process_orders(TOMORROW)
+
+    buckets = {status: ids_with_status(oms, status)
+               for status in ("Pending Payment", "Pending", "Executed", "Failed", "Cancelled")}
+    assert sorted(sum(buckets.values(), [])) == sorted(orders)
+    for status, order_ids in buckets.items():
+        assert all(oms.get_order_status(order_id) == status for order_id in order_ids)
+    # No NAVs for an unknown fund: it fails instead of waiting for ever
+    assert buckets["Failed"] == [orders[2]]
+
+def test_orders_wait_in_pending_until_their_nav_date(oms, place_paid):
+    order_id = place_paid(oms, "u1", "EQ1")
+
+    stats = oms.process_orders(date.today() - timedelta(days=1))
+
+    assert (stats["executed"], stats["waiting"]) == (0, 1)
+    assert ids_with_status(oms, "Pending") == [order_id]
+    assert oms.process_orders(TOMORROW)["executed"] == 1
+    assert ids_with_status(oms, "Executed") == [order_id]
+
+def test_due_sips_are_popped_in_date_order(oms):
+    late = oms.place_sip_order("u1", "EQ1", 100, "Monthly", date(2024, 6, 20))
+    early = oms.place_sip_order("u1", "EQ1", 100, "Monthly", date(2024, 6, 3))
+    middle = oms.place_sip_order("u2", "EQ2", 100, "Weekly", date(2024, 6, 10))
+
+    assert oms._pop_due_sips(date(2024, 6, 1)) == []
+    assert oms._pop_due_sips(date(2024, 6, 10)) == [early, middle]
+    # Popped buckets are gone until their SIPs are requeued
+    assert oms._pop_due_sips(date(2024, 6, 30)) == [late]
+    assert oms._pop_due_sips(date(2024, 6, 30)) == []
+
+def test_each_run_takes_one_installment_per_due_sip(oms):
+    # 3 June 2024 is a Monday
+    daily = oms.place_sip_order("u1", "EQ1", 100, "Daily", date(2024, 6, 3))
+    monthly = oms.place_sip_order("u1", "EQ2", 250, "Monthly", date(2024, 6, 20))
+
+    assert oms.process_orders(date(2024, 6, 7))["sip_installments"] == 1
+    sip = oms.sip_orders[daily]
+    assert (sip["last_executed"], sip["next_execution"]) == (date(2024, 6, 7), date(2024, 6, 10))
+    # Requeued under its next date, so a second run the same day is a no-op
+    assert oms.process_orders(date(2024, 6, 7))["sip_installments"] == 0
+    assert oms.process_orders(date(2024, 6, 20))["sip_installments"] == 2
+    assert oms.sip_orders[monthly]["next_execution"] == date(2024, 7, 22)
+    assert len(oms.get_user_orders("u1")) == 3
+
+def test_stopped_and_completed_sips_leave_the_queue(oms):
+    stopped = oms.place_sip_order("u1", "EQ1", 100, "Daily", date(2024, 6, 3))
+    ending = oms.place_sip_order("u1", "EQ1", 100, "Weekly", date(2024, 6, 3), end_date=date(2024, 6, 12))
+    assert oms.stop_sip(stopped)
+
+    assert oms.process_orders(date(2024, 6, 3))["sip_installments"] == 1
+    assert oms.process_orders(date(2024, 6, 10))["sip_installments"] == 1
+    assert oms.get_sip_status(ending) == "Completed"
+    assert oms.process_orders(date(2024, 7, 1))["sip_installments"] == 0
+    assert oms._sips_due == {}
+
+def test_sip_installments_execute_at_their_due_date_nav(mf):
+    fund_manager = mf.FundManager()
+    fund_manager.add_fund(mf.Fund("EQ1", "Fund EQ1", "House", "Open Ended", "Equity", "Large Cap"))
+    day = date(2023, 3, 1)
+    while day <= date(2023, 5, 31):
+        fund_manager.update_nav("EQ1", day, 10.0 + day.toordinal() % 100)
+        day += timedelta(days=1)
+    oms = mf.OrderManagementSystem(fund_manager)
+    sip_id = oms.place_sip_order("u1", "EQ1", 1000, "Monthly", date(2023, 3, 1))
+
+    # 1 April 2023 is a Saturday; the May installment, due on the 1st, is
+    # processed a day late
+    for day in (date(2023, 3, 1), date(2023, 4, 3), date(2023, 5, 2)):
+        assert oms.process_orders(day)["sip_installments"] == 1
+
+    orders = oms.get_user_orders("u1")
+    assert [order["status"] for order in orders] == ["Executed"] * 3
+    assert [order["nav_date"] for order in orders] == [date(2023, 3, 1), date(2023, 4, 3), date(2023, 5, 1)]
+    for order in orders:
+        nav = fund_manager.get_fund("EQ1").get_nav_on(order["nav_date"])
+        assert order["units_allotted"] == pytest.approx(1000 / nav)
+    assert oms.sip_orders[sip_id]["last_executed"] == date(2023, 5, 2)
+
+def test_sells_without_a_holding_fail(oms, place_paid):
+    sell = place_paid(oms, "u1", "EQ1", 500, "Sell")
+
+    stats = oms.process_orders(TOMORROW)
+
+    assert (stats["executed"], stats["failed"]) == (0, 1)
+    assert oms.orders[sell]["status"] == "Failed"
+    assert oms.orders[sell]["units_allotted"] is None
+    assert oms.get_portfolio("u1").get_holding("EQ1") is None
+
+def test_sells_for_more_than_is_held_fail(oms, place_paid):
+    place_paid(oms, "u1", "EQ1", 1000)
+    oms.process_orders(TOMORROW)
+    holding = oms.get_portfolio("u1").get_holding("EQ1")
+    # The second sell only fits if the first one failed
+    oversold, sold = place_paid(oms, "u1", "EQ1", 1500, "Sell"), place_paid(oms, "u1", "EQ1", 400, "Sell")
+    # Covered by the buy ahead of it in the same run
+    bought, covered = place_paid(oms, "u2", "EQ1", 1000), place_paid(oms, "u2", "EQ1", 1000, "Sell")
+
+    stats = oms.process_orders(TOMORROW)
+
+    assert (stats["executed"], stats["failed"]) == (3, 1)
+    assert [oms.get_order_status(order_id) for order_id in (oversold, sold, bought, covered)] == \
+        ["Failed", "Executed", "Executed", "Executed"]
+    assert oms.get_portfolio("u1").get_holding("EQ1")["units"] == \
+        pytest.approx(holding["units"] - oms.orders[sold]["units_allotted"])
+    assert oms.get_portfolio("u2").get_holding("EQ1")["units"] == pytest.approx(0.0)
@@ -0,0 +1,90 @@
+import gc
+from datetime import date, datetime
+
+import pytest
+
+def order(order_id, user_id="u1", amount=1000.0, status="Pending", executed_at=None, units_allotted=None):
+    return {
+        "order_id": order_id,
+        "user_id": user_id,
+        "fund_code": "EQ1",
+        "amount": amount,
+        "order_type": "Buy",
+        "status": status,
+        "created_at": datetime(2024, 6, 3, 10, 15, 30, 250),
+        "nav_date": date(2024, 6, 3),
+        "executed_at": executed_at,
+        "units_allotted": units_allotted,
+        "razorpay_order_id": f"order_{order_id}"
+    }
+
+@pytest.fixture
+def table(mf):
+    return mf.OrderTable([order("a"), order("b", "u2", 250.0, "Executed", date(2024, 6, 4), 2.5), order("c")])
+
+def test_rows_read_back_as_the_dicts_stored(table):
+    assert list(table) == ["a", "b", "c"]
+    assert len(table) == 3
+    assert table["b"] == order("b", "u2", 250.0, "Executed", date(2024, 6, 4), 2.5)
+    assert dict(table["a"]) == order("a")
+    # None survives every column type
+    assert (table["a"]["executed_at"], table["a"]["units_allotted"]) == (None, None)
+    assert table.get("missing") is None
+    assert "missing" not in table
+    with pytest.raises(KeyError):
+        table["missing"]
+
+def test_rows_write_through(table):
+    row = table["a"]
+    row["status"] = "Executed"
+    row["units_allotted"] = 10.0
+    row["executed_at"] = date(2024, 6, 5)
+
+    assert table["a"]["status"] == "Executed"
+    assert table.get("a").get("units_allotted") == 10.0
+    assert table.columns(["a"], ("executed_at",)) == [[date(2024, 6, 5)]]
+    # Storing a record again overwrites its row in place
+    table["a"] = order("a", amount=5.0)
+    assert list(table) == ["a", "b", "c"]
+    assert table["a"] == order("a", amount=5.0)
+
+def test_columns_and_assign_follow_the_key_order(table):
+    assert table.columns(["c", "b"], ("user_id", "amount", "executed_at", "units_allotted", "created_at")) == [
+        ["u1", "u2"], [1000.0, 250.0], [None, date(2024, 6, 4)], [None, 2.5],
+        [datetime(2024, 6, 3, 10, 15, 30, 250)] * 2]
+    assert table.columns([], ("status", "amount")) == [[], []]
+
+    table.assign(["c", "a"], "units_allotted", [3.0, 4.0])
+    table.assign(["c", "a"], "status", ["Failed", "Executed"])
+    assert [table[key]["units_allotted"] for key in "abc"] == [4.0, 2.5, 3.0]
+    assert [table[key]["status"] for key in "abc"] == ["Executed", "Executed", "Failed"]
+
+def test_rows_are_numbered_in_insertion_order(table):
+    assert [table.row_of(key) for key in "abc"] == [0, 1, 2]
+    assert table.at(1) == table["b"]
+
+def test_capture_is_unaffected_by_later_writes(mf, table):
+    capture = table.capture()
+    table["a"]["status"] = "Cancelled"
+    table["d"] = order("d")
+
+    decoded = mf.OrderTable.decode_capture(capture)
+    assert list(decoded) == ["a", "b", "c"]
+    assert decoded["a"] == order("a")
+    assert mf.OrderTable.decode_capture(mf.OrderTable().capture()) == {}
+
+def test_nothing_for_the_collector_to_traverse(mf, add_priced_funds, place_paid):
+    oms = mf.OrderManagementSystem(add_priced_funds(mf.FundManager(), "EQ1"))
+    for user_id in ("u1", "u2", "u1"):
+        place_paid(oms, user_id, "EQ1")
+    oms.place_sip_order("u1", "EQ1", 100, "Monthly", date(2024, 6, 3))
+
+    for table in (oms.orders, oms.sip_orders):
+        assert not gc.is_tracked(table._rows)
+        # Arrays are tracked but hold no references: only the str columns
+        # could hold objects
+        assert not any(gc.is_tracked(column.data) for column in table._columns.values()
+                       if isinstance(column.data, dict))
+    assert not gc.is_tracked(oms._user_orders._last)
+    assert [order["order_id"] for order in oms.get_user_orders("u1")] == [oms.orders.at(0)["order_id"],
+                                                                          oms.orders.at(2)["order_id"]]
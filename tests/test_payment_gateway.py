@@ -0,0 +1,136 @@
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+TODAY = date.today()
+
+def run(coro):
+    return asyncio.run(coro)
+
+def client_for(mf, server, **options):
+    return mf.AsyncGatewayClient(server.host, server.port, key_secret="test_secret", backoff=0.001, **options)
+
+def test_signatures_match_the_client_mock(mf):
+    signature = mf.payment_signature("test_secret", "order_1", "pay_1")
+    assert mf.MockRazorpayClient("test_secret").sign("order_1", "pay_1") == signature
+    assert mf.payment_signature("other_secret", "order_1", "pay_1") != signature
+
+def test_unavailable_requests_are_retried(mf):
+    async def scenario():
+        async with mf.FakeGatewayServer("test_secret", failure_rate=0.5, seed=1) as server:
+            async with client_for(mf, server, retries=10) as client:
+                orders = [await client.create_order(100 * i) for i in range(1, 11)]
+            assert [order["amount"] for order in orders] == [100 * i for i in range(1, 11)]
+            # Every 503 was retried, and none created an order
+            assert server.requests > 10
+            assert len(server.orders) == 10
+
+            server.failure_rate, requests = 1.0, server.requests
+            async with client_for(mf, server, retries=2) as client:
+                with pytest.raises(mf.GatewayError) as failure:
+                    await client.create_order(100)
+            assert (failure.value.status, failure.value.retryable) == (503, True)
+            assert server.requests == requests + 3
+    run(scenario())
+
+def test_refusals_are_not_retried(mf):
+    async def scenario():
+        async with mf.FakeGatewayServer("test_secret", declined_mandates=["sip_1"]) as server:
+            async with client_for(mf, server) as client:
+                order = await client.create_order(100)
+                requests = server.requests
+                with pytest.raises(mf.GatewayError) as failure:
+                    await client.charge_mandate(order["id"], "sip_1")
+            assert (failure.value.status, failure.value.retryable) == (402, False)
+            assert server.requests == requests + 1
+    run(scenario())
+
+def test_repeated_keys_replay_the_first_response(mf):
+    async def scenario():
+        async with mf.FakeGatewayServer("test_secret") as server:
+            async with client_for(mf, server) as client:
+                order = await client.create_order(100, idempotency_key="sip_1:order")
+                assert await client.create_order(100, idempotency_key="sip_1:order") == order
+                payment = await client.charge_mandate(order["id"], "sip_1", idempotency_key="sip_1:charge")
+                assert await client.charge_mandate(order["id"], "sip_1", idempotency_key="sip_1:charge") == payment
+            assert list(server.orders) == [order["id"]]
+            assert list(server.payments) == [payment["razorpay_payment_id"]]
+            assert mf.MockRazorpayClient("test_secret").verify_payment_signature(payment)
+    run(scenario())
+
+def test_concurrent_requests_share_the_pool(mf):
+    async def scenario():
+        async with mf.FakeGatewayServer("test_secret", latency=0.01) as server:
+            async with client_for(mf, server, max_connections=4) as client:
+                orders = await asyncio.gather(*(client.create_order(100) for _ in range(40)))
+            assert len({order["id"] for order in orders}) == 40
+            assert client.connections_opened == server.connections == 4
+    run(scenario())
+
+@pytest.fixture
+def gateway(mf):
+    # The OMS runs its own event loop per batch, so the fake gateway is
+    # served from a loop on another thread
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = asyncio.run_coroutine_threadsafe(mf.FakeGatewayServer("test_secret").start(), loop).result()
+    yield server
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+
+@pytest.fixture
+def oms(mf, add_priced_funds, gateway):
+    return mf.OrderManagementSystem(add_priced_funds(mf.FundManager(), "EQ1"), gateway=client_for(mf, gateway),
+                                    razorpay_client=mf.MockRazorpayClient("test_secret"))
+
+def place_sip(oms, amount=100):
+    return oms.place_sip_order("u1", "EQ1", amount, "Daily", TODAY - timedelta(days=3))
+
+def test_due_sips_are_debited_in_one_batch(oms, gateway):
+    sip_ids = [place_sip(oms, 100 * i) for i in range(1, 6)]
+
+    stats = oms.process_orders(TODAY)
+
+    assert stats["sip_installments"] == 5
+    assert len(gateway.payments) == 5
+    assert [order["status"] for order in oms.get_user_orders("u1")] == ["Executed"] * 5
+    assert all(oms.get_sip_status(sip_id) == "Active" for sip_id in sip_ids)
+
+def test_refused_debits_fail_the_sip(mf, oms, gateway, monkeypatch):
+    # Mandates are charged under the SIP id
+    declined = place_sip(oms)
+    gateway.declined_mandates = {declined}
+    refused = place_sip(oms)
+
+    async def create_order(amount, currency="INR", idempotency_key=None):
+        if idempotency_key.startswith(refused):
+            raise mf.GatewayError("POST /v1/orders: HTTP 400", 400)
+        return await original(amount, currency, idempotency_key)
+    original = oms.gateway.create_order
+    monkeypatch.setattr(oms.gateway, "create_order", create_order)
+
+    oms.process_orders(TODAY)
+
+    assert oms.get_sip_status(declined) == "Payment Failed"
+    assert [order["status"] for order in oms.get_user_orders("u1")] == ["Payment Failed"]
+    # Refused before any order existed: failed too, not left due for ever
+    assert oms.get_sip_status(refused) == "Payment Failed"
+    assert oms._pop_due_sips(TODAY + timedelta(days=30)) == []
+
+def test_unavailable_gateway_leaves_the_sip_due(oms, gateway):
+    sip_id = place_sip(oms)
+    gateway.failure_rate = 1.0
+
+    assert oms.process_orders(TODAY)["sip_installments"] == 1
+    assert oms.get_sip_status(sip_id) == "Active"
+    assert oms.get_user_orders("u1") == []
+
+    # Retried by the next run, under the same idempotency keys
+    gateway.failure_rate = 0.0
+    oms.process_orders(TODAY)
+    assert [order["status"] for order in oms.get_user_orders("u1")] == ["Executed"]
+    assert oms.sip_orders[sip_id]["last_executed"] == TODAY
@@ -0,0 +1,103 @@
+import hashlib
+import hmac
+
+import pytest
+
+@pytest.fixture
+def client(mf):
+    return mf.MockRazorpayClient("test_secret")
+
+@pytest.fixture
+def oms(mf, client):
+    return mf.OrderManagementSystem(mf.FundManager(), razorpay_client=client)
+
+def test_signature_is_hmac_sha256_of_order_and_payment_ids(mf, client):
+    expected = hmac.new(b"test_secret", b"order_1|pay_1", hashlib.sha256).hexdigest()
+    assert client.sign("order_1", "pay_1") == expected
+    # Repeated signatures don't share state
+    assert client.sign("order_1", "pay_1") == expected
+    assert mf.payment_signature("test_secret", "order_1", "pay_1") == expected
+
+def test_verify_rejects_anything_but_the_exact_signature(mf, client):
+    signature = client.sign("order_1", "pay_1")
+    assert client.verify_signature("order_1", "pay_1", signature)
+    assert client.verify_payment_signature({"razorpay_order_id": "order_1", "razorpay_payment_id": "pay_1",
+                                            "razorpay_signature": signature})
+    assert not client.verify_signature("order_1", "pay_2", signature)
+    assert not client.verify_signature("order_2", "pay_1", signature)
+    assert not client.verify_signature("order_1", "pay_1", signature.upper())
+    assert not client.verify_signature("order_1", "pay_1", signature[:-1])
+    assert not mf.MockRazorpayClient("other_secret").verify_signature("order_1", "pay_1", signature)
+    for bad in (None, 1234, signature.encode(), ["x"]):
+        assert not client.verify_signature("order_1", "pay_1", bad)
+
+def test_forged_callback_does_not_fail_the_order(oms, client):
+    order_id, razorpay_order_id = oms.place_lump_sum_order("u1", "EQ1", 1000, "Buy")
+
+    assert not oms.confirm_payment(order_id, "pay_forged", "0" * 64)
+    assert oms.get_order_status(order_id) == "Pending Payment"
+    assert oms.confirm_payment(order_id, *client.simulate_payment(razorpay_order_id))
+    assert oms.get_order_status(order_id) == "Pending"
+    # A repeated genuine callback is still a success
+    assert oms.confirm_payment(order_id, *client.simulate_payment(razorpay_order_id))
+
+def test_callbacks_for_cancelled_orders_fail(oms, client):
+    order_id, razorpay_order_id = oms.place_lump_sum_order("u1", "EQ1", 1000, "Buy")
+    assert oms.cancel_order(order_id)
+
+    assert not oms.confirm_payment(order_id, *client.simulate_payment(razorpay_order_id))
+    assert oms.get_order_status(order_id) == "Cancelled"
+
+def test_batch_outcomes(mf, oms, client):
+    placed = [oms.place_lump_sum_order("u1", "EQ1", 100 * i, "Buy") for i in range(1, 5)]
+    (good, good_rzp), (forged, _), (paid, paid_rzp), (retried, retried_rzp) = placed
+    oms.confirm_payment(paid, *client.simulate_payment(paid_rzp))
+    payments = [
+        (good, *client.simulate_payment(good_rzp)),
+        (good, *client.simulate_payment(good_rzp)),
+        (forged, "pay_forged", client.sign(good_rzp, "pay_forged")),
+        (paid, *client.simulate_payment(paid_rzp)),
+        (retried, "pay_forged", "bad"),
+        (retried, *client.simulate_payment(retried_rzp)),
+        ("missing", "pay_1", "sig")
+    ]
+
+    outcomes = oms.confirm_payments(payments)
+
+    assert outcomes == {good: "confirmed", forged: "failed", paid: "duplicate", retried: "confirmed",
+                        "missing": "unknown"}
+    assert [oms.get_order_status(order_id) for order_id, _ in placed] == \
+        ["Pending", "Pending Payment", "Pending", "Pending"]
+    assert mf.payment_outcome_counts(payments, outcomes)["counts"] == \
+        {"confirmed": 2, "failed": 1, "duplicate": 3, "unknown": 1}
+
+@pytest.fixture(scope="module")
+def api(load_app):
+    return load_app("mutual-fund-api.py", "mfapp_flask_orders")
+
+def test_batch_confirm_endpoint(api):
+    client = api.app.test_client()
+    razorpay_client = api.order_management_system.razorpay_client
+    order = client.post("/orders/lumpsum", json={"user_id": "u1", "fund_code": "EQ1", "amount": 100,
+                                                 "order_type": "Buy"}).get_json()
+    payment_id, signature = razorpay_client.simulate_payment(order["razorpay_order_id"])
+    # Signed with the configured key secret, not the mock's default
+    assert signature == api.payment_signature("test_secret", order["razorpay_order_id"], payment_id)
+
+    response = client.post("/orders/payments/confirm", json=[
+        {"order_id": order["order_id"], "payment_id": payment_id, "signature": "bad"},
+        {"order_id": order["order_id"], "payment_id": payment_id, "signature": signature}])
+    assert response.status_code == 200
+    assert response.get_json()["orders"] == {order["order_id"]: "confirmed"}
+    assert client.post("/orders/payments/confirm", json=[{"order_id": order["order_id"]}]).status_code == 400
+
+def test_confirm_endpoint_rejects_bad_signatures(api):
+    client = api.app.test_client()
+    order = client.post("/orders/lumpsum", json={"user_id": "u1", "fund_code": "EQ1", "amount": 100,
+                                                 "order_type": "Buy"}).get_json()
+    payment_id, signature = api.order_management_system.razorpay_client.simulate_payment(order["razorpay_order_id"])
+    url = f"/orders/{order['order_id']}/confirm-payment"
+
+    assert client.post(url, json={"payment_id": payment_id, "signature": "bad"}).status_code == 400
+    assert client.get(f"/orders/{order['order_id']}").get_json()["status"] == "Pending Payment"
+    assert client.post(url, json={"payment_id": payment_id, "signature": signature}).status_code == 200
@@ -0,0 +1,67 @@
+import multiprocessing
+from datetime import date, timedelta
+
+import pytest
+
+TOMORROW = date.today() + timedelta(days=1)
+FUNDS = ("EQ1", "EQ2", "EQ3", "EQ4", "EQ5")
+
+def book(mf, add_priced_funds):
+    # The same order book every time: buys and sells over every fund, some
+    # sells for more than is held, one fund that has stopped publishing
+    # NAVs and one that doesn't exist
+    fund_manager = add_priced_funds(mf.FundManager(), *FUNDS)
+    fund_manager.add_fund(mf.Fund("OLD", "Old Fund", "House", "Open Ended", "Equity", "Large Cap"))
+    fund_manager.update_nav("OLD", date.today() - timedelta(days=30), 10.0)
+    oms = mf.OrderManagementSystem(fund_manager)
+    placed = []
+    for i in range(60):
+        fund_code = (FUNDS + ("OLD", "NOPE"))[i % 7]
+        order_id, razorpay_order_id = oms.place_lump_sum_order(f"u{i % 4}", fund_code, 100 + i,
+                                                               "Sell" if i % 5 == 4 else "Buy")
+        oms.confirm_payment(order_id, *oms.razorpay_client.simulate_payment(razorpay_order_id))
+        placed.append(order_id)
+    return oms, placed
+
+def outcome(oms, placed):
+    orders = [(oms.orders[order_id]["status"], oms.orders[order_id]["units_allotted"]) for order_id in placed]
+    portfolios = {user_id: portfolio.state() for user_id, portfolio in sorted(oms.portfolios.items())}
+    return orders, portfolios
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_execution_matches_serial(mf, add_priced_funds, workers):
+    serial, serial_ids = book(mf, add_priced_funds)
+    parallel, parallel_ids = book(mf, add_priced_funds)
+
+    expected = serial.execute_orders(serial._order_ids_with_status("Pending"), TOMORROW)
+    stats = parallel.execute_orders_parallel(parallel._order_ids_with_status("Pending"), TOMORROW, workers=workers,
+                                             mp_context=multiprocessing.get_context("fork"))
+
+    for key in ("orders", "executed", "failed", "waiting"):
+        assert stats[key] == expected[key]
+    assert (stats["executed"], stats["failed"], stats["waiting"]) == (36, 16, 8)
+    assert outcome(parallel, parallel_ids) == outcome(serial, serial_ids)
+    # Applied in the same order too, bucket by bucket
+    for status in ("Pending", "Executed", "Failed"):
+        assert [parallel_ids.index(o["order_id"]) for o in parallel.get_orders_by_status(status)] == \
+            [serial_ids.index(o["order_id"]) for o in serial.get_orders_by_status(status)]
+
+def test_process_orders_shards_with_workers(mf, add_priced_funds):
+    oms, _ = book(mf, add_priced_funds)
+    stats = oms.process_orders(TOMORROW, workers=2)
+    assert (stats["executed"], stats["failed"], stats["waiting"]) == (36, 16, 8)
+    assert {batch["fund_code"] for batch in stats["batches"]} == set(FUNDS) | {"OLD", "NOPE"}
+
+def failing_shard(shard):
+    raise RuntimeError("worker died")
+
+def test_failed_shard_leaves_the_book_untouched(mf, add_priced_funds, monkeypatch):
+    oms, placed = book(mf, add_priced_funds)
+    before = outcome(oms, placed)
+    monkeypatch.setattr(mf, "_execute_shard", failing_shard)
+
+    with pytest.raises(RuntimeError):
+        oms.execute_orders_parallel(list(placed), TOMORROW, workers=2, mp_context=multiprocessing.get_context("fork"))
+
+    assert outcome(oms, placed) == before
+    assert len(oms.get_orders_by_status("Pending")) == len(placed)
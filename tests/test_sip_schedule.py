@@ -0,0 +1,64 @@
+from datetime import date, datetime
+
+import pytest
+
+@pytest.fixture
+def calendar(mf):
+    # 15 August 2024, a Thursday, is a holiday
+    return mf.TradingCalendar(holidays=[date(2024, 8, 15)])
+
+def test_weekends_and_holidays_are_closed(mf, calendar):
+    assert calendar.is_trading_day(date(2024, 8, 14))
+    assert not calendar.is_trading_day(date(2024, 8, 15))
+    assert not calendar.is_trading_day(date(2024, 8, 17))
+    assert calendar.roll_forward(date(2024, 8, 14)) == date(2024, 8, 14)
+    assert calendar.roll_forward(date(2024, 8, 15)) == date(2024, 8, 16)
+    assert calendar.roll_forward(datetime(2024, 8, 17, 10, 30)) == date(2024, 8, 19)
+    assert mf.TradingCalendar().is_trading_day(date(2024, 8, 15))
+
+def test_holiday_file(mf, tmp_path):
+    path = tmp_path / "holidays.txt"
+    path.write_text("# NSE holidays\n2024-08-15  # Independence Day\n\n2024-10-02\n")
+    calendar = mf.TradingCalendar(str(path), holidays=[date(2024, 12, 25)])
+    assert calendar.holidays == {date(2024, 8, 15), date(2024, 10, 2), date(2024, 12, 25)}
+
+def test_unknown_frequencies_are_rejected(mf):
+    mf.validate_frequency("Quarterly")
+    with pytest.raises(ValueError, match="Fortnightly"):
+        mf.validate_frequency("Fortnightly")
+
+def test_month_ends_are_clamped_without_drifting(mf):
+    start = date(2024, 1, 31)
+    assert [mf.nominal_date(start, "Monthly", k) for k in range(4)] == \
+        [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 31), date(2024, 4, 30)]
+    assert mf.nominal_date(date(2023, 11, 30), "Quarterly", 1) == date(2024, 2, 29)
+    assert mf.nominal_date(date(2024, 2, 29), "Annually", 1) == date(2025, 2, 28)
+    assert mf.nominal_date(date(2024, 2, 29), "Annually", 4) == date(2028, 2, 29)
+    assert mf.nominal_date(datetime(2024, 6, 3, 9), "Weekly", 2) == date(2024, 6, 17)
+
+def test_first_due_date_is_a_trading_day(mf, calendar):
+    assert mf.first_due_date(date(2024, 8, 15), "Monthly", calendar) == date(2024, 8, 16)
+    assert mf.first_due_date(date(2024, 8, 14), "Daily", calendar) == date(2024, 8, 14)
+
+def test_next_due_date(mf, calendar):
+    start = date(2024, 1, 31)
+    # 31 March 2024 is a Sunday
+    assert mf.next_due_date(start, "Monthly", date(2024, 1, 31), calendar) == date(2024, 2, 29)
+    assert mf.next_due_date(start, "Monthly", date(2024, 2, 29), calendar) == date(2024, 4, 1)
+    assert mf.next_due_date(start, "Monthly", date(2024, 4, 1), calendar) == date(2024, 4, 30)
+    # Daily and weekly installments skip the weekend and the holiday
+    assert mf.next_due_date(date(2024, 8, 12), "Daily", date(2024, 8, 14), calendar) == date(2024, 8, 16)
+    assert mf.next_due_date(date(2024, 8, 1), "Weekly", date(2024, 8, 8), calendar) == date(2024, 8, 16)
+    assert mf.next_due_date(date(2024, 8, 1), "Weekly", date(2024, 8, 16), calendar) == date(2024, 8, 22)
+
+def test_installment_rolled_into_the_next_month_is_not_skipped(mf, calendar):
+    # 31 August 2024 is a Saturday: August's installment falls on 2 September
+    assert mf.next_due_date(date(2024, 7, 31), "Monthly", date(2024, 8, 30), calendar) == date(2024, 9, 2)
+    assert mf.next_due_date(date(2024, 7, 31), "Monthly", date(2024, 9, 1), calendar) == date(2024, 9, 2)
+    assert mf.next_due_date(date(2024, 7, 31), "Monthly", date(2024, 9, 2), calendar) == date(2024, 9, 30)
+
+def test_missed_installments_are_skipped(mf, calendar):
+    # Processing resumes on 20 November: the next date after it, not August's
+    assert mf.next_due_date(date(2024, 5, 10), "Quarterly", date(2024, 11, 20), calendar) == date(2025, 2, 10)
+    assert mf.next_due_date(datetime(2024, 5, 10, 9), "Monthly", datetime(2024, 11, 20, 16), calendar) == \
+        date(2024, 12, 10)
@@ -0,0 +1,149 @@
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+TOMORROW = date.today() + timedelta(days=1)
+
+@pytest.fixture
+def database(tmp_path):
+    return str(tmp_path / "mf.db")
+
+@pytest.fixture
+def oms(mf, add_priced_funds, database):
+    storage = mf.SQLiteStorage(database)
+    fund_manager = add_priced_funds(mf.SQLiteFundManager(storage), "EQ1", "EQ2")
+    return mf.SQLiteOrderManagementSystem(fund_manager, storage)
+
+def reopen(mf, database):
+    # What another worker process sees
+    storage = mf.SQLiteStorage(database)
+    return mf.SQLiteOrderManagementSystem(mf.SQLiteFundManager(storage), storage)
+
+def trade(oms, place_paid):
+    # Two buys, a partial sell and an unpaid order
+    orders = [place_paid(oms, "u1", "EQ1", 1000), place_paid(oms, "u1", "EQ2", 500),
+              place_paid(oms, "u1", "EQ1", 300, "Sell")]
+    orders.append(oms.place_lump_sum_order("u1", "EQ2", 200, "Buy")[0])
+    return orders
+
+def test_orders_are_shared_through_the_database(mf, oms, database, place_paid):
+    paid = place_paid(oms, "u1", "EQ1")
+    unpaid, _ = oms.place_lump_sum_order("u1", "EQ2", 250, "Buy")
+    assert oms.cancel_order(unpaid)
+
+    other = reopen(mf, database)
+    assert sorted(other.fund_manager.funds) == ["EQ1", "EQ2"]
+    assert other.get_order_status(paid) == "Pending"
+    assert other.get_order_status(unpaid) == "Cancelled"
+    assert other.get_order_status("missing") == "Order not found"
+    order = other.orders[paid]
+    assert (order["user_id"], order["fund_code"], order["amount"]) == ("u1", "EQ1", 1000)
+    assert order["created_at"] == oms.orders[paid]["created_at"]
+
+def test_status_queries_read_the_index(oms, place_paid):
+    first, second = place_paid(oms, "u1", "EQ1"), place_paid(oms, "u2", "EQ2")
+    unpaid, _ = oms.place_lump_sum_order("u1", "EQ1", 100, "Buy")
+
+    assert oms._order_ids_with_status("Pending") == [first, second]
+    assert [order["order_id"] for order in oms.get_orders_by_status("Pending Payment")] == [unpaid]
+    assert oms.get_user_orders("u1", status="Pending") == [oms.orders[first]]
+    assert [order["order_id"] for order in oms.get_user_orders("u1", offset=1, limit=5)] == [unpaid]
+
+def test_processing_matches_the_in_memory_book(mf, oms, add_priced_funds, place_paid):
+    memory = mf.OrderManagementSystem(add_priced_funds(mf.FundManager(), "EQ1", "EQ2"))
+    stored_ids, memory_ids = trade(oms, place_paid), trade(memory, place_paid)
+
+    stats = oms.process_orders(TOMORROW)
+
+    assert stats["executed"] == memory.process_orders(TOMORROW)["executed"] == 3
+    for stored_id, memory_id in zip(stored_ids, memory_ids):
+        stored, expected = oms.orders[stored_id], memory.orders[memory_id]
+        assert stored["status"] == expected["status"]
+        assert stored["units_allotted"] == pytest.approx(expected["units_allotted"])
+    portfolio, expected = oms.get_portfolio("u1"), memory.get_portfolio("u1")
+    for code in ("EQ1", "EQ2"):
+        assert portfolio.get_holding(code) == pytest.approx(expected.get_holding(code))
+    for stored, flows in zip(portfolio.flows(), expected.flows()):
+        assert stored.tolist() == pytest.approx(flows.tolist())
+
+def test_portfolio_is_cached_until_the_user_changes(oms, place_paid):
+    place_paid(oms, "u1", "EQ1")
+    oms.process_orders(TOMORROW)
+    portfolio = oms.get_portfolio("u1")
+    assert oms.get_portfolio("u1") is portfolio
+
+    place_paid(oms, "u1", "EQ2")
+    oms.process_orders(TOMORROW)
+    assert oms.get_portfolio("u1") is not portfolio
+    assert oms.get_portfolio("u1").get_holding("EQ2")["cost"] == 1000
+    assert oms.compute_xirr().keys() == {"u1"}
+
+def test_due_sips_come_from_the_database(mf, oms, database):
+    # 3 June 2024 is a Monday
+    daily = oms.place_sip_order("u1", "EQ1", 100, "Daily", date(2024, 6, 3))
+    oms.place_sip_order("u1", "EQ2", 100, "Monthly", date(2024, 6, 20))
+
+    assert oms._pop_due_sips(date(2024, 6, 7)) == [daily]
+    assert oms.process_orders(date(2024, 6, 7))["sip_installments"] == 1
+    other = reopen(mf, database)
+    sip = other.sip_orders[daily]
+    assert (sip["last_executed"], sip["next_execution"]) == (date(2024, 6, 7), date(2024, 6, 10))
+    assert other.process_orders(date(2024, 6, 7))["sip_installments"] == 0
+    assert other.stop_sip(daily)
+    assert oms.get_sip_status(daily) == "Stopped"
+    assert oms.process_orders(date(2024, 6, 20))["sip_installments"] == 1
+
+def test_fund_managers_sync_writes_from_other_workers(mf, add_priced_funds, database):
+    storage = mf.SQLiteStorage(database)
+    writer = add_priced_funds(mf.SQLiteFundManager(storage), "EQ1")
+    reader = mf.SQLiteFundManager(mf.SQLiteStorage(database))
+    writer.update_nav("EQ1", date.today() + timedelta(days=20), 150.0)
+    writer.add_fund(mf.Fund("EQ9", "Fund EQ9", "House", "Open Ended", "Debt", "Liquid"))
+
+    assert reader.get_fund("EQ1").get_current_nav() == 110.0
+    reader.sync()
+    assert reader.get_fund("EQ1").get_current_nav() == 150.0
+    assert [f.scheme_code for f in reader.find_funds(scheme_category="Debt")] == ["EQ9"]
+
+def test_history_outside_the_window_is_read_from_disk(mf, add_priced_funds, database):
+    storage = mf.SQLiteStorage(database)
+    add_priced_funds(mf.SQLiteFundManager(storage), "EQ1")
+    windowed = mf.SQLiteFundManager(mf.SQLiteStorage(database), history_days=10)
+
+    assert len(windowed.get_fund("EQ1").nav_history) == 21
+    ordinals, navs = windowed.get_nav_range("EQ1", date.today() - timedelta(days=30), date.today())
+    assert list(navs) == [100.0 + offset for offset in range(-30, 1)]
+
+def test_sells_beyond_the_stored_holding_fail(mf, oms, database, place_paid):
+    place_paid(oms, "u1", "EQ1", 1000)
+    oms.process_orders(TOMORROW)
+    oversold, sold = place_paid(oms, "u1", "EQ1", 1500, "Sell"), place_paid(oms, "u1", "EQ1", 400, "Sell")
+
+    assert oms.process_orders(TOMORROW)["failed"] == 1
+    other = reopen(mf, database)
+    assert (other.get_order_status(oversold), other.get_order_status(sold)) == ("Failed", "Executed")
+    assert other.get_portfolio("u1").get_holding("EQ1")["cost"] == pytest.approx(600.0)
+
+def test_a_cancel_racing_execution_waits_for_its_commit(mf, oms, database, place_paid):
+    order_id = place_paid(oms, "u1", "EQ1")
+    other = reopen(mf, database)
+    cancelled, threads = [], []
+    group_by_fund = oms._group_by_fund
+
+    def cancel_midway(order_ids):
+        # Another worker cancels after this one has read the pending orders
+        worker = threading.Thread(target=lambda: cancelled.append(other.cancel_order(order_id)))
+        worker.start()
+        worker.join(0.2)
+        threads.append(worker)
+        return group_by_fund(order_ids)
+
+    oms._group_by_fund = cancel_midway
+    assert oms.process_orders(TOMORROW)["executed"] == 1
+    threads[0].join()
+
+    # The cancel ran once the execution had committed, and found it executed
+    assert cancelled == [False]
+    assert other.get_order_status(order_id) == "Executed"
+    assert other.get_portfolio("u1").get_holding("EQ1")["cost"] == 1000
@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+
+import pytest
+
+TODAY = date.today()
+TOMORROW = TODAY + timedelta(days=1)
+
+USERS = {"u1": {"user_id": "u1", "name": "First"}, "u2": {"user_id": "u2", "name": "Second"}}
+
+@pytest.fixture
+def oms(mf, add_priced_funds, place_paid):
+    oms = mf.OrderManagementSystem(add_priced_funds(mf.FundManager(), "EQ1", "EQ2"))
+    for user_id in USERS:
+        place_paid(oms, user_id, "EQ1", 1000)
+    oms.process_orders(TOMORROW)
+    return oms
+
+@pytest.fixture
+def service(mf, oms):
+    service = mf.DashboardService(oms, oms.fund_manager, USERS.get)
+    yield service
+    service.close()
+
+def test_repeat_loads_are_served_from_memory(service):
+    dashboard = service.get("u1")
+    assert dashboard.user_info["name"] == "First"
+    assert [order["status"] for order in dashboard.orders] == ["Executed"]
+    assert [holding["scheme_code"] for holding in dashboard.portfolio["holdings"]] == ["EQ1"]
+
+    assert service.get("u1") is dashboard
+    assert (service.hits, service.misses) == (1, 1)
+    assert service.get("missing") is None
+
+def test_order_and_sip_changes_invalidate_only_their_user(oms, service):
+    first, second = service.get("u1"), service.get("u2")
+    oms.place_lump_sum_order("u1", "EQ2", 500, "Buy")
+    oms.place_sip_order("u1", "EQ2", 100, "Monthly", TOMORROW)
+
+    dashboard = service.get("u1")
+    assert dashboard is not first
+    assert [order["fund_code"] for order in dashboard.orders] == ["EQ1", "EQ2"]
+    assert len(dashboard.sips) == 1
+    assert service.get("u2") is second
+
+def test_holdings_changes_invalidate_without_an_order_event(oms, service):
+    dashboard = service.get("u1")
+    user_version = oms.user_version("u1")
+    # A ledger write that goes through no order, e.g. a transfer in
+    oms.portfolios["u1"].add_units("EQ2", 5.0, 500.0)
+
+    assert oms.user_version("u1") == user_version
+    refreshed = service.get("u1")
+    assert refreshed is not dashboard
+    assert [holding["scheme_code"] for holding in refreshed.portfolio["holdings"]] == ["EQ1", "EQ2"]
+    assert refreshed.user_info["total_investment"] == dashboard.user_info["total_investment"] + 500.0
+
+def test_nav_changes_revalue_the_portfolio(oms, service):
+    dashboard = service.get("u1")
+    oms.fund_manager.update_nav("EQ1", TODAY + timedelta(days=11), 222.0)
+
+    refreshed = service.get("u1")
+    assert refreshed is not dashboard
+    assert refreshed.user_info["current_value"] > dashboard.user_info["current_value"]
+
+def test_least_recently_used_entries_are_evicted(mf, oms):
+    service = mf.DashboardService(oms, oms.fund_manager, USERS.get, max_entries=1)
+    first = service.get("u1")
+    service.get("u2")
+    assert service.get("u1") is not first
+    assert (service.hits, service.misses) == (0, 3)
+    service.close()
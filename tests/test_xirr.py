@@ -0,0 +1,50 @@
+import math
+from datetime import date
+
+import pytest
+
+def ordinals(*days):
+    return [day.toordinal() for day in days]
+
+def npv(rate, amounts, days):
+    return sum(amount / (1.0 + rate) ** ((day - days[0]) / 365.0) for amount, day in zip(amounts, days))
+
+def test_exact_starting_guess_is_kept(mf):
+    # One year at 10% is the solver's first guess
+    rates = mf.xirr([-1000, 1100], ordinals(date(2023, 1, 1), date(2024, 1, 1)), [0, 0], 1)
+    assert rates[0] == pytest.approx(0.10, abs=1e-12)
+
+def test_several_flows(mf):
+    amounts = [-1000, -1000, 500, 2000]
+    days = ordinals(date(2023, 1, 1), date(2023, 7, 1), date(2023, 10, 15), date(2024, 7, 1))
+    rate = mf.xirr(amounts, days, [0, 0, 0, 0], 1)[0]
+    assert 0.1 < rate < 0.5
+    assert npv(rate, amounts, days) == pytest.approx(0.0, abs=1e-6)
+
+def test_series_are_solved_independently(mf):
+    days = ordinals(date(2023, 1, 1), date(2024, 1, 1))
+    rates = mf.xirr([-1000, 1100, -1000, 500, 1000, 1100], days * 3, [0, 0, 1, 1, 2, 2], 3)
+    assert rates[0] == pytest.approx(0.10)
+    assert rates[1] == pytest.approx(-0.50)
+    # No sign change: no rate makes the NPV zero
+    assert math.isnan(rates[2])
+
+def test_no_sign_change_is_nan(mf):
+    days = ordinals(date(2023, 1, 1), date(2024, 1, 1))
+    assert math.isnan(mf.xirr([-1000, -100], days, [0, 0], 1)[0])
+    assert mf._percent(mf.xirr([1000, 100], days, [0, 0], 1)[0]) is None
+
+def test_portfolio_xirr_and_valuation(mf):
+    fund_manager = mf.FundManager()
+    fund_manager.add_fund(mf.Fund("EQ1", "Fund EQ1", "House", "Open Ended", "Equity", "Large Cap"))
+    fund_manager.update_nav("EQ1", date(2023, 12, 29), 11.0)
+    portfolio = mf.Portfolio("u1")
+    portfolio.add_units("EQ1", 100.0, 1000.0)
+    portfolio.record_cash_flow("EQ1", date(2023, 1, 1), -1000.0)
+    empty = mf.Portfolio("u2")
+
+    assert mf.portfolio_xirr([portfolio, empty], fund_manager, as_of=date(2024, 1, 1)) == {"u1": 10.0, "u2": None}
+    assert mf.portfolio_xirr([portfolio], fund_manager, date(2024, 1, 1), by_scheme=True) == {("u1", "EQ1"): 10.0}
+    valuation = portfolio.valuation(fund_manager, as_of=date(2024, 1, 1))
+    assert valuation["xirr"] == 10.0
+    assert valuation["holdings"][0]["xirr"] == 10.0
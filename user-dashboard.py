@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import threading
+
+# The app's home screen: profile, valued portfolio, orders and SIPs for one
+# user. The four lookups run concurrently on a thread pool (each thread gets
+# its own SQLite connection), and the result is kept in memory until the
+# user's orders/SIPs/profile change (OrderManagementSystem.user_version), their
+# holdings do (OrderManagementSystem.ledger_version) or fund data does
+# (FundManager.version).
+
+@dataclass(frozen=True)
+class UserDashboard:
+    user_info: dict
+    portfolio: dict
+    orders: list
+    sips: list
+
+    def to_dict(self):
+        return {
+            "user_info": self.user_info,
+            "portfolio": self.portfolio["holdings"],
+            "orders": self.orders,
+            "sips": self.sips
+        }
+
+class DashboardService:
+    # `load_user(user_id)` returns the profile dict, or None for an unknown
+    # user. Cached dashboards are shared between requests: treat them as
+    # read-only.
+    def __init__(self, order_management_system, fund_manager, load_user, max_workers=4, max_entries=10000):
+        self.order_management_system = order_management_system
+        self.fund_manager = fund_manager
+        self.load_user = load_user
+        self.max_entries = max_entries
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dashboard")
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        # Versions are read before building, so a change that lands mid-build
+        # leaves an entry the next request will not accept
+        oms = self.order_management_system
+        version = (oms.user_version(user_id), oms.ledger_version(user_id), self.fund_manager.version)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        dashboard = self._build(user_id)
+        with self._lock:
+            self._entries[user_id] = (version, dashboard)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dashboard
+
+    def _build(self, user_id):
+        oms = self.order_management_system
+        user = self._pool.submit(self.load_user, user_id)
+        portfolio = self._pool.submit(lambda: oms.get_portfolio(user_id).valuation(self.fund_manager))
+        orders = self._pool.submit(oms.get_user_orders, user_id)
+        sips = self._pool.submit(oms.get_user_sips, user_id)
+
+        user, portfolio = user.result(), portfolio.result()
+        orders, sips = orders.result(), sips.result()
+        if user is None:
+            return None
+        user_info = dict(user, total_investment=portfolio["total_investment"], current_value=portfolio["current_value"])
+        return UserDashboard(user_info, portfolio, orders, sips)
+
+    def close(self):
+        self._pool.shutdown()